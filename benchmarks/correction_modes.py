@@ -0,0 +1,138 @@
+"""
+Compares the word-by-word and the lattice correction modes on a held-out text.
+
+Misspells a fraction of the words of each held-out line (one letter replaced,
+inserted or deleted), corrects the line with `correct_words` and with
+`correct_words_lattice` at several beam widths, and reports the rate of
+misspelled words corrected back, of correct words left unchanged, and the
+time per word of each mode. The candidates are generated once and cached, so
+the times compare the scoring and decoding. Lines with adjacent misspelled
+words are also reported apart, since that is where the joint decoding
+differs the most.
+
+Usage:
+    python benchmarks/correction_modes.py --model-dir src/models --heldout heldout.txt --typo-rate 0.2 --beam-widths 1 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.data.model_registry import build_registry, correction_models  # noqa: E402
+from utils.data.ngram_compaction import misspell  # noqa: E402
+from utils.prediction.correction_cache import CorrectionCache  # noqa: E402
+from utils.prediction.lattice_correction import correct_words_lattice  # noqa: E402
+from utils.prediction.text_correction import correct_words  # noqa: E402
+from utils.text_processing.text_preprocessing import text_processing  # noqa: E402
+
+
+def heldout_samples(path, max_lines, typo_rate, seed):
+    # (words, misspelled words) of each held-out line with at least one misspelling
+    generator = random.Random(seed)
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if line_number >= max_lines:
+                break
+            words = text_processing(line)
+            typos = [
+                misspell(generator, word)
+                if word.isalpha() and len(word) > 1 and generator.random() < typo_rate
+                else word
+                for word in words
+            ]
+            if typos != words:
+                samples.append((words, typos))
+    return samples
+
+
+def evaluate(samples, corrector):
+    """
+    Corrects the samples and counts the right corrections.
+
+    Parameters:
+    samples (List[Tuple[List[str], List[str]]]): The words and misspelled words of each line.
+    corrector (Callable[[List[str]], List[str]]): Corrects the words of a line.
+
+    Returns:
+    Dict[str, float]: The rates of misspelled words corrected back overall and in the
+        lines with adjacent misspellings, the rate of correct words left unchanged,
+        and the time per word in seconds.
+    """
+    fixed = typos_count = kept = correct_count = 0
+    adjacent_fixed = adjacent_count = 0
+    words_count = 0
+    seconds = 0.0
+    for words, typos in samples:
+        start = time.perf_counter()
+        corrected = corrector(typos)
+        seconds += time.perf_counter() - start
+        words_count += len(words)
+        misspelled = [typo != word for word, typo in zip(words, typos)]
+        adjacent = any(a and b for a, b in zip(misspelled, misspelled[1:]))
+        for word, was_misspelled, result in zip(words, misspelled, corrected):
+            if was_misspelled:
+                typos_count += 1
+                fixed += result == word
+                if adjacent:
+                    adjacent_count += 1
+                    adjacent_fixed += result == word
+            else:
+                correct_count += 1
+                kept += result == word
+    return {
+        "accuracy": fixed / max(typos_count, 1),
+        "adjacent_accuracy": adjacent_fixed / max(adjacent_count, 1),
+        "kept": kept / max(correct_count, 1),
+        "seconds_per_word": seconds / max(words_count, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument("--heldout", required=True, help="Held-out text, one input per line")
+    parser.add_argument("--max-lines", type=int, default=500)
+    parser.add_argument("--typo-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--candidate-generator", choices=("symspell", "trie", "edits"), default="symspell"
+    )
+    parser.add_argument("--max-candidates", type=int, default=5)
+    parser.add_argument("--beam-widths", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    models = correction_models(build_registry(args.model_dir), args.candidate_generator)
+    samples = heldout_samples(args.heldout, args.max_lines, args.typo_rate, args.seed)
+    # Candidates shared by the modes, generated by a first pass
+    cache = CorrectionCache(max_candidates=1 << 20, max_corrections=0)
+    for _, typos in samples:
+        correct_words(typos, *models, cache=cache)
+
+    modes = {"word": lambda typos: correct_words(typos, *models, cache=cache)}
+    for beam_width in args.beam_widths:
+        modes[f"lattice (beam {beam_width})"] = (
+            lambda typos, beam_width=beam_width: correct_words_lattice(
+                typos,
+                *models,
+                cache=cache,
+                max_candidates=args.max_candidates,
+                beam_width=beam_width,
+            )
+        )
+
+    print(f"{len(samples)} lines with misspellings")
+    print(f"{'mode':<20} {'corrected':>10} {'adjacent':>10} {'kept':>8} {'us/word':>9}")
+    for name, corrector in modes.items():
+        result = evaluate(samples, corrector)
+        print(
+            f"{name:<20} {result['accuracy']:>10.2%} {result['adjacent_accuracy']:>10.2%} "
+            f"{result['kept']:>8.2%} {result['seconds_per_word'] * 1e6:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic models for the benchmarks, generated offline.
+
+The same seed and size always give the same vocabulary, n-gram counts,
+indexes and LSTM weights, so timings of different runs and commits are
+comparable without downloading the real artifacts.
+"""
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.data.vocabulary import Vocabulary  # noqa: E402
+from utils.prediction.numpy_lstm import JsonTokenizer, NumpyLSTMModel  # noqa: E402
+from utils.prediction.scoring import CorrectionScorer  # noqa: E402
+from utils.prediction.successor_index import SuccessorIndex  # noqa: E402
+from utils.text_processing.symspell import SymSpellIndex  # noqa: E402
+
+LETTERS = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+
+
+class Fixture:
+    """
+    A synthetic vocabulary with its n-gram counts, indexes and a tiny LSTM model.
+
+    The words are random strings of 2 to 9 letters, and the corpus the counts
+    come from draws them with Zipf frequencies, like natural text.
+    """
+
+    def __init__(self, vocab_size, seed=0, corpus_factor=20, embedding=16, units=32, input_length=5):
+        generator = np.random.default_rng(seed)
+        self.size = vocab_size
+        self.generator = generator
+
+        # Distinct random words
+        words = []
+        seen = set()
+        while len(words) < vocab_size:
+            word = "".join(generator.choice(LETTERS, generator.integers(2, 10)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        self.words = words
+
+        # Zipf-distributed corpus and its n-gram counts
+        weights = 1.0 / np.arange(1, vocab_size + 1)
+        corpus_ids = generator.choice(vocab_size, vocab_size * corpus_factor, p=weights / weights.sum())
+        corpus = [words[ident] for ident in corpus_ids]
+        self.unigram_counts = dict(Counter(corpus))
+        self.bigram_counts = dict(Counter(zip(corpus, corpus[1:])))
+        self.trigram_counts = dict(Counter(zip(corpus, corpus[1:], corpus[2:])))
+        self.ngram_counts = self.bigram_counts
+        self.nplus1gram_counts = self.trigram_counts
+
+        self.vocab = Vocabulary(words)
+        self.scorer = CorrectionScorer(
+            self.vocab, self.unigram_counts, self.bigram_counts, self.trigram_counts
+        )
+        self.symspell = SymSpellIndex(self.vocab, 2)
+        self.successor_index = SuccessorIndex(self.ngram_counts, self.nplus1gram_counts, self.vocab)
+
+        # Embedding / LSTM / Dense model over the vocabulary, token 0 is padding
+        outputs = vocab_size + 1
+        config = {
+            "layers": [
+                {"type": "Embedding", "prefix": "0/"},
+                {
+                    "type": "LSTM",
+                    "prefix": "1/",
+                    "units": units,
+                    "activation": "tanh",
+                    "recurrent_activation": "sigmoid",
+                    "return_sequences": False,
+                    "go_backwards": False,
+                },
+                {"type": "Dense", "prefix": "2/", "activation": "softmax"},
+            ],
+            "quantization": "float32",
+            "input_length": input_length,
+        }
+        arrays = {
+            "0/embeddings": generator.normal(0, 0.1, (outputs, embedding)).astype("float32"),
+            "1/kernel": generator.normal(0, 0.1, (embedding, 4 * units)).astype("float32"),
+            "1/recurrent_kernel": generator.normal(0, 0.1, (units, 4 * units)).astype("float32"),
+            "1/bias": np.zeros(4 * units, dtype="float32"),
+            "2/kernel": generator.normal(0, 0.1, (units, outputs)).astype("float32"),
+            "2/bias": np.zeros(outputs, dtype="float32"),
+        }
+        self.lstm_model = NumpyLSTMModel(config, arrays)
+        self.tokenizer = JsonTokenizer({word: i + 1 for i, word in enumerate(words)})
+
+    def text(self, n_words, typo_rate=0.0, seed=1):
+        """
+        Returns a text of vocabulary words drawn with Zipf frequencies, some of them misspelled.
+
+        Parameters:
+        n_words (int): The number of words.
+        typo_rate (float): The fraction of misspelled words. Default is 0.0.
+        seed (int): The seed of the text. Default is 1.
+
+        Returns:
+        str: The words separated by spaces, with a period every 12 words.
+        """
+        generator = np.random.default_rng(seed)
+        weights = 1.0 / np.arange(1, self.size + 1)
+        ids = generator.choice(self.size, n_words, p=weights / weights.sum())
+        words = []
+        for position, ident in enumerate(ids):
+            word = self.words[ident]
+            if generator.random() < typo_rate:
+                index = generator.integers(0, len(word))
+                word = word[:index] + generator.choice(LETTERS) + word[index + 1 :]
+            words.append(word + (" ." if position % 12 == 11 else ""))
+        return " ".join(words)
@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks of the correction and completion hot paths on synthetic models.
+
+Times `edits1`, `edits2`, `text_processing`, `correct_text`, `predict_next_word`,
+`predict_next_n_words` and `predict_next_words_lstm` on deterministic fixtures
+of several vocabulary sizes (see fixtures.py), with the prediction caches
+bypassed. Reports the median time per call, the peak memory of one call, and
+how the time scales with the vocabulary size (the exponent of a power law fit).
+
+The results can be saved as a baseline, and a later run compared with it: a
+benchmark slower than the baseline by more than the tolerance makes the
+script exit with an error.
+
+Usage:
+    python benchmarks/hot_paths.py --sizes 1000 5000 20000 --save-baseline baseline.json
+    python benchmarks/hot_paths.py --sizes 1000 5000 20000 --baseline baseline.json --tolerance 1.3
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from fixtures import Fixture
+
+from utils.prediction.correction_cache import CorrectionCache
+from utils.prediction.lstm_completion import predict_next_words_lstm
+from utils.prediction.prediction_cache import prediction_cache
+from utils.prediction.text_completion import predict_next_n_words, predict_next_word
+from utils.prediction.text_correction import correct_text
+from utils.text_processing.edit_distance import edits1, edits2
+from utils.text_processing.text_preprocessing import text_processing
+
+
+def benchmarks(fixture):
+    """
+    Returns the benchmarked calls on a fixture.
+
+    Parameters:
+    fixture (Fixture): The synthetic models.
+
+    Returns:
+    Dict[str, Callable[[], Any]]: The calls by benchmark name.
+    """
+    text = fixture.text(200)
+    typo_text = fixture.text(50, typo_rate=0.2)
+    tokens = text_processing(fixture.text(20, seed=2))
+    word = max(fixture.words[:50], key=len)
+    correction_models = (
+        fixture.vocab,
+        edits1,
+        edits2,
+        fixture.unigram_counts,
+        fixture.bigram_counts,
+        fixture.trigram_counts,
+        fixture.symspell,
+        fixture.scorer,
+    )
+    completion_models = (fixture.ngram_counts, fixture.nplus1gram_counts, fixture.vocab)
+
+    def uncached(function, *args, **kwargs):
+        # The inner calls of the completion functions are cached too
+        prediction_cache.clear()
+        return function.__wrapped__(*args, **kwargs)
+
+    return {
+        "edits1": lambda: edits1(word),
+        "edits2": lambda: edits2(word),
+        "text_processing": lambda: text_processing(text),
+        "correct_text": lambda: correct_text(
+            typo_text, *correction_models, cache=CorrectionCache(0, 0)
+        ),
+        "predict_next_word": lambda: uncached(
+            predict_next_word, tokens, *completion_models, successor_index=fixture.successor_index
+        ),
+        "predict_next_n_words": lambda: uncached(
+            predict_next_n_words,
+            tokens,
+            *completion_models,
+            5,
+            successor_index=fixture.successor_index,
+        ),
+        "predict_next_words_lstm": lambda: uncached(
+            predict_next_words_lstm, text, fixture.lstm_model, fixture.tokenizer, 5
+        ),
+    }
+
+
+def measure(call, min_runs=5, min_seconds=0.2):
+    """
+    Times a call and measures its peak memory.
+
+    Parameters:
+    call (Callable[[], Any]): The call.
+    min_runs (int): The minimum number of timed runs. Default is 5.
+    min_seconds (float): The minimum total time of the timed runs. Default is 0.2.
+
+    Returns:
+    Dict[str, float]: The median time per call in seconds and the peak memory in bytes.
+    """
+    call()  # warm up
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - started < min_seconds:
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+
+    # Separate run, tracing allocations slows the call down
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_bytes": peak}
+
+
+def scaling_exponent(sizes, seconds):
+    """
+    Fits time = a * size ** k and returns k, 0 for constant time and 1 for linear time.
+
+    Parameters:
+    sizes (Sequence[int]): The vocabulary sizes.
+    seconds (Sequence[float]): The time per call at each size.
+
+    Returns:
+    float: The exponent, or nan with fewer than two sizes.
+    """
+    if len(sizes) < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with a baseline.
+
+    Parameters:
+    results (Dict[str, Dict[str, Dict[str, float]]]): The measures by benchmark and size.
+    baseline (Dict[str, Dict[str, Dict[str, float]]]): The baseline measures.
+    tolerance (float): The largest accepted ratio to the baseline.
+
+    Returns:
+    List[str]: A description of each regression.
+    """
+    regressions = []
+    for name, by_size in results.items():
+        for size, measures in by_size.items():
+            reference = baseline.get(name, {}).get(size)
+            if reference is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                ratio = measures[metric] / max(reference[metric], 1e-12)
+                if ratio > tolerance:
+                    regressions.append(
+                        f"{name} at {size} words: {metric} {ratio:.2f}x the baseline "
+                        f"({measures[metric]:.6g} vs {reference[metric]:.6g})"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmarks to run")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2)
+    parser.add_argument("--baseline", default=None, help="JSON results to compare with")
+    parser.add_argument("--save-baseline", default=None, help="Where to save the results as JSON")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Largest accepted ratio to the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        fixture = Fixture(size)
+        for name, call in benchmarks(fixture).items():
+            if args.only and name not in args.only:
+                continue
+            measures = measure(call, args.min_runs, args.min_seconds)
+            results.setdefault(name, {})[str(size)] = measures
+            print(
+                f"{name:<24} {size:>7} words  {measures['seconds'] * 1e3:>10.3f} ms"
+                f"  {measures['peak_bytes'] / 2**10:>10.1f} KiB"
+            )
+
+    if len(args.sizes) > 1:
+        print()
+        for name, by_size in results.items():
+            sizes = [int(size) for size in by_size]
+            exponent = scaling_exponent(sizes, [by_size[str(size)]["seconds"] for size in sizes])
+            print(f"{name:<24} time ~ vocabulary ** {exponent:.2f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved the results to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regression beyond {args.tolerance:.2f}x the baseline")
+
+
+if __name__ == "__main__":
+    main()
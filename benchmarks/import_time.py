@@ -0,0 +1,90 @@
+"""
+Measures the cold-start import time of the modules used by the N-gram features.
+
+Each run imports the modules in a fresh interpreter and fails when they take
+longer than the budget or pull in TensorFlow or Keras, which must only be
+loaded when the LSTM model is selected.
+
+Usage:
+    python benchmarks/import_time.py --runs 5 --max-seconds 2.0
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules imported by the app before a model type is chosen
+NGRAM_MODULES = (
+    "utils.data.model_registry",
+    "utils.prediction.text_completion",
+    "utils.prediction.lstm_completion",
+    "utils.prediction.text_correction",
+    "utils.prediction.beam_search",
+    "utils.text_processing.edit_distance",
+    "utils.text_processing.text_preprocessing",
+)
+
+# Modules that must stay unloaded on the N-gram path
+HEAVY_MODULES = ("tensorflow", "keras")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(module for module in {heavy!r} if module in sys.modules))
+"""
+
+
+def measure(modules, heavy_modules):
+    """
+    Imports modules in a fresh interpreter.
+
+    Parameters:
+    modules (Sequence[str]): The modules to import.
+    heavy_modules (Sequence[str]): The modules to look for once the import is done.
+
+    Returns:
+    Tuple[float, List[str]]: The import time in seconds and the heavy modules that were loaded.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(modules=tuple(modules), heavy=tuple(heavy_modules))],
+        cwd=SRC_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    timings = []
+    loaded = set()
+    for _ in range(args.runs):
+        elapsed, heavy = measure(NGRAM_MODULES, HEAVY_MODULES)
+        timings.append(elapsed)
+        loaded.update(heavy)
+
+    median = statistics.median(timings)
+    print(f"N-gram import time: median {median:.3f} s, min {min(timings):.3f} s over {args.runs} runs")
+    failed = False
+    if loaded:
+        print(f"FAIL: the N-gram path imported {', '.join(sorted(loaded))}")
+        failed = True
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"FAIL: median import time above {args.max_seconds:.3f} s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
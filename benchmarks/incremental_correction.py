@@ -0,0 +1,129 @@
+"""
+Compares the incremental correction of an edited text with `correct_text`.
+
+Builds a synthetic vocabulary and n-gram counts, applies random edits
+(insertions, deletions and replacements anywhere in the text, and appended
+words) to a document, and checks after every edit that the incremental
+result is the same as correcting the whole text. Then times appending one
+word to documents of growing size with both.
+
+Usage:
+    python benchmarks/incremental_correction.py --edits 2000 --sizes 100 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.data.vocabulary import Vocabulary  # noqa: E402
+from utils.prediction.incremental_correction import IncrementalCorrector  # noqa: E402
+from utils.prediction.scoring import CorrectionScorer  # noqa: E402
+from utils.prediction.text_correction import correct_text  # noqa: E402
+from utils.text_processing.edit_distance import edits1, edits2  # noqa: E402
+from utils.text_processing.symspell import SymSpellIndex  # noqa: E402
+from utils.text_processing.tokenizer import tokenize  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+PUNCTUATION = [" ", " ", " ", ". ", ", ", "... ", "!", " http://x.y ", "\n", "mr. ", "5. "]
+
+
+def synthetic_models(generator, words=2000):
+    # A vocabulary of random words and Zipf-like n-gram counts over a random corpus
+    vocabulary = list(
+        {
+            "".join(generator.choice(LETTERS) for _ in range(generator.randint(1, 8)))
+            for _ in range(words)
+        }
+    )
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    corpus = generator.choices(vocabulary, weights, k=words * 20)
+    unigram_counts = Counter(corpus)
+    bigram_counts = Counter(zip(corpus, corpus[1:]))
+    trigram_counts = Counter(zip(corpus, corpus[1:], corpus[2:]))
+    vocab = Vocabulary(vocabulary)
+    return vocab, unigram_counts, bigram_counts, trigram_counts, vocabulary
+
+
+def random_word(generator, vocabulary):
+    word = generator.choice(vocabulary)
+    if generator.random() < 0.3:
+        # Misspell it
+        position = generator.randint(0, len(word))
+        word = word[:position] + generator.choice(LETTERS) + word[position + 1 :]
+    return word
+
+
+def random_text(generator, vocabulary, words):
+    return "".join(
+        random_word(generator, vocabulary) + generator.choice(PUNCTUATION)
+        for _ in range(words)
+    )
+
+
+def random_edit(generator, vocabulary, text):
+    start = generator.randint(0, len(text))
+    if generator.random() < 0.3:
+        return text + " " + random_word(generator, vocabulary)
+    end = min(len(text), start + generator.randint(0, 12))
+    inserted = random_text(generator, vocabulary, generator.randint(0, 2))
+    inserted = inserted[: generator.randint(0, len(inserted))]
+    return text[:start] + inserted + text[end:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--edits", type=int, default=1000, help="Number of random edits to check")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    vocab, unigram_counts, bigram_counts, trigram_counts, vocabulary = synthetic_models(generator)
+    scorer = CorrectionScorer(vocab, unigram_counts, bigram_counts, trigram_counts)
+    candidate_generator = SymSpellIndex(vocabulary, max_distance=2)
+    models = (vocab, edits1, edits2, unigram_counts, bigram_counts, trigram_counts, candidate_generator, scorer)
+
+    # Every incremental update must give the result of a full correction
+    corrector = IncrementalCorrector(*models)
+    text = random_text(generator, vocabulary, 50)
+    for edit in range(args.edits):
+        text = random_edit(generator, vocabulary, text)
+        incremental = corrector.correct_text(text)
+        expected = correct_text(text, *models)
+        if incremental != expected or corrector.words != tokenize(text):
+            print(f"Mismatch after edit {edit} of {text!r}:\n  full:        {expected}\n  incremental: {incremental}")
+            sys.exit(1)
+    stats = corrector.stats()
+    print(
+        f"{args.edits} edits identical; {stats['full_updates']} full updates, "
+        f"{stats['average_tokenized_characters']:.0f} characters tokenized and "
+        f"{stats['average_corrected_words']:.1f} words corrected per update"
+    )
+
+    # Latency of appending a word, as when typing at the end of the text area
+    for size in args.sizes:
+        text = random_text(generator, vocabulary, size)
+        corrector = IncrementalCorrector(*models)
+        corrector.correct_text(text)
+        appended = [text + " " + random_word(generator, vocabulary) for _ in range(20)]
+
+        start = time.perf_counter()
+        for new_text in appended:
+            correct_text(new_text, *models)
+        full_seconds = (time.perf_counter() - start) / len(appended)
+        start = time.perf_counter()
+        for new_text in appended:
+            corrector.correct_text(new_text)
+        incremental_seconds = (time.perf_counter() - start) / len(appended)
+        print(
+            f"{size:>6} words: full {full_seconds * 1000:8.2f} ms, "
+            f"incremental {incremental_seconds * 1000:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Compares the single-pass tokenizer with the NLTK pipeline it replaces.
+
+Runs both on sample sentences, on the lines of an optional corpus and on
+random texts, prints the mismatches and the time taken by each. The
+tokenizer is given the abbreviations of the Punkt model it is compared
+with: those of the trained model when it is installed, otherwise none,
+with an untrained model, so the comparison still covers everything but the
+abbreviation list.
+
+The default abbreviation list leaves out the ordinary words of the trained
+model ("no", "sun"...); the sentences ending with such words are checked
+against their expected tokens.
+
+Usage:
+    python benchmarks/tokenizer_parity.py --corpus data.txt --random 2000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+import nltk
+from nltk.tokenize import NLTKWordTokenizer
+from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.text_processing.tokenizer import Tokenizer  # noqa: E402
+
+SAMPLES = [
+    "Hello, how are you doing today?",
+    "I cannot believe it's already 5 p.m. We gotta go!",
+    "Mr. Smith went to Washington. He arrived at 3.30 and left at 5.",
+    "Check https://example.com or www.example.org for more info @john #news",
+    "Wait... what?! That's 1,000,000 dollars, isn't it",
+    "i wanna know, gimme a sec, lemme think. gonna be fine",
+    "The U.S. economy grew 2.5% in Q3, i.e. faster than expected.",
+    "Numbered list: 1. apples 2. oranges 3. Pears.",
+    "Trailing comma,",
+    "Commas,,,everywhere,,1 and periods....",
+    "J. R. R. Tolkien wrote books. e.g. the hobbit.",
+    "Ünïcödé text — with dashes – and “quotes”. Next sentence.",
+]
+
+# Sentences ending with an ordinary word that is also an abbreviation of the
+# trained Punkt model, and the tokens expected with the default abbreviations
+BOUNDARY_SAMPLES = {
+    "i said no. then we left": ["i", "said", "no", ".", "then", "we", "left"],
+    "the sun. it was hot": ["the", "sun", ".", "it", "was", "hot"],
+    "we met on wed. it rained": ["we", "met", "on", "wed", ".", "it", "rained"],
+    "they had a mass. then a meal": ["they", "had", "a", "mass", ".", "then", "a", "meal"],
+    "i saw al. he waved": ["i", "saw", "al", ".", "he", "waved"],
+    "Mr. Smith met Dr. Jones at 5 p.m. today": [
+        "mr.", "smith", "met", "dr.", "jones", "at", "5", "p.m.", "today"
+    ],
+}
+
+RANDOM_ALPHABET = "abcdefghij0123456789 .,,..??!@#()\"'-\n\ufe0f"
+RANDOM_WORDS = ["cannot", "wanna", "gonna", "mr.", "j.", "5.", "http://x.y", "www.a b", "u.s."]
+
+
+def nltk_text_processing(example, punkt):
+    # The previous implementation of text_processing, with an explicit Punkt model
+    word_tokenizer = NLTKWordTokenizer()
+    example = example.lower()
+    example = re.sub("http\\S+|www.\\S+|@|\ufe0f#|!|", "", example)
+    processed_text = []
+    for sentence in punkt.tokenize(example):
+        sentence = re.sub(r"[^a-zA-Z0-9 .,]", " ", sentence)
+        sentence_tokens = [
+            token
+            for inner in punkt.tokenize(sentence)
+            for token in word_tokenizer.tokenize(inner)
+        ]
+        processed_text.extend(token for token in sentence_tokens if token.strip() and token)
+    return processed_text
+
+
+def random_text(generator, length):
+    pieces = []
+    for _ in range(length):
+        if generator.random() < 0.2:
+            pieces.append(" " + generator.choice(RANDOM_WORDS) + " ")
+        else:
+            pieces.append(generator.choice(RANDOM_ALPHABET))
+    return "".join(pieces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", default=None, help="Text file, one input per line")
+    parser.add_argument("--random", type=int, default=1000, help="Number of random texts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--show", type=int, default=10, help="Mismatches to print")
+    args = parser.parse_args()
+
+    try:
+        punkt = nltk.data.load("tokenizers/punkt/english.pickle")
+        tokenizer = Tokenizer(abbreviations=punkt._params.abbrev_types)
+    except LookupError:
+        print("Trained Punkt model not installed: comparing without abbreviations")
+        punkt = PunktSentenceTokenizer()
+        tokenizer = Tokenizer(abbreviations=())
+
+    texts = list(SAMPLES)
+    if args.corpus:
+        with open(args.corpus, "r") as f:
+            texts.extend(line.rstrip("\n") for line in f)
+    generator = random.Random(args.seed)
+    texts.extend(random_text(generator, generator.randint(1, 60)) for _ in range(args.random))
+
+    start = time.perf_counter()
+    expected = [nltk_text_processing(text, punkt) for text in texts]
+    nltk_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = [tokenizer.tokenize(text) for text in texts]
+    tokenizer_seconds = time.perf_counter() - start
+
+    mismatches = [
+        (text, reference, tokens)
+        for text, reference, tokens in zip(texts, expected, actual)
+        if reference != tokens
+    ]
+    for text, reference, tokens in mismatches[: args.show]:
+        print(f"{text!r}\n  nltk:      {reference}\n  tokenizer: {tokens}")
+    print(
+        f"{len(texts) - len(mismatches)}/{len(texts)} texts identical; "
+        f"nltk {nltk_seconds:.3f} s, tokenizer {tokenizer_seconds:.3f} s "
+        f"({nltk_seconds / max(tokenizer_seconds, 1e-9):.1f}x)"
+    )
+
+    # The default abbreviations must not swallow the end of a sentence
+    boundary_mismatches = 0
+    for text, reference in BOUNDARY_SAMPLES.items():
+        tokens = Tokenizer().tokenize(text)
+        if tokens != reference:
+            boundary_mismatches += 1
+            print(f"{text!r}\n  expected:  {reference}\n  tokenizer: {tokens}")
+    print(
+        f"{len(BOUNDARY_SAMPLES) - boundary_mismatches}/{len(BOUNDARY_SAMPLES)} "
+        "sentence boundaries identical with the default abbreviations"
+    )
+
+    # Offsets must point at the characters each token comes from
+    for text in texts:
+        for token, start, end in tokenizer.tokenize(text, offsets=True):
+            span = text[start:end].lower()
+            if not set(token) <= set(span):
+                print(f"Bad offsets for {token!r} in {text!r}: {span!r}")
+                sys.exit(1)
+    sys.exit(1 if mismatches or boundary_mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
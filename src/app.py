@@ -1,4 +1,8 @@
 import streamlit as st
+from utils.data.model_registry import warm_up_from_environment
+
+# Optionally load the models of the features listed in TEXTFLOW_WARMUP
+warm_up_from_environment()
 
 # Page title
 st.set_page_config(page_title="Text Flow!", layout="centered")
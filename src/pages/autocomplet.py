@@ -1,10 +1,15 @@
 import streamlit as st
-from utils.data.load_data import load_vocab, load_pickle_file, load_h5_model
-from utils.prediction.text_completion import predict_next_word, predict_next_n_words
+from utils.data.model_registry import FEATURE_ARTIFACTS, registry
+from utils.prediction.text_completion import predict_next_word
+from utils.prediction.beam_search import beam_search_next_words
 from utils.text_processing.edit_distance import edits1, edits2, edits3
 from utils.text_processing.text_preprocessing import text_processing
-from utils.prediction.text_correction import correct_text
-from utils.prediction.text_completion import predict_next_words_lstm
+from utils.prediction.correction_cache import correction_cache
+from utils.prediction.incremental_correction import IncrementalCorrector
+from utils.prediction.lattice_correction import correct_text_lattice
+from utils.prediction.lstm_completion import predict_next_words_lstm
+from utils.monitoring.metrics import metrics
+from utils.monitoring.profiling import profile_requested, profiler
 
 
 def show():
@@ -37,37 +42,138 @@ def show():
             ),
         )
 
+        # Profile the corrections and predictions with ?profile=1 in the URL
+        # (see utils/monitoring/profiling.py)
+        profile = profile_requested(st.query_params.get("profile"))
+
         # Configuration parameters
+        model_type = "N-gram"
         if feature in (
             "Interactive Autocomplete",
             "Combined Autocomplete and Autocorrect",
         ):
             num_words = st.sidebar.slider("Number of words to complete", 1, 10, 5)
             model_type = st.sidebar.selectbox("Model type", ("N-gram", "LSTM"))
+            if model_type == "N-gram":
+                num_completions = st.sidebar.slider(
+                    "Number of alternative completions", 1, 5, 3
+                )
 
         # Additional parameters
-        if feature == "Combined Autocomplete and Autocorrect":
-            autocorrect_level = st.sidebar.slider("Autocorrect level", 1, 5, 3)
+        if feature in ("Autocorrect", "Combined Autocomplete and Autocorrect"):
+            candidate_generator_type = st.sidebar.selectbox(
+                "Candidate generator",
+                ("Vocabulary trie", "Symmetric delete index", "Edit enumeration"),
+            )
+            # The level is the maximum edit distance of the corrections
+            autocorrect_level = st.sidebar.slider(
+                "Autocorrect level",
+                1,
+                5,
+                2,
+                disabled=candidate_generator_type != "Vocabulary trie",
+            )
+            # Correct each misspelled word on its own, or the whole text at once
+            correction_mode = st.sidebar.selectbox(
+                "Correction mode", ("Word by word", "Whole sentence")
+            )
 
         if model_type == "N-gram":
 
             # Check if the feature is either 'Autocorrect' or 'Combined Autocomplete and Autocorrect'
             if feature in ("Autocorrect", "Combined Autocomplete and Autocorrect"):
-                # Load the unigram, bigram, and trigram counters from pickle files
-                unigram_counter = load_pickle_file("src/models/unigram_counter.pkl")
-                bigram_counter = load_pickle_file("src/models/bigram_counter.pkl")
-                trigram_counter = load_pickle_file("src/models/trigram_counter.pkl")
+                # Load the unigram, bigram, and trigram counters
+                unigram_counter = registry.get("unigram_counter")
+                bigram_counter = registry.get("bigram_counter")
+                trigram_counter = registry.get("trigram_counter")
+                scorer = registry.get("correction_scorer")
 
-            # Load the vocabulary, n-gram counts, and n-gram+1 counts from files
-            vocab = load_vocab("src/models/vocabulary.txt")
-            ngram_counts = load_pickle_file("src/models/ngram_counts.pkl")
-            nplus1gram_counts = load_pickle_file("src/models/nplus1gram_counts.pkl")
+                # Load the candidate index used to correct misspelled words
+                candidate_generator = None
+                if candidate_generator_type == "Vocabulary trie":
+                    candidate_generator = registry.get(
+                        "vocabulary_trie"
+                    ).candidate_generator(autocorrect_level)
+                elif candidate_generator_type == "Symmetric delete index":
+                    candidate_generator = registry.get("symspell_index")
+
+            # Load the vocabulary, n-gram counts, and n-gram+1 counts
+            vocab = registry.get("vocab")
+            if feature in (
+                "Interactive Autocomplete",
+                "Combined Autocomplete and Autocorrect",
+            ):
+                ngram_counts = registry.get("ngram_counts")
+                nplus1gram_counts = registry.get("nplus1gram_counts")
+                successor_index = registry.get("successor_index")
 
         else:
-            # Load the LSTM model
-            lstm_model = load_h5_model("src/models/model.h5")
+            # Load the LSTM model, shared in batched forward passes by the sessions
+            lstm_model = registry.get("lstm_predictor")
             # Load the tokenizer
-            tokenizer = load_pickle_file("src/models/tokenizer.pkl")
+            tokenizer = registry.get("tokenizer")
+
+        # Report the artifacts loaded by this process
+        with st.sidebar.expander("Loaded models"):
+            for name, stats in registry.stats().items():
+                st.write(
+                    f"{name}: {stats['load_seconds']:.2f} s, "
+                    f"{stats['memory_bytes'] / 2**20:.1f} MB"
+                )
+            if registry.is_loaded("lstm_predictor"):
+                batching = registry.get("lstm_predictor").stats()
+                st.write(
+                    f"LSTM batches: {batching['batches']}, "
+                    f"average size {batching['average_batch_size']:.1f}, "
+                    f"queue depth {batching['queue_depth']} "
+                    f"(max {batching['max_queue_depth']})"
+                )
+            cache_stats = correction_cache.stats()
+            if cache_stats["candidates"]["hits"] + cache_stats["candidates"]["misses"]:
+                st.write(
+                    f"Correction cache: candidates {cache_stats['candidates']['hit_rate']:.0%} "
+                    f"hits, corrections {cache_stats['corrections']['hit_rate']:.0%} hits"
+                )
+
+        # Per-stage latency, recorded from the interaction following the opt-in. The
+        # metrics are shared by the sessions of the process, so a session only turns
+        # them on, never off
+        if st.sidebar.checkbox("Show diagnostics"):
+            metrics.enable()
+            snapshot = metrics.snapshot()
+            with st.sidebar.expander("Diagnostics", expanded=True):
+                if snapshot["stages"]:
+                    st.table(
+                        {
+                            "stage": list(snapshot["stages"]),
+                            "count": [stage["count"] for stage in snapshot["stages"].values()],
+                            "mean (ms)": [
+                                f"{stage['mean_seconds'] * 1e3:.2f}"
+                                for stage in snapshot["stages"].values()
+                            ],
+                            "p50 (ms)": [
+                                f"{stage['p50_seconds'] * 1e3:.2f}"
+                                for stage in snapshot["stages"].values()
+                            ],
+                            "p95 (ms)": [
+                                f"{stage['p95_seconds'] * 1e3:.2f}"
+                                for stage in snapshot["stages"].values()
+                            ],
+                        }
+                    )
+                else:
+                    st.write("No stage timed yet, interact with the page.")
+                for event, value in snapshot["counters"].items():
+                    st.write(f"{event}: {value:g}")
+                for gauge, value in snapshot["gauges"].items():
+                    if gauge.startswith("cache_hit_rate"):
+                        st.write(f"{gauge}: {value:.0%}")
+                st.download_button(
+                    "Download metrics",
+                    metrics.to_prometheus(),
+                    file_name="textflow_metrics.prom",
+                    mime="text/plain",
+                )
 
         col1, col2 = st.columns(2)
         # Prediction
@@ -78,6 +184,8 @@ def show():
             st.session_state[f"{feature}_user_input"] = ""
         if f"{feature}_predicted_text" not in st.session_state:
             st.session_state[f"{feature}_predicted_text"] = ""
+        if f"{feature}_alternatives" not in st.session_state:
+            st.session_state[f"{feature}_alternatives"] = []
 
         with col1:
             # Text input
@@ -87,18 +195,62 @@ def show():
             )
 
             if st.button("Predict"):
+                st.session_state[f"{feature}_alternatives"] = []
+
                 # If the feature is 'Autocorrect' or 'Combined Autocomplete and Autocorrect'
                 if feature in ("Autocorrect", "Combined Autocomplete and Autocorrect"):
-                    # Correct the user's input text
-                    corrected_text = correct_text(
-                        str(user_input),
-                        vocab,
-                        edits1,
-                        edits2,
-                        unigram_counter,
-                        bigram_counter,
-                        trigram_counter,
+                    # Reuse the session's corrector while the models and settings are the same,
+                    # so only the words edited since the last prediction are corrected again
+                    correction_settings = (
+                        candidate_generator_type,
+                        autocorrect_level,
+                        tuple(
+                            registry.version(name)
+                            for name in FEATURE_ARTIFACTS["correction"]
+                            + ("vocabulary_trie", "symspell_index")
+                        ),
                     )
+                    if (
+                        st.session_state.get(f"{feature}_correction_settings")
+                        != correction_settings
+                    ):
+                        st.session_state[f"{feature}_corrector"] = IncrementalCorrector(
+                            vocab,
+                            edits1,
+                            edits2,
+                            unigram_counter,
+                            bigram_counter,
+                            trigram_counter,
+                            candidate_generator,
+                            scorer,
+                        )
+                        st.session_state[f"{feature}_correction_settings"] = correction_settings
+
+                    # Correct the user's input text
+                    with profiler.capture(
+                        "correct",
+                        len(str(user_input).split()),
+                        requested=profile,
+                        candidate_generator=candidate_generator_type,
+                        mode=correction_mode,
+                    ):
+                        if correction_mode == "Whole sentence":
+                            # The corrections depend on each other, the whole text is decoded again
+                            corrected_text = correct_text_lattice(
+                                str(user_input),
+                                vocab,
+                                edits1,
+                                edits2,
+                                unigram_counter,
+                                bigram_counter,
+                                trigram_counter,
+                                candidate_generator,
+                                scorer,
+                            )
+                        else:
+                            corrected_text = st.session_state[
+                                f"{feature}_corrector"
+                            ].correct_text(str(user_input))
                     # Store the corrected text in the session state
                     st.session_state[f"{feature}_predicted_text"] = corrected_text
 
@@ -114,43 +266,65 @@ def show():
                     "Interactive Autocomplete",
                     "Combined Autocomplete and Autocorrect",
                 ):
-                    # If only one word is to be predicted
-                    if num_words == 1:
+                    with profiler.capture(
+                        f"complete_{model_type.lower().replace('-', '')}",
+                        len(str(user_input).split()),
+                        requested=profile,
+                        n_words=num_words,
+                    ):
+                        # If only one word is to be predicted
+                        if num_words == 1:
 
-                        if model_type == "N-gram":
-                            # Predict the next word using N-gram model
-                            next_word_prediction, prob, _ = predict_next_word(
-                                prev_tokens, ngram_counts, nplus1gram_counts, vocab
-                            )
+                            if model_type == "N-gram":
+                                # Predict the next word using N-gram model
+                                next_word_prediction, prob, _ = predict_next_word(
+                                    prev_tokens,
+                                    ngram_counts,
+                                    nplus1gram_counts,
+                                    vocab,
+                                    successor_index=successor_index,
+                                )
+                            else:
+                                # Predict the next word using LSTM model
+                                next_word_prediction = predict_next_words_lstm(
+                                    str(user_input), lstm_model, tokenizer, max_len=1
+                                )
                         else:
-                            # Predict the next word using LSTM model
-                            next_word_prediction = predict_next_words_lstm(
-                                str(user_input), lstm_model, tokenizer, max_len=1
-                            )
-                    else:
-                        if model_type == "N-gram":
-                            # Predict the next 'num_words' words using N-gram model
-                            next_word_prediction = predict_next_n_words(
-                                prev_tokens,
-                                ngram_counts,
-                                nplus1gram_counts,
-                                vocab,
-                                num_words,
-                            )
-                        else:
-                            # Predict the next 'num_words' words using LSTM model
-                            next_word_prediction = predict_next_words_lstm(
-                                str(user_input),
-                                lstm_model,
-                                tokenizer,
-                                max_len=num_words,
-                            )
+                            if model_type == "N-gram":
+                                # Predict ranked completions of 'num_words' words using N-gram model
+                                completions = beam_search_next_words(
+                                    prev_tokens,
+                                    successor_index,
+                                    num_words,
+                                    beam_width=max(3, num_completions),
+                                    num_completions=num_completions,
+                                )
+                                next_word_prediction = " ".join(completions[0][0])
+                                st.session_state[f"{feature}_alternatives"] = [
+                                    str(user_input) + " " + " ".join(words)
+                                    for words, _ in completions
+                                ]
+                            else:
+                                # Predict the next 'num_words' words using LSTM model
+                                next_word_prediction = predict_next_words_lstm(
+                                    str(user_input),
+                                    lstm_model,
+                                    tokenizer,
+                                    max_len=num_words,
+                                )
                     # Update 'predicted_text' in the session state
                     st.session_state[f"{feature}_predicted_text"] = (
                         str(user_input) + " " + next_word_prediction
                     )
 
         with col2:
+            # Let the user pick among the ranked completions
+            alternatives = st.session_state[f"{feature}_alternatives"]
+            if len(alternatives) > 1:
+                st.session_state[f"{feature}_predicted_text"] = st.radio(
+                    "Ranked completions:", alternatives
+                )
+
             # Display the predicted text in a text area
             suggested_text = st.text_area(
                 "Predicted text:",
@@ -0,0 +1,377 @@
+"""
+Headless HTTP API of the correction and completion features.
+
+Endpoints, answering JSON except /metrics:
+    POST /correct   {"text": ..., "candidate_generator": "symspell"}
+    POST /complete  {"text": ..., "n_words": 3, "model": "ngram", "num_completions": 3}
+    POST /batch     {"requests": [{"type": "correct", "text": ...}, ...]}
+    GET  /health
+    GET  /metrics   (Prometheus text format)
+
+The parent process loads the models, opens the listening socket and forks
+the workers, so the models are shared copy-on-write. Each worker accepts
+connections on the shared socket with asyncio and runs the requests in a
+thread pool, at most --max-concurrency at once, each within --timeout
+seconds. A request past its timeout still runs to its end in its thread,
+holding its slot, so the work a request may ask for is bounded before it
+starts (see the limits in utils/service/api.py).
+
+With --metrics (or TEXTFLOW_METRICS=1), the time spent in each request and
+in each stage of the pipeline is recorded, and /metrics reports it with the
+cache and artifact gauges. Each worker keeps its own metrics, so a scrape
+sees the worker that accepted it.
+
+With --profile request, a request with the profile=1 query parameter (or a
+"profile" field) runs under the profiler, and with --profile all every
+request does; the profiles of the requests taking at least
+--profile-threshold-ms are written to --profile-dir (see
+utils/monitoring/profiling.py).
+
+Usage:
+    python src/server.py --port 8000 --workers 4 --metrics
+    python src/server.py --port 8000 --profile request --profile-threshold-ms 200
+    curl -X POST 'localhost:8000/correct?profile=1' -d '{"text": "helo wrld"}'
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl
+from utils.data.model_registry import FEATURE_ARTIFACTS, build_registry
+from utils.monitoring.metrics import metrics
+from utils.monitoring.profiling import PROFILE_MODES, profiler
+from utils.service.api import TextFlowService
+
+# Largest request body accepted
+MAX_BODY_BYTES = 1 << 20
+
+
+class Worker:
+    """
+    Serves HTTP/1.1 requests on a listening socket with one asyncio event loop.
+    """
+
+    def __init__(
+        self, service: TextFlowService, timeout: float = 5.0, max_concurrency: int = 4
+    ) -> None:
+        self.service = service
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.routes = {
+            ("POST", "/correct"): service.correct,
+            ("POST", "/complete"): service.complete,
+            ("POST", "/batch"): service.batch,
+        }
+
+    def serve(self, listener: socket.socket) -> None:
+        """
+        Serves the connections accepted on a socket until the process is terminated.
+
+        Parameters:
+        listener (socket.socket): The listening socket.
+
+        Returns:
+        None
+        """
+        asyncio.run(self._serve(listener))
+
+    async def _serve(self, listener: socket.socket) -> None:
+        self._executor = ThreadPoolExecutor(self.max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        stop = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set_result, None)
+        server = await asyncio.start_server(self._connection, sock=listener)
+        async with server:
+            await stop
+        self._executor.shutdown(wait=False)
+
+    async def _connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.timeout)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.TimeoutError:
+                    await self._respond(
+                        writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Request timeout"}, False
+                    )
+                    break
+                except ValueError as error:
+                    await self._respond(
+                        writer, HTTPStatus.BAD_REQUEST, {"error": str(error)}, False
+                    )
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                start = time.perf_counter()
+                status, response = await self._handle(method, path, query, body)
+                if (method, path) in self.routes:
+                    metrics.observe(f"http{path.replace('/', '_')}", time.perf_counter() - start)
+                    metrics.count(f"http_responses_{status.value}")
+                await self._respond(writer, status, response, keep_alive)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Tuple[str, str, Dict[str, str], Dict[str, str], bytes]:
+        # Parse the request line, the headers and the body of one request
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise ValueError("Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ValueError("Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        return method.upper(), path, dict(parse_qsl(query)), headers, body
+
+    async def _handle(
+        self, method: str, path: str, query: Dict[str, str], body: bytes
+    ) -> Tuple[HTTPStatus, Union[Dict[str, Any], str]]:
+        if path in ("/health", "/metrics"):
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use GET"}
+            if path == "/metrics":
+                return HTTPStatus.OK, metrics.to_prometheus()
+            return HTTPStatus.OK, self.service.health()
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown path: {path}"}
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "The body must be JSON"}
+        if not isinstance(payload, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "The body must be a JSON object"}
+        # The profiling switch may be a query parameter rather than a field
+        if "profile" in query:
+            payload["profile"] = query["profile"]
+        if "profile_threshold_ms" in query:
+            try:
+                payload["profile_threshold_ms"] = float(query["profile_threshold_ms"])
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {"error": "profile_threshold_ms must be a number"}
+
+        # Wait for a free slot, then for the result, within the same deadline
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Server busy"}
+        future = loop.run_in_executor(self._executor, handler, payload)
+        # The slot is freed when the work ends, even if the client got a timeout
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            response = await asyncio.wait_for(
+                asyncio.shield(future), max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": "Request timed out"}
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except Exception as error:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "error": f"{type(error).__name__}: {error}"
+            }
+        return HTTPStatus.OK, response
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        response: Union[Dict[str, Any], str],
+        keep_alive: bool,
+    ) -> None:
+        # Text responses are the Prometheus metrics, everything else is JSON
+        if isinstance(response, str):
+            body = response.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(response).encode("utf-8")
+            content_type = "application/json"
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+
+def run(
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    workers: int = 1,
+    model_dir: str = "src/models",
+    preload: Optional[List[str]] = None,
+    timeout: float = 5.0,
+    max_concurrency: int = 4,
+    enable_metrics: bool = False,
+    profile: Optional[str] = None,
+    profile_threshold_ms: Optional[float] = None,
+    profile_dir: Optional[str] = None,
+) -> None:
+    """
+    Loads the models, then serves the API with pre-forked worker processes.
+
+    Parameters:
+    host (str): The address to listen on. Default is "0.0.0.0".
+    port (int): The port to listen on. Default is 8000.
+    workers (int): The number of worker processes. Default is 1 (serve in this process).
+    model_dir (str): The directory containing the model artifacts. Default is "src/models".
+    preload (Optional[List[str]]): The features loaded before forking, keys of
+        FEATURE_ARTIFACTS or "all". Default is None (the n-gram features).
+    timeout (float): The time allowed to each request, in seconds. Default is 5.0.
+    max_concurrency (int): The number of requests run at once by each worker. Default is 4.
+    enable_metrics (bool): Whether to record the latency metrics reported by /metrics.
+        Default is False (unless TEXTFLOW_METRICS is set).
+    profile (Optional[str]): The profiling mode, "off", "request" or "all".
+        Default is None (TEXTFLOW_PROFILE, or "off").
+    profile_threshold_ms (Optional[float]): The shortest request whose profile is written.
+        Default is None (TEXTFLOW_PROFILE_THRESHOLD_MS, or 0).
+    profile_dir (Optional[str]): The directory of the profiles.
+        Default is None (TEXTFLOW_PROFILE_DIR, or "profiles").
+
+    Returns:
+    None
+    """
+    if enable_metrics:
+        metrics.enable()
+    profiler.configure(
+        profile,
+        None if profile_threshold_ms is None else profile_threshold_ms / 1e3,
+        profile_dir,
+    )
+    registry = build_registry(model_dir)
+    registry.warm_up(preload if preload is not None else ["ngram_completion", "correction"])
+    worker = Worker(TextFlowService(registry), timeout, max_concurrency)
+
+    listener = socket.create_server((host, port), backlog=1024)
+    listener.setblocking(False)
+    print(f"Serving on http://{host}:{port} with {workers} worker(s)", file=sys.stderr)
+    if workers <= 1:
+        try:
+            worker.serve(listener)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Forked after loading: the models are shared with the parent
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                worker.serve(listener)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def terminate(signum, frame) -> None:
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+    for child in children:
+        while True:
+            try:
+                os.waitpid(child, 0)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument(
+        "--preload",
+        default="ngram_completion,correction",
+        help=f"Features loaded before forking: {', '.join(FEATURE_ARTIFACTS)} or all",
+    )
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds allowed per request")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=4, help="Requests run at once per worker"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="Record the latency metrics reported by /metrics"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile no request, the requests asking for it, or all of them",
+    )
+    parser.add_argument(
+        "--profile-threshold-ms",
+        type=float,
+        default=None,
+        help="Only write the profiles of the requests taking at least this long",
+    )
+    parser.add_argument("--profile-dir", default=None, help="Directory of the profiles")
+    args = parser.parse_args()
+    preload = [feature.strip() for feature in args.preload.split(",") if feature.strip()]
+    unknown = [feature for feature in preload if feature != "all" and feature not in FEATURE_ARTIFACTS]
+    if unknown:
+        parser.error(
+            f"Unknown features: {', '.join(unknown)}; expected {', '.join(FEATURE_ARTIFACTS)} or all"
+        )
+
+    run(
+        args.host,
+        args.port,
+        args.workers,
+        args.model_dir,
+        preload,
+        args.timeout,
+        args.max_concurrency,
+        args.metrics,
+        args.profile,
+        args.profile_threshold_ms,
+        args.profile_dir,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
+import os
 import pickle
-import streamlit as st
-from typing import List, Any
-import tensorflow as tf
-import keras
+import warnings
+from typing import Any, Optional
+from utils.data.ngram_store import NgramStore, open_ngram_store
+from utils.data.vocabulary import Vocabulary
+from utils.prediction.numpy_lstm import JsonTokenizer, NumpyLSTMModel
+from utils.text_processing.symspell import SymSpellIndex, vocabulary_fingerprint
 
 
-@st.cache_data
 def load_pickle_file(file_path: str) -> Any:
     """
     Loads a pickle file from the given file path.
@@ -20,22 +22,21 @@ def load_pickle_file(file_path: str) -> Any:
         return pickle.load(f)
 
 
-@st.cache_data
-def load_vocab(file_path: str) -> List[str]:
+def load_vocab(file_path: str) -> Vocabulary:
     """
     Loads a vocabulary from a file. Each line in the file is considered a word in the vocabulary.
+    Repeated lines are counted and define the frequency rank of the word.
 
     Parameters:
     file_path (str): The path to the file containing the vocabulary.
 
     Returns:
-    List[str]: The list of words in the vocabulary.
+    Vocabulary: The interned vocabulary.
     """
     with open(file_path, "r") as f:
-        return [line.strip() for line in f]
+        return Vocabulary(line.strip() for line in f)
 
 
-@st.cache_data
 def load_h5_model(file_path: str):
     """
     Loads a model from an .h5 file.
@@ -46,4 +47,118 @@ def load_h5_model(file_path: str):
     Returns:
     Model: The loaded model.
     """
+    # Imported here so that the n-gram features never load TensorFlow
+    import keras
+
     return keras.models.load_model(file_path)
+
+
+def load_lstm_model(weights_path: str, h5_path: str):
+    """
+    Loads the LSTM model, preferring the exported NumPy weights over the Keras
+    model when they have been generated.
+
+    Parameters:
+    weights_path (str): The path to the .npz weights written by the exporter.
+    h5_path (str): The path to the .h5 Keras model.
+
+    Returns:
+    Model: The loaded model, a NumpyLSTMModel or a Keras model.
+    """
+    if os.path.exists(weights_path):
+        return NumpyLSTMModel.load(weights_path)
+    return load_h5_model(h5_path)
+
+
+def load_tokenizer(json_path: str, pickle_path: str):
+    """
+    Loads the LSTM tokenizer, preferring the exported JSON word index over the
+    pickled Keras tokenizer when it has been generated.
+
+    Parameters:
+    json_path (str): The path to the JSON tokenizer written by the exporter.
+    pickle_path (str): The path to the pickled Keras tokenizer.
+
+    Returns:
+    Tokenizer: The loaded tokenizer, a JsonTokenizer or a Keras tokenizer.
+    """
+    if os.path.exists(json_path):
+        return JsonTokenizer.load(json_path)
+    return load_pickle_file(pickle_path)
+
+
+def load_ngram_store(file_path: str) -> Optional[NgramStore]:
+    """
+    Memory-maps the compact n-gram store.
+
+    Parameters:
+    file_path (str): The path to the n-gram store file.
+
+    Returns:
+    Optional[NgramStore]: The opened store, or None if the file does not exist.
+    """
+    return open_ngram_store(file_path)
+
+
+def load_count_table(
+    name: str, model_dir: str = "src/models", store: Optional[NgramStore] = None
+) -> Any:
+    """
+    Loads an n-gram count table, preferring the compact memory-mapped store
+    over the pickled dictionary when it has been generated, unless the pickle
+    was modified after the store, which is then out of date.
+
+    Parameters:
+    name (str): The name of the table, e.g. "bigram_counter".
+    model_dir (str): The directory containing the model artifacts. Default is "src/models".
+    store (Optional[NgramStore]): An already opened store. Default is None (open it).
+
+    Returns:
+    Any: A dict-like mapping from n-grams to counts.
+    """
+    if store is None:
+        store = load_ngram_store(os.path.join(model_dir, "ngram_store.bin"))
+    pickle_path = os.path.join(model_dir, f"{name}.pkl")
+    if store is not None and name in store:
+        if not os.path.exists(pickle_path) or os.path.getmtime(
+            pickle_path
+        ) <= os.path.getmtime(store.file_path):
+            return store[name]
+        warnings.warn(
+            f"{pickle_path} is newer than the n-gram store {store.file_path}, "
+            "loading the pickle instead; convert it again to use the store"
+        )
+    return load_pickle_file(pickle_path)
+
+
+def load_symspell_index(
+    file_path: str, vocab: Vocabulary, max_distance: int = 2
+) -> SymSpellIndex:
+    """
+    Loads the symmetric-delete candidate index, building it from the vocabulary
+    and saving it next to the other artifacts if it does not exist yet, if it
+    cannot be loaded (an unreadable or outdated file), or if it was built from
+    another vocabulary.
+
+    Parameters:
+    file_path (str): The path to the pickled index.
+    vocab (Vocabulary): The vocabulary to index.
+    max_distance (int): The maximum edit distance of the index. Default is 2.
+
+    Returns:
+    SymSpellIndex: The candidate index.
+    """
+    if os.path.exists(file_path):
+        try:
+            index = SymSpellIndex.load(file_path)
+        except (OSError, EOFError, AttributeError, KeyError, ValueError, pickle.UnpicklingError):
+            index = None
+        if (
+            index is not None
+            and index.max_distance >= max_distance
+            and index.fingerprint == vocabulary_fingerprint(vocab)
+        ):
+            return index
+    index = SymSpellIndex(vocab, max_distance)
+    index.save(file_path)
+    return index
@@ -0,0 +1,360 @@
+import argparse
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.data.load_data import (
+    load_count_table,
+    load_lstm_model,
+    load_ngram_store,
+    load_symspell_index,
+    load_tokenizer,
+    load_vocab,
+)
+from utils.monitoring.metrics import metrics
+from utils.prediction.batching import BatchingPredictor
+from utils.prediction.correction_cache import correction_cache
+from utils.prediction.prediction_cache import prediction_cache
+from utils.prediction.scoring import CorrectionScorer
+from utils.prediction.successor_index import SuccessorIndex
+from utils.text_processing.edit_distance import edits1, edits2
+from utils.text_processing.trie import VocabularyTrie
+
+# The artifacts needed by each feature of the app
+FEATURE_ARTIFACTS: Dict[str, Tuple[str, ...]] = {
+    "ngram_completion": ("vocab", "ngram_counts", "nplus1gram_counts", "successor_index"),
+    "correction": (
+        "vocab",
+        "unigram_counter",
+        "bigram_counter",
+        "trigram_counter",
+        "correction_scorer",
+    ),
+    "lstm_completion": ("lstm_model", "lstm_predictor", "tokenizer"),
+}
+
+
+def resident_memory() -> int:
+    """
+    Returns the resident memory of the process in bytes.
+
+    Returns:
+    int: The resident set size, or the peak resident set size where it is not available.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model artifact exactly once, on first use.
+
+    Every artifact is registered with a loader and the names of the artifacts
+    it is built from. Dependencies are loaded first, so the load time and the
+    resident memory growth recorded for an artifact are its own. Concurrent
+    sessions asking for the same artifact wait for a single load.
+    """
+
+    def __init__(self) -> None:
+        self._loaders: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+        self._artifacts: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[..., Any],
+        dependencies: Sequence[str] = (),
+    ) -> None:
+        """
+        Registers an artifact.
+
+        Parameters:
+        name (str): The name of the artifact.
+        loader (Callable[..., Any]): The function loading the artifact, called with the
+            dependencies in order.
+        dependencies (Sequence[str]): The names of the artifacts the loader needs. Default is ().
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._loaders[name] = (loader, tuple(dependencies))
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """
+        Returns an artifact, loading it (and its dependencies) on first use.
+
+        Parameters:
+        name (str): The name of the artifact.
+
+        Returns:
+        Any: The loaded artifact.
+        """
+        if name in self._artifacts:
+            return self._artifacts[name]
+
+        loader, dependencies = self._loaders[name]
+        arguments = [self.get(dependency) for dependency in dependencies]
+        with self._locks[name]:
+            # Another session may have loaded it while we were waiting
+            if name in self._artifacts:
+                return self._artifacts[name]
+
+            memory_before = resident_memory()
+            start = time.perf_counter()
+            artifact = loader(*arguments)
+            self._stats[name] = {
+                "load_seconds": time.perf_counter() - start,
+                "memory_bytes": max(0, resident_memory() - memory_before),
+            }
+            metrics.observe("artifact_load", self._stats[name]["load_seconds"])
+            metrics.set_gauge("artifact_load_seconds", self._stats[name]["load_seconds"], artifact=name)
+            metrics.set_gauge("artifact_memory_bytes", self._stats[name]["memory_bytes"], artifact=name)
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._artifacts[name] = artifact
+            return artifact
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._artifacts
+
+    def version(self, name: str) -> int:
+        """
+        Returns how many times an artifact has been loaded, 0 if it never was.
+
+        Parameters:
+        name (str): The name of the artifact.
+
+        Returns:
+        int: The version of the artifact.
+        """
+        return self._versions.get(name, 0)
+
+    def reload(self, name: str) -> None:
+        """
+        Drops an artifact and the artifacts built from it, so they are loaded again on next use.
+
+        Parameters:
+        name (str): The name of the artifact.
+
+        Returns:
+        None
+        """
+        # Collect the artifact and everything built from it, directly or not
+        dropped = [name]
+        for artifact in dropped:
+            for other, (_, dependencies) in self._loaders.items():
+                if artifact in dependencies and other not in dropped:
+                    dropped.append(other)
+        for artifact in dropped:
+            with self._locks[artifact]:
+                self._artifacts.pop(artifact, None)
+                self._stats.pop(artifact, None)
+        for listener in self._listeners:
+            for artifact in dropped:
+                listener(artifact)
+
+    def on_reload(self, listener: Callable[[str], None]) -> None:
+        """
+        Registers a function called with the name of every artifact dropped by `reload`.
+
+        Parameters:
+        listener (Callable[[str], None]): The function to call.
+
+        Returns:
+        None
+        """
+        self._listeners.append(listener)
+
+    def warm_up(self, features: Iterable[str]) -> None:
+        """
+        Eagerly loads the artifacts of the given features, after checking that they
+        are all known, raising ValueError otherwise.
+
+        Parameters:
+        features (Iterable[str]): The features to load, keys of FEATURE_ARTIFACTS, or "all".
+
+        Returns:
+        None
+        """
+        features = list(features)
+        unknown = [
+            feature for feature in features if feature != "all" and feature not in FEATURE_ARTIFACTS
+        ]
+        if unknown:
+            raise ValueError(
+                f"Unknown features: {', '.join(unknown)}; "
+                f"expected {', '.join(FEATURE_ARTIFACTS)} or all"
+            )
+        for feature in features:
+            names = (
+                FEATURE_ARTIFACTS[feature]
+                if feature != "all"
+                else tuple(name for names in FEATURE_ARTIFACTS.values() for name in names)
+            )
+            for name in names:
+                self.get(name)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the load time and resident memory growth of each loaded artifact.
+
+        Returns:
+        Dict[str, Dict[str, float]]: The statistics by artifact name.
+        """
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def build_registry(model_dir: str = "src/models") -> ModelRegistry:
+    """
+    Creates a registry of the app's artifacts stored in a model directory.
+
+    Parameters:
+    model_dir (str): The directory containing the model artifacts. Default is "src/models".
+
+    Returns:
+    ModelRegistry: The registry, with nothing loaded yet.
+    """
+    registry = ModelRegistry()
+
+    def path(name: str) -> str:
+        return os.path.join(model_dir, name)
+
+    registry.register("vocab", lambda: load_vocab(path("vocabulary.txt")))
+    registry.register("ngram_store", lambda: load_ngram_store(path("ngram_store.bin")))
+    for table in (
+        "unigram_counter",
+        "bigram_counter",
+        "trigram_counter",
+        "ngram_counts",
+        "nplus1gram_counts",
+    ):
+        registry.register(
+            table,
+            lambda store, table=table: load_count_table(table, model_dir, store),
+            ("ngram_store",),
+        )
+    registry.register(
+        "successor_index",
+        SuccessorIndex,
+        ("ngram_counts", "nplus1gram_counts", "vocab"),
+    )
+    registry.register(
+        "correction_scorer",
+        CorrectionScorer,
+        ("vocab", "unigram_counter", "bigram_counter", "trigram_counter"),
+    )
+    registry.register(
+        "symspell_index",
+        lambda vocab: load_symspell_index(path("symspell_index.pkl"), vocab),
+        ("vocab",),
+    )
+    registry.register("vocabulary_trie", VocabularyTrie, ("vocab",))
+    registry.register(
+        "lstm_model",
+        lambda: load_lstm_model(path("lstm_weights.npz"), path("model.h5")),
+    )
+    # Batches the forward passes of the LSTM across sessions
+    registry.register("lstm_predictor", BatchingPredictor, ("lstm_model",))
+    registry.register(
+        "tokenizer",
+        lambda: load_tokenizer(path("tokenizer.json"), path("tokenizer.pkl")),
+    )
+    # Cached corrections and predictions keep the models they were computed with alive
+    registry.on_reload(correction_cache.invalidate)
+    registry.on_reload(prediction_cache.invalidate)
+    return registry
+
+
+def correction_models(
+    registry: ModelRegistry, candidate_generator: str = "symspell", max_distance: int = 2
+) -> Tuple[Any, ...]:
+    """
+    Gets the models used to correct text, as the correct_words arguments after the words.
+
+    Parameters:
+    registry (ModelRegistry): The registry to load the models from.
+    candidate_generator (str): "symspell", "trie" or "edits", how the candidates of a
+        misspelled word are found. Default is "symspell".
+    max_distance (int): The maximum edit distance of the trie candidates. Default is 2.
+
+    Returns:
+    Tuple[Any, ...]: The vocabulary, edit functions, n-gram counts, candidate generator and scorer.
+    """
+    if candidate_generator not in ("symspell", "trie", "edits"):
+        raise ValueError(f"Unknown candidate generator: {candidate_generator}")
+    generator: Optional[Callable] = None
+    if candidate_generator == "symspell":
+        generator = registry.get("symspell_index")
+    elif candidate_generator == "trie":
+        generator = registry.get("vocabulary_trie").candidate_generator(max_distance)
+    return (
+        registry.get("vocab"),
+        edits1,
+        edits2,
+        registry.get("unigram_counter"),
+        registry.get("bigram_counter"),
+        registry.get("trigram_counter"),
+        generator,
+        registry.get("correction_scorer"),
+    )
+
+
+# Registry shared by every session of the process
+registry = build_registry()
+
+
+def warm_up_from_environment(variable: str = "TEXTFLOW_WARMUP") -> None:
+    """
+    Eagerly loads the features listed, comma separated, in an environment variable.
+
+    Parameters:
+    variable (str): The name of the environment variable. Default is "TEXTFLOW_WARMUP".
+
+    Returns:
+    None
+    """
+    features = [
+        feature.strip()
+        for feature in os.environ.get(variable, "").split(",")
+        if feature.strip()
+    ]
+    registry.warm_up(features)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load the model artifacts and report their load time and memory."
+    )
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument(
+        "features",
+        nargs="*",
+        default=["all"],
+        help=f"Features to load: {', '.join(FEATURE_ARTIFACTS)} or all",
+    )
+    args = parser.parse_args()
+
+    report_registry = build_registry(args.model_dir)
+    try:
+        report_registry.warm_up(args.features)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{'artifact':<20} {'load (s)':>10} {'memory (MB)':>12}")
+    for name, stats in report_registry.stats().items():
+        print(
+            f"{name:<20} {stats['load_seconds']:>10.2f} {stats['memory_bytes'] / 2**20:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Builds the vocabulary and the n-gram count tables from a text corpus.
+
+The corpus files are split into byte ranges counted in parallel by worker
+processes. Each worker streams its lines through `text_processing` and
+counts the unigrams through (n+1)-grams; when its counters reach its share
+of the memory ceiling, it writes them to disk as sorted runs, partitioned
+into shards by the first word of the n-grams. The runs of each shard are
+then merged, summing the counts and dropping the n-grams seen fewer than
+`--min-count` times, and the merged tables are written as `vocabulary.txt`,
+the pickled count tables and the compact n-gram store.
+
+Usage:
+    cd src && python -m utils.data.ngram_builder ../corpus.txt --output-dir models --n 2 --min-count 2
+"""
+import argparse
+import heapq
+import itertools
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from utils.data.ngram_store import write_ngram_store
+from utils.text_processing.text_preprocessing import text_processing
+
+# Approximate memory taken by one counter entry: the dict slot, the key tuple and the count
+BYTES_PER_ENTRY = 200
+
+# Smallest byte range of a corpus file counted by one task
+MIN_SPLIT_BYTES = 1 << 20
+
+# Number of (n-gram, count) pairs pickled together in a run file
+RUN_BLOCK_SIZE = 10000
+
+Ngram = Tuple[str, ...]
+# (path, start, end) of a byte range of a corpus file
+Split = Tuple[str, int, int]
+
+
+def shard_of(ngram: Ngram, shards: int) -> int:
+    """
+    Returns the shard of an n-gram, the same in every process.
+
+    Parameters:
+    ngram (Ngram): The n-gram.
+    shards (int): The number of shards.
+
+    Returns:
+    int: The shard, from 0 to shards - 1.
+    """
+    return zlib.crc32(ngram[0].encode("utf-8")) % shards
+
+
+def write_run(file_path: str, items: Iterator[Tuple[Ngram, int]]) -> None:
+    """
+    Writes sorted (n-gram, count) pairs to a run file, in blocks.
+
+    Parameters:
+    file_path (str): The path of the run file.
+    items (Iterator[Tuple[Ngram, int]]): The pairs, sorted by n-gram.
+
+    Returns:
+    None
+    """
+    with open(file_path, "wb") as f:
+        while True:
+            block = list(itertools.islice(items, RUN_BLOCK_SIZE))
+            if not block:
+                break
+            pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+
+
+def read_run(file_path: str) -> Iterator[Tuple[Ngram, int]]:
+    """
+    Reads the (n-gram, count) pairs of a run file, one block at a time.
+
+    Parameters:
+    file_path (str): The path of the run file.
+
+    Yields:
+    Tuple[Ngram, int]: The pairs, in the order they were written.
+    """
+    with open(file_path, "rb") as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+class MergedRuns:
+    """
+    The counts of one n-gram order, read from its merged runs on disk each time
+    they are iterated, so that a table is written without being held in memory.
+
+    Supports the part of the dict API used by `write_ngram_store`: `len`,
+    iteration over the n-grams, `keys`, `values` and `items`.
+    """
+
+    def __init__(self, run_paths: Sequence[str], size: int, scalar_keys: bool = False) -> None:
+        self.run_paths = list(run_paths)
+        self.size = size
+        self.scalar_keys = scalar_keys
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Union[str, Ngram]]:
+        return self.keys()
+
+    def keys(self) -> Iterator[Union[str, Ngram]]:
+        return (ngram for ngram, _ in self.items())
+
+    def values(self) -> Iterator[int]:
+        return (count for _, count in self.items())
+
+    def items(self) -> Iterator[Tuple[Union[str, Ngram], int]]:
+        for path in self.run_paths:
+            for ngram, count in read_run(path):
+                yield (ngram[0] if self.scalar_keys else ngram), count
+
+
+def iter_splits(paths: Sequence[str], splits_per_file: int) -> Iterator[Split]:
+    """
+    Splits corpus files into byte ranges of at least MIN_SPLIT_BYTES.
+
+    Parameters:
+    paths (Sequence[str]): The corpus files.
+    splits_per_file (int): The maximum number of ranges of each file.
+
+    Yields:
+    Split: The path, start and end of each range.
+    """
+    for path in paths:
+        size = os.path.getsize(path)
+        count = max(1, min(splits_per_file, size // MIN_SPLIT_BYTES))
+        bounds = [size * i // count for i in range(count + 1)]
+        for start, end in zip(bounds, bounds[1:]):
+            yield path, start, end
+
+
+def iter_split_lines(split: Split) -> Iterator[str]:
+    """
+    Reads the lines starting inside a byte range of a file.
+
+    A line crossing the end of the range belongs to that range, and a line
+    crossing its start to the previous one, so the ranges of a file read
+    every line exactly once.
+
+    Parameters:
+    split (Split): The path, start and end of the range.
+
+    Yields:
+    str: The decoded lines.
+    """
+    path, start, end = split
+    with open(path, "rb") as f:
+        if start > 0:
+            # Skip the end of the line started in the previous range
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode("utf-8", errors="replace")
+
+
+def count_split(
+    split: Split,
+    orders: Sequence[int],
+    shards: int,
+    max_entries: int,
+    spill_dir: str,
+    task: int,
+) -> Tuple[Dict[Tuple[int, int], List[str]], int, int]:
+    """
+    Counts the n-grams of a byte range, spilling them to sorted runs whenever
+    the counters hold more than `max_entries` n-grams.
+
+    Parameters:
+    split (Split): The path, start and end of the range.
+    orders (Sequence[int]): The n-gram orders to count.
+    shards (int): The number of shards of the runs.
+    max_entries (int): The number of n-grams held in memory before spilling.
+    spill_dir (str): The directory of the run files.
+    task (int): The number of the task, used to name its run files.
+
+    Returns:
+    Tuple[Dict[Tuple[int, int], List[str]], int, int]: The run files of each
+        (order, shard), the number of lines and the number of tokens.
+    """
+    counters = {order: Counter() for order in orders}
+    runs: Dict[Tuple[int, int], List[str]] = {}
+    spills = lines_count = tokens_count = 0
+
+    def spill() -> None:
+        nonlocal spills
+        for order, counter in counters.items():
+            sharded: Dict[int, List[Tuple[Ngram, int]]] = {}
+            for item in counter.items():
+                sharded.setdefault(shard_of(item[0], shards), []).append(item)
+            for shard, items in sharded.items():
+                file_path = os.path.join(spill_dir, f"run-{task}-{spills}-{order}-{shard}.pkl")
+                items.sort()
+                write_run(file_path, iter(items))
+                runs.setdefault((order, shard), []).append(file_path)
+            counter.clear()
+        spills += 1
+
+    for line in iter_split_lines(split):
+        tokens = text_processing(line)
+        lines_count += 1
+        tokens_count += len(tokens)
+        for order, counter in counters.items():
+            counter.update(zip(*(tokens[i:] for i in range(order))))
+        if sum(len(counter) for counter in counters.values()) > max_entries:
+            spill()
+    spill()
+    return runs, lines_count, tokens_count
+
+
+def _count_split(args: tuple) -> Tuple[Dict[Tuple[int, int], List[str]], int, int]:
+    return count_split(*args)
+
+
+def merge_runs(
+    run_paths: Sequence[str], output_path: str, min_count: int = 1
+) -> Tuple[int, int]:
+    """
+    Merges sorted runs into one, summing the counts of each n-gram and dropping
+    the n-grams counted fewer than `min_count` times. The input runs are deleted.
+
+    Parameters:
+    run_paths (Sequence[str]): The run files to merge.
+    output_path (str): The path of the merged run.
+    min_count (int): The minimum count of the n-grams kept. Default is 1.
+
+    Returns:
+    Tuple[int, int]: The number of distinct n-grams and the number kept.
+    """
+    merged = heapq.merge(*(read_run(path) for path in run_paths))
+    distinct = kept = 0
+
+    def summed() -> Iterator[Tuple[Ngram, int]]:
+        nonlocal distinct, kept
+        for ngram, group in itertools.groupby(merged, key=lambda item: item[0]):
+            distinct += 1
+            count = sum(item[1] for item in group)
+            if count >= min_count:
+                kept += 1
+                yield ngram, count
+
+    write_run(output_path, summed())
+    for path in run_paths:
+        os.remove(path)
+    return distinct, kept
+
+
+def _merge_runs(args: tuple) -> Tuple[int, int]:
+    return merge_runs(*args)
+
+
+def build_ngram_models(
+    corpus_paths: Sequence[str],
+    output_dir: str = "src/models",
+    n: int = 2,
+    min_count: int = 1,
+    workers: int = 1,
+    memory_mb: int = 1024,
+    shards: int = 0,
+    spill_dir: Optional[str] = None,
+    write_pickles: bool = True,
+    write_store: bool = True,
+) -> Dict[str, float]:
+    """
+    Counts the n-grams of a corpus and writes the vocabulary and the count tables.
+
+    Counting uses at most about `memory_mb` megabytes across the workers. To
+    write the pickles, the count tables left after the `min_count` cutoff are
+    loaded in memory, as they are by the app; without them, the merged runs are
+    streamed into the compact store, and only the unigrams are held in memory.
+
+    Parameters:
+    corpus_paths (Sequence[str]): The corpus files, read line by line.
+    output_dir (str): The directory of the artifacts. Default is "src/models".
+    n (int): The order of the completion model: "ngram_counts" holds the n-grams
+        and "nplus1gram_counts" the (n+1)-grams. Default is 2.
+    min_count (int): The minimum count of the n-grams and words kept. Default is 1.
+    workers (int): The number of worker processes, 1 to count in this process. Default is 1.
+    memory_mb (int): The memory ceiling of the counters, in megabytes, not including the
+        count tables loaded to write the pickles. Default is 1024.
+    shards (int): The number of shards merged in parallel. Default is 0 (one per worker).
+    spill_dir (Optional[str]): The parent directory of the run files. Default is None (the
+        system temporary directory).
+    write_pickles (bool): Whether to write the pickled count tables. Default is True.
+    write_store (bool): Whether to write the compact n-gram store. Default is True.
+
+    Returns:
+    Dict[str, float]: The number of lines, tokens and n-grams of each order before
+        and after the cutoff, and the time taken.
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    start = time.perf_counter()
+    workers = max(1, workers)
+    shards = shards or workers
+    orders = list(range(1, max(3, n + 1) + 1))
+    max_entries = max(1, memory_mb * (1 << 20) // workers // BYTES_PER_ENTRY)
+    stats: Dict[str, float] = {"lines": 0, "tokens": 0}
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    mapper = pool.imap_unordered if pool is not None else map
+    try:
+        with tempfile.TemporaryDirectory(prefix="ngrams-", dir=spill_dir) as run_dir:
+            # Count the splits, spilling sorted runs by (order, shard)
+            tasks = [
+                (split, orders, shards, max_entries, run_dir, task)
+                for task, split in enumerate(iter_splits(corpus_paths, workers))
+            ]
+            runs: Dict[Tuple[int, int], List[str]] = {}
+            for task_runs, lines_count, tokens_count in mapper(_count_split, tasks):
+                stats["lines"] += lines_count
+                stats["tokens"] += tokens_count
+                for key, paths in task_runs.items():
+                    runs.setdefault(key, []).extend(paths)
+
+            # Merge the runs of each (order, shard) and apply the cutoff
+            merges = [
+                (paths, os.path.join(run_dir, f"merged-{order}-{shard}.pkl"), min_count)
+                for (order, shard), paths in sorted(runs.items())
+            ]
+            merged = list(mapper(_merge_runs, merges)) if pool is None else pool.map(_merge_runs, merges)
+            merged_paths: Dict[int, List[str]] = {order: [] for order in orders}
+            for (order, _), (distinct, kept), (_, merged_path, _) in zip(
+                sorted(runs), merged, merges
+            ):
+                stats[f"{order}-grams"] = stats.get(f"{order}-grams", 0) + distinct
+                stats[f"{order}-grams kept"] = stats.get(f"{order}-grams kept", 0) + kept
+                merged_paths[order].append(merged_path)
+
+            tables: Dict[int, Mapping[Ngram, int]] = {}
+            for order, paths in merged_paths.items():
+                if write_pickles:
+                    tables[order] = dict(itertools.chain.from_iterable(map(read_run, paths)))
+                else:
+                    tables[order] = MergedRuns(paths, int(stats.get(f"{order}-grams kept", 0)))
+            write_ngram_models(output_dir, tables, n, write_pickles, write_store)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def write_ngram_models(
+    output_dir: str,
+    tables: Dict[int, Mapping[Ngram, int]],
+    n: int,
+    write_pickles: bool = True,
+    write_store: bool = True,
+) -> None:
+    """
+    Writes the vocabulary and the count tables in the formats loaded by the app.
+
+    Parameters:
+    output_dir (str): The directory of the artifacts.
+    tables (Dict[int, Mapping[Ngram, int]]): The counts of the n-grams of each order,
+        from 1 to at least max(3, n + 1), as dicts or, to only write the store,
+        as MergedRuns.
+    n (int): The order of the completion model.
+    write_pickles (bool): Whether to write the pickled count tables. Default is True.
+    write_store (bool): Whether to write the compact n-gram store. Default is True.
+
+    Returns:
+    None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    unigram_counter = {ngram[0]: count for ngram, count in tables[1].items()}
+    count_tables = {
+        "unigram_counter": unigram_counter,
+        "bigram_counter": tables[2],
+        "trigram_counter": tables[3],
+        "ngram_counts": tables[n],
+        "nplus1gram_counts": tables[n + 1],
+    }
+
+    # One word per line, the most frequent first, so the file order is the frequency rank
+    with open(os.path.join(output_dir, "vocabulary.txt"), "w", encoding="utf-8") as f:
+        for word in sorted(unigram_counter, key=lambda word: (-unigram_counter[word], word)):
+            f.write(word + "\n")
+
+    if write_pickles:
+        for name, counts in count_tables.items():
+            with open(os.path.join(output_dir, f"{name}.pkl"), "wb") as f:
+                pickle.dump(counts, f, pickle.HIGHEST_PROTOCOL)
+    store_path = os.path.join(output_dir, "ngram_store.bin")
+    if write_store:
+        write_ngram_store(store_path, count_tables)
+    elif os.path.exists(store_path):
+        # The store is preferred over the pickles when loading, so it would hide them
+        os.remove(store_path)
+
+    # The candidate index is derived from the vocabulary, it is rebuilt on first use
+    index_path = os.path.join(output_dir, "symspell_index.pkl")
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the vocabulary and the n-gram count tables from a text corpus."
+    )
+    parser.add_argument("corpus", nargs="+", help="Text files, read line by line")
+    parser.add_argument("--output-dir", default="src/models")
+    parser.add_argument("--n", type=int, default=2, help="Order of the completion model")
+    parser.add_argument("--min-count", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--memory-mb",
+        type=int,
+        default=1024,
+        help="Memory ceiling of the counters; writing the pickles also loads the full "
+        "count tables in memory, which --no-pickles avoids",
+    )
+    parser.add_argument("--shards", type=int, default=0, help="Default is one per worker")
+    parser.add_argument("--spill-dir", default=None, help="Directory of the temporary run files")
+    parser.add_argument("--no-pickles", action="store_true", help="Only write the compact store")
+    parser.add_argument("--no-store", action="store_true", help="Only write the pickles")
+    args = parser.parse_args()
+    if args.no_pickles and args.no_store:
+        parser.error("--no-pickles and --no-store cannot be used together")
+
+    stats = build_ngram_models(
+        args.corpus,
+        args.output_dir,
+        args.n,
+        args.min_count,
+        args.workers,
+        args.memory_mb,
+        args.shards,
+        args.spill_dir,
+        not args.no_pickles,
+        not args.no_store,
+    )
+    orders = sorted(int(key.split("-")[0]) for key in stats if key.endswith("-grams"))
+    print(
+        f"Counted {stats['lines']:.0f} lines and {stats['tokens']:.0f} tokens in "
+        f"{stats['seconds']:.2f} s; kept "
+        + ", ".join(
+            f"{stats[f'{order}-grams kept']:.0f}/{stats[f'{order}-grams']:.0f} {order}-grams"
+            for order in orders
+        ),
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
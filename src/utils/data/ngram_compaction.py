@@ -0,0 +1,223 @@
+"""
+Compacts the n-gram count tables into a pruned, quantized n-gram store and
+reports what it costs.
+
+The n-grams of order 2 and more seen fewer than `--min-count` times are
+dropped, and their counts are estimated from the lower orders when scoring.
+The remaining counts are quantized to `--count-bits` bits. The report
+compares the memory taken by the pickled tables with the size of the store,
+and the corrections and next-word predictions made with both on a held-out
+text: how often they agree, and how often each one is right.
+
+Usage:
+    cd src && python -m utils.data.ngram_compaction --model-dir models --min-count 2 --count-bits 8 --heldout ../heldout.txt
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import tracemalloc
+from typing import Any, Dict, List, Optional
+from utils.data.load_data import load_vocab
+from utils.data.ngram_store import COUNT_TABLES, NgramStore, convert_pickles_to_store
+from utils.prediction.correction_cache import CorrectionCache
+from utils.prediction.scoring import CorrectionScorer
+from utils.prediction.successor_index import SuccessorIndex
+from utils.prediction.text_correction import correct_words
+from utils.text_processing.edit_distance import edits1, edits2
+from utils.text_processing.symspell import SymSpellIndex
+from utils.text_processing.text_preprocessing import text_processing
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def misspell(generator: random.Random, word: str) -> str:
+    """
+    Replaces, inserts or deletes one letter of a word at random.
+
+    Parameters:
+    generator (random.Random): The random generator.
+    word (str): The word.
+
+    Returns:
+    str: The misspelled word.
+    """
+    position = generator.randrange(len(word) + 1)
+    edit = generator.randrange(3)
+    if edit == 0:
+        return word[:position] + generator.choice(LETTERS) + word[position + 1 :]
+    if edit == 1:
+        return word[:position] + generator.choice(LETTERS) + word[position:]
+    return word[: position - 1] + word[position:] if position else word[1:]
+
+
+def _agreement(matches: int, total: int) -> float:
+    return matches / total if total else 1.0
+
+
+def compaction_report(
+    model_dir: str,
+    store_path: str,
+    heldout_path: Optional[str] = None,
+    max_lines: int = 500,
+    typo_rate: float = 0.2,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Compares a compacted n-gram store with the pickled count tables it was made from.
+
+    Parameters:
+    model_dir (str): The directory containing the pickled count tables and the vocabulary.
+    store_path (str): The path of the compacted store.
+    heldout_path (Optional[str]): A text file, one input per line, not used to count the
+        n-grams. Default is None (only compare the sizes).
+    max_lines (int): The number of held-out lines used. Default is 500.
+    typo_rate (float): The fraction of held-out words misspelled to be corrected. Default is 0.2.
+    seed (int): The seed of the misspellings. Default is 0.
+
+    Returns:
+    Dict[str, Any]: The memory of the pickled tables and the size of the store in bytes,
+        the number of n-grams of each table before and after pruning, the rates of
+        identical corrections and next-word predictions with both, and the accuracy of
+        each, the rate of misspelled words corrected back and of next words predicted.
+    """
+    # Memory taken by the count dicts once loaded, as the app holds them
+    tracemalloc.start()
+    tables = {}
+    for name in COUNT_TABLES:
+        with open(os.path.join(model_dir, f"{name}.pkl"), "rb") as f:
+            tables[name] = pickle.load(f)
+    pickle_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    store = NgramStore(store_path)
+    report: Dict[str, Any] = {
+        "pickle_bytes": pickle_bytes,
+        "store_bytes": os.path.getsize(store_path),
+        "tables": {name: (len(tables[name]), len(store[name])) for name in COUNT_TABLES},
+    }
+    if heldout_path is None:
+        return report
+
+    vocab = load_vocab(os.path.join(model_dir, "vocabulary.txt"))
+    symspell = SymSpellIndex(vocab, 2)
+    models = {
+        "pickle": {name: tables[name] for name in COUNT_TABLES},
+        "store": {name: store[name] for name in COUNT_TABLES},
+    }
+    correctors = {
+        kind: (
+            vocab,
+            edits1,
+            edits2,
+            counts["unigram_counter"],
+            counts["bigram_counter"],
+            counts["trigram_counter"],
+            symspell,
+            CorrectionScorer(
+                vocab,
+                counts["unigram_counter"],
+                counts["bigram_counter"],
+                counts["trigram_counter"],
+            ),
+        )
+        for kind, counts in models.items()
+    }
+    successors = {
+        kind: SuccessorIndex(counts["ngram_counts"], counts["nplus1gram_counts"], vocab)
+        for kind, counts in models.items()
+    }
+
+    generator = random.Random(seed)
+    corrections = corrections_matched = predictions = predictions_matched = 0
+    corrections_right = {kind: 0 for kind in models}
+    predictions_right = {kind: 0 for kind in models}
+    with open(heldout_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if line_number >= max_lines:
+                break
+            words = text_processing(line)
+            typos: List[str] = [
+                misspell(generator, word)
+                if word.isalpha() and generator.random() < typo_rate
+                else word
+                for word in words
+            ]
+            corrected = {
+                kind: correct_words(typos, *models_args, cache=CorrectionCache(0, 0))
+                for kind, models_args in correctors.items()
+            }
+            for typo, word, pickle_word, store_word in zip(
+                typos, words, corrected["pickle"], corrected["store"]
+            ):
+                if typo != word:
+                    corrections += 1
+                    corrections_matched += pickle_word == store_word
+                    corrections_right["pickle"] += pickle_word == word
+                    corrections_right["store"] += store_word == word
+
+            for end in range(1, len(words)):
+                predicted = {
+                    kind: next(iter(index.top_k(words[:end], 1)), (None, 0.0))[0]
+                    for kind, index in successors.items()
+                }
+                predictions += 1
+                predictions_matched += predicted["pickle"] == predicted["store"]
+                for kind, word in predicted.items():
+                    predictions_right[kind] += word == words[end]
+
+    report["corrections"] = corrections
+    report["correction_agreement"] = _agreement(corrections_matched, corrections)
+    report["correction_accuracy"] = {
+        kind: _agreement(right, corrections) for kind, right in corrections_right.items()
+    }
+    report["predictions"] = predictions
+    report["prediction_agreement"] = _agreement(predictions_matched, predictions)
+    report["prediction_accuracy"] = {
+        kind: _agreement(right, predictions) for kind, right in predictions_right.items()
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a pruned, quantized n-gram store and report its size and agreement."
+    )
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument("--output", default=None, help="Default is ngram_store.bin in the model directory")
+    parser.add_argument("--min-count", type=int, default=2)
+    parser.add_argument("--count-bits", type=int, choices=(8, 16), default=None)
+    parser.add_argument("--heldout", default=None, help="Held-out text, one input per line")
+    parser.add_argument("--max-lines", type=int, default=500)
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.model_dir, "ngram_store.bin")
+    convert_pickles_to_store(args.model_dir, output, args.min_count, args.count_bits)
+    report = compaction_report(args.model_dir, output, args.heldout, args.max_lines)
+
+    print(f"Wrote compacted n-gram store to {output}", file=sys.stderr)
+    print(
+        f"Memory: {report['pickle_bytes'] / 2**20:.1f} MB of pickled tables, "
+        f"{report['store_bytes'] / 2**20:.1f} MB of store "
+        f"({report['store_bytes'] / max(report['pickle_bytes'], 1):.1%})"
+    )
+    for name, (before, after) in report["tables"].items():
+        print(f"{name:<20} {before:>12} -> {after:>12} n-grams")
+    if args.heldout is not None:
+        print(
+            f"Identical corrections: {report['correction_agreement']:.2%} "
+            f"of {report['corrections']} misspelled words "
+            f"(accuracy {report['correction_accuracy']['pickle']:.2%} with the pickles, "
+            f"{report['correction_accuracy']['store']:.2%} with the store)"
+        )
+        print(
+            f"Identical next words: {report['prediction_agreement']:.2%} "
+            f"of {report['predictions']} predictions "
+            f"(accuracy {report['prediction_accuracy']['pickle']:.2%} with the pickles, "
+            f"{report['prediction_accuracy']['store']:.2%} with the store)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,568 @@
+import argparse
+import json
+import os
+import pickle
+import numpy as np
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+# File signature and alignment of every array inside the store
+STORE_MAGIC = b"TFNGRAM1"
+STORE_ALIGNMENT = 64
+
+# The pickled count tables that are converted into the compact store
+COUNT_TABLES = (
+    "unigram_counter",
+    "bigram_counter",
+    "trigram_counter",
+    "ngram_counts",
+    "nplus1gram_counts",
+)
+
+NgramKey = Union[str, Tuple[str, ...]]
+
+
+class NgramTable:
+    """
+    Read-only, dict-like view over one n-gram count table of an NgramStore.
+
+    The n-grams are stored as integer-ID tuples packed into sorted uint64 keys,
+    so a lookup is a binary search over a memory-mapped array. The table
+    supports the subset of the dict API used by the scoring code
+    (`get`, `[]`, `in`, `len`, `keys`, `values`, `items`).
+
+    A compacted table stores 8 or 16-bit codes into a codebook of counts
+    instead of the counts. A pruned table only stores the n-grams seen at
+    least `min_count` times; the count of the other n-grams is estimated from
+    the lower-order `backoff` table, capped below `min_count`.
+    """
+
+    def __init__(
+        self,
+        store: "NgramStore",
+        order: int,
+        scalar_keys: bool,
+        keys: np.ndarray,
+        counts: np.ndarray,
+        codebook: Optional[np.ndarray] = None,
+        min_count: int = 1,
+        backoff: Optional[str] = None,
+    ) -> None:
+        self.store = store
+        self.order = order
+        self.scalar_keys = scalar_keys
+        self.packed_keys = keys
+        self.counts = counts
+        self.codebook = codebook
+        self.min_count = min_count
+        self.backoff = backoff
+        self._total: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.packed_keys)
+
+    def __iter__(self) -> Iterator[NgramKey]:
+        return self.keys()
+
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) >= 0
+
+    def __getitem__(self, key: NgramKey) -> int:
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return int(self._counts_at(index))
+
+    def get(self, key: NgramKey, default: Any = None) -> Any:
+        """
+        Returns the count of an n-gram, or `default` if it was never observed.
+
+        For a pruned table, an n-gram of known words that is not stored gets its
+        backed-off count estimate instead of the default, 0 if it has none.
+
+        Parameters:
+        key (NgramKey): A word for unigram tables, a tuple of words otherwise.
+        default (Any): The value returned for unknown n-grams. Default is None.
+
+        Returns:
+        Any: The count of the n-gram or the default value.
+        """
+        index = self._find(key)
+        if index >= 0:
+            return int(self._counts_at(index))
+        if self.backoff is not None and self.min_count > 1:
+            words = (key,) if self.scalar_keys else key
+            if isinstance(words, tuple) and len(words) == self.order:
+                ids = self.store.token_ids(words)
+                if (ids >= 0).all():
+                    return float(self._estimate(ids.reshape(1, -1))[0])
+        return default
+
+    def get_many(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Looks up the counts of many n-grams given as integer IDs in one pass.
+
+        Parameters:
+        ids (np.ndarray): An (m, order) array of token IDs, -1 marking unknown tokens.
+
+        Returns:
+        np.ndarray: The (m,) array of counts, 0 for n-grams that were never observed.
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1, self.order)
+        pruned = self.backoff is not None and self.min_count > 1
+        result = np.zeros(len(ids), dtype=np.float64 if pruned else np.int64)
+        known = (ids >= 0).all(axis=1)
+        if not known.any():
+            return result
+
+        if len(self.packed_keys):
+            # Pack the ID tuples the same way the table keys were packed
+            packed = self.store.pack_ids(ids[known])
+            positions = np.searchsorted(self.packed_keys, packed)
+            positions = np.minimum(positions, len(self.packed_keys) - 1)
+            found = self.packed_keys[positions] == packed
+            counts = np.where(found, self._counts_at(positions), 0)
+        else:
+            # Every n-gram of an empty pruned table is estimated
+            found = np.zeros(int(known.sum()), dtype=bool)
+            counts = np.zeros(len(found), dtype=np.int64)
+        if pruned and not found.all():
+            counts = counts.astype(np.float64)
+            counts[~found] = self._estimate(ids[known][~found])
+        result[known] = counts
+        return result
+
+    def total(self) -> int:
+        """
+        Returns the sum of the counts of the table, computed once.
+
+        Returns:
+        int: The total count.
+        """
+        if self._total is None:
+            self._total = int(self.values().sum(dtype=np.int64))
+        return self._total
+
+    def _counts_at(self, positions: Any) -> Any:
+        # Decode the stored counts, through the codebook of compacted tables
+        if self.codebook is None:
+            return self.counts[positions]
+        return self.codebook[self.counts[positions]]
+
+    def _estimate(self, ids: np.ndarray) -> np.ndarray:
+        # Estimate the counts of pruned n-grams from the lower order, assuming the
+        # last word only depends on the previous ones: c(a..z) = c(a..y) c(b..z) / c(b..y)
+        lower = self.store[self.backoff]
+        left = lower.get_many(ids[:, :-1])
+        right = lower.get_many(ids[:, 1:])
+        if self.order == 2:
+            middle = np.full(len(ids), lower.total(), dtype=np.float64)
+        elif lower.backoff is not None:
+            middle = self.store[lower.backoff].get_many(ids[:, 1:-1])
+        else:
+            return np.zeros(len(ids))
+        estimate = left * right / np.maximum(middle, 1)
+        return np.minimum(estimate, self.min_count - 1)
+
+    def keys(self) -> Iterator[NgramKey]:
+        """
+        Iterates over the n-grams of the table in sorted ID order.
+
+        Returns:
+        Iterator[NgramKey]: The n-grams, decoded back to words.
+        """
+        for packed in self.packed_keys:
+            yield self._decode(int(packed))
+
+    def values(self) -> np.ndarray:
+        """
+        Returns the counts of the table as a read-only array.
+
+        Returns:
+        np.ndarray: The counts, aligned with the order of `keys()`.
+        """
+        if self.codebook is None:
+            return self.counts
+        return self.codebook[self.counts]
+
+    def items(self) -> Iterator[Tuple[NgramKey, int]]:
+        """
+        Iterates over the (n-gram, count) pairs of the table.
+
+        Returns:
+        Iterator[Tuple[NgramKey, int]]: The decoded n-grams with their counts.
+        """
+        for packed, count in zip(self.packed_keys, self.values()):
+            yield self._decode(int(packed)), int(count)
+
+    def _find(self, key: object) -> int:
+        # Encode the key into token IDs, any unknown token means a missing n-gram
+        words = (key,) if self.scalar_keys else key
+        if not isinstance(words, tuple) or len(words) != self.order:
+            return -1
+        ids = [self.store.token_id(word) for word in words]
+        if min(ids) < 0 or len(self.packed_keys) == 0:
+            return -1
+
+        # Binary search for the packed key
+        packed = self.store.pack_ids(np.array([ids], dtype=np.int64))[0]
+        index = int(np.searchsorted(self.packed_keys, packed))
+        if index < len(self.packed_keys) and self.packed_keys[index] == packed:
+            return index
+        return -1
+
+    def _decode(self, packed: int) -> NgramKey:
+        words = tuple(
+            self.store.token(ident) for ident in self.store.unpack_key(packed, self.order)
+        )
+        return words[0] if self.scalar_keys else words
+
+
+class NgramStore:
+    """
+    A set of n-gram count tables sharing one token vocabulary, memory-mapped
+    from a single file.
+
+    Every array is a zero-copy view into the mapping, so opening a store is
+    near-instant and the pages are shared between all processes that open
+    the same file.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self._buffer = np.memmap(file_path, dtype=np.uint8, mode="r")
+
+        # Read the header
+        if bytes(self._buffer[: len(STORE_MAGIC)]) != STORE_MAGIC:
+            raise ValueError(f"{file_path} is not an n-gram store")
+        header_size = int(self._buffer[8:16].view("<u8")[0])
+        header = json.loads(bytes(self._buffer[16 : 16 + header_size]).decode("utf-8"))
+        data_start = _align(16 + header_size)
+
+        def view(spec: Dict[str, Any]) -> np.ndarray:
+            start = data_start + spec["offset"]
+            dtype = np.dtype(spec["dtype"])
+            return self._buffer[start : start + spec["size"] * dtype.itemsize].view(dtype)
+
+        # Token vocabulary, stored as one UTF-8 blob with offsets
+        self.bits = header["bits"]
+        self._token_offsets = view(header["token_offsets"])
+        self._token_blob = view(header["token_blob"])
+
+        # Count tables
+        self.tables: Dict[str, NgramTable] = {
+            name: NgramTable(
+                self,
+                spec["order"],
+                spec["scalar_keys"],
+                view(spec["keys"]),
+                view(spec["counts"]),
+                view(spec["codebook"]) if "codebook" in spec else None,
+                spec.get("min_count", 1),
+                spec.get("backoff"),
+            )
+            for name, spec in header["tables"].items()
+        }
+
+    def __getitem__(self, name: str) -> NgramTable:
+        return self.tables[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.tables
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self._token_offsets) - 1
+
+    def token(self, ident: int) -> str:
+        """
+        Returns the token with the given ID.
+
+        Parameters:
+        ident (int): The token ID.
+
+        Returns:
+        str: The token.
+        """
+        start, end = self._token_offsets[ident], self._token_offsets[ident + 1]
+        return bytes(self._token_blob[start:end]).decode("utf-8")
+
+    def token_id(self, word: object) -> int:
+        """
+        Returns the ID of a token by binary search over the sorted token blob.
+
+        Parameters:
+        word (object): The token to look up.
+
+        Returns:
+        int: The token ID, or -1 if the token is not part of the store.
+        """
+        if not isinstance(word, str):
+            return -1
+        target = word.encode("utf-8")
+        low, high = 0, self.vocab_size
+        while low < high:
+            middle = (low + high) // 2
+            start, end = self._token_offsets[middle], self._token_offsets[middle + 1]
+            current = bytes(self._token_blob[start:end])
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def token_ids(self, words: Sequence[str]) -> np.ndarray:
+        """
+        Returns the IDs of several tokens.
+
+        Parameters:
+        words (Sequence[str]): The tokens to look up.
+
+        Returns:
+        np.ndarray: The token IDs, -1 for unknown tokens.
+        """
+        return np.fromiter((self.token_id(word) for word in words), dtype=np.int64, count=len(words))
+
+    def pack_ids(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Packs rows of token IDs into sortable uint64 keys.
+
+        Parameters:
+        ids (np.ndarray): An (m, order) array of non-negative token IDs.
+
+        Returns:
+        np.ndarray: The (m,) array of packed keys.
+        """
+        packed = np.zeros(len(ids), dtype=np.uint64)
+        for column in range(ids.shape[1]):
+            packed = (packed << np.uint64(self.bits)) | ids[:, column].astype(np.uint64)
+        return packed
+
+    def unpack_key(self, packed: int, order: int) -> List[int]:
+        """
+        Unpacks a packed key back into its token IDs.
+
+        Parameters:
+        packed (int): The packed key.
+        order (int): The number of tokens in the key.
+
+        Returns:
+        List[int]: The token IDs.
+        """
+        mask = (1 << self.bits) - 1
+        return [(packed >> (self.bits * (order - 1 - i))) & mask for i in range(order)]
+
+
+def _align(offset: int) -> int:
+    return -(-offset // STORE_ALIGNMENT) * STORE_ALIGNMENT
+
+
+def _table_order(counts: Mapping[NgramKey, int]) -> Tuple[int, bool]:
+    # The order of a table and whether its keys are words, from a single key
+    first_key = next(iter(counts), ())
+    if isinstance(first_key, str):
+        return 1, True
+    return max(1, len(first_key)), False
+
+
+def quantize_counts(values: np.ndarray, bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantizes counts to `bits`-bit codes into a codebook of counts.
+
+    The counts are bucketed on a logarithmic scale, so the small counts, where
+    most n-grams are, stay exact, and each bucket is represented by the mean
+    count of its n-grams, which keeps the total count of the table.
+
+    Parameters:
+    values (np.ndarray): The counts, all positive.
+    bits (int): The size of the codes, 8 or 16.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: The codes of the counts and the codebook, the count of each code.
+    """
+    if bits not in (8, 16):
+        raise ValueError("Counts can only be quantized to 8 or 16 bits")
+    code_dtype = "<u1" if bits == 8 else "<u2"
+    distinct = np.unique(values)
+    if len(distinct) <= 1 << bits:
+        # Few enough distinct counts to be stored exactly
+        return np.searchsorted(distinct, values).astype(code_dtype), distinct.astype("<i8")
+
+    edges = np.unique(
+        np.floor(np.geomspace(distinct[0], distinct[-1] + 1, (1 << bits) + 1)).astype(np.int64)
+    )
+    buckets = np.searchsorted(edges, values, side="right") - 1
+    _, codes = np.unique(buckets, return_inverse=True)
+    sums = np.bincount(codes, weights=values)
+    sizes = np.bincount(codes)
+    codebook = np.maximum(1, np.rint(sums / sizes)).astype("<i8")
+    return codes.astype(code_dtype), codebook
+
+
+def write_ngram_store(
+    file_path: str,
+    tables: Mapping[str, Mapping[NgramKey, int]],
+    min_count: int = 1,
+    count_bits: Optional[int] = None,
+) -> None:
+    """
+    Writes count tables to a compact, memory-mappable n-gram store.
+
+    With `min_count`, the tables of order 2 and more only keep the n-grams seen
+    at least that many times, and the counts of the others are estimated from
+    the table one order lower when reading. With `count_bits`, the counts are
+    quantized to 8 or 16-bit codes.
+
+    Parameters:
+    file_path (str): The path of the store to write.
+    tables (Mapping[str, Mapping[NgramKey, int]]): The count tables by name. Keys are
+        words for unigram tables and tuples of words for higher orders.
+    min_count (int): The minimum count of the n-grams of order 2 and more. Default is 1 (keep all).
+    count_bits (Optional[int]): The size of the quantized counts, 8 or 16. Default is None (exact counts).
+
+    Returns:
+    None
+    """
+    orders = {name: _table_order(counts) for name, counts in tables.items()}
+    if min_count > 1:
+        tables = {
+            name: counts
+            if orders[name][0] == 1
+            else {key: count for key, count in counts.items() if count >= min_count}
+            for name, counts in tables.items()
+        }
+
+    # Collect the tokens of all tables and assign IDs in UTF-8 byte order
+    tokens = set()
+    for counts in tables.values():
+        for key in counts:
+            tokens.update((key,) if isinstance(key, str) else key)
+    encoded_tokens = sorted(token.encode("utf-8") for token in tokens)
+    token_ids = {token.decode("utf-8"): i for i, token in enumerate(encoded_tokens)}
+    bits = max(1, len(encoded_tokens).bit_length())
+
+    arrays: List[Tuple[int, np.ndarray]] = []
+    specs: Dict[str, Any] = {}
+    offset = 0
+
+    def add(array: np.ndarray) -> Dict[str, Any]:
+        nonlocal offset
+        spec = {"offset": offset, "size": len(array), "dtype": array.dtype.str}
+        arrays.append((offset, array))
+        offset = _align(offset + array.nbytes)
+        return spec
+
+    token_offsets = np.zeros(len(encoded_tokens) + 1, dtype="<i8")
+    token_offsets[1:] = np.cumsum([len(token) for token in encoded_tokens])
+    specs["token_offsets"] = add(token_offsets)
+    specs["token_blob"] = add(np.frombuffer(b"".join(encoded_tokens), dtype=np.uint8))
+
+    table_specs = {}
+    for name, counts in tables.items():
+        order, scalar_keys = orders[name]
+        if bits * order > 64:
+            raise ValueError(f"Table {name} of order {order} does not fit in 64-bit keys")
+
+        # Encode and pack the keys, then sort the table by packed key
+        ids = np.fromiter(
+            (
+                token_ids[word]
+                for key in counts
+                for word in ((key,) if scalar_keys else key)
+            ),
+            dtype=np.int64,
+            count=len(counts) * order,
+        ).reshape(-1, order)
+        packed = np.zeros(len(ids), dtype=np.uint64)
+        for column in range(order):
+            packed = (packed << np.uint64(bits)) | ids[:, column].astype(np.uint64)
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        sort_order = np.argsort(packed, kind="stable")
+
+        spec = {
+            "order": order,
+            "scalar_keys": scalar_keys,
+            "keys": add(packed[sort_order].astype("<u8")),
+        }
+        values = values[sort_order]
+        if count_bits is not None and len(values):
+            codes, codebook = quantize_counts(values, count_bits)
+            spec["counts"] = add(codes)
+            spec["codebook"] = add(codebook)
+        else:
+            # Use the smallest count type that fits
+            count_dtype = "<u4" if len(values) == 0 or values.max() < 2**32 else "<i8"
+            spec["counts"] = add(values.astype(count_dtype))
+        if order > 1 and min_count > 1:
+            # The pruned n-grams back off to the first table one order lower
+            spec["min_count"] = min_count
+            spec["backoff"] = next(
+                (other for other in tables if orders[other][0] == order - 1), None
+            )
+        table_specs[name] = spec
+
+    header = json.dumps({"bits": bits, "tables": table_specs, **specs}).encode("utf-8")
+
+    with open(file_path, "wb") as f:
+        f.write(STORE_MAGIC)
+        f.write(np.array([len(header)], dtype="<u8").tobytes())
+        f.write(header)
+        data_start = _align(16 + len(header))
+        for array_offset, array in arrays:
+            # Pad up to the aligned start of each array
+            f.write(b"\0" * (data_start + array_offset - f.tell()))
+            f.write(array.tobytes())
+
+
+def convert_pickles_to_store(
+    model_dir: str, file_path: str, min_count: int = 1, count_bits: Optional[int] = None
+) -> None:
+    """
+    Converts the pickled n-gram count tables of a model directory into a compact store.
+
+    Parameters:
+    model_dir (str): The directory containing the pickled count tables.
+    file_path (str): The path of the store to write.
+    min_count (int): The minimum count of the n-grams of order 2 and more. Default is 1 (keep all).
+    count_bits (Optional[int]): The size of the quantized counts, 8 or 16. Default is None (exact counts).
+
+    Returns:
+    None
+    """
+    tables = {}
+    for name in COUNT_TABLES:
+        with open(os.path.join(model_dir, f"{name}.pkl"), "rb") as f:
+            tables[name] = pickle.load(f)
+    write_ngram_store(file_path, tables, min_count, count_bits)
+
+
+def open_ngram_store(file_path: str) -> Optional[NgramStore]:
+    """
+    Opens a compact n-gram store if it exists.
+
+    Parameters:
+    file_path (str): The path of the store.
+
+    Returns:
+    Optional[NgramStore]: The opened store, or None if the file does not exist.
+    """
+    if not os.path.exists(file_path):
+        return None
+    return NgramStore(file_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert the pickled n-gram count tables into a memory-mapped store."
+    )
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument("--output", default="src/models/ngram_store.bin")
+    args = parser.parse_args()
+
+    convert_pickles_to_store(args.model_dir, args.output)
+    print(f"Wrote n-gram store to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
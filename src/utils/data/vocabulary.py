@@ -0,0 +1,144 @@
+import numpy as np
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class Vocabulary:
+    """
+    Interned vocabulary with hashed membership, word <-> integer ID mapping and
+    frequency ranks.
+
+    IDs are assigned in order of first appearance, so iterating the vocabulary
+    yields the words in the same order as the vocabulary file. Words that
+    appear several times in the input are counted, and the counts define the
+    frequency rank (0 is the most frequent word, ties keep first appearance).
+    The words are also kept in sorted order, so all the words starting with
+    a prefix form one contiguous range found by binary search.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        counts = Counter(words)
+
+        # Word <-> ID mapping, in order of first appearance
+        self.words: List[str] = list(counts)
+        self._ids: Dict[str, int] = {word: i for i, word in enumerate(self.words)}
+
+        # Occurrence counts and frequency ranks, indexed by ID
+        self.counts = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        self.ranked_ids = np.argsort(-self.counts, kind="stable")
+        self.ranks = np.empty(len(self.words), dtype=np.int64)
+        self.ranks[self.ranked_ids] = np.arange(len(self.words))
+
+        # Prefix index: the words in sorted order and the position of each ID in it
+        self.sorted_ids = np.array(
+            sorted(range(len(self.words)), key=self.words.__getitem__), dtype=np.int64
+        )
+        self._sorted_words = [self.words[ident] for ident in self.sorted_ids]
+        self.sorted_positions = np.empty(len(self.words), dtype=np.int64)
+        self.sorted_positions[self.sorted_ids] = np.arange(len(self.words))
+
+    def __contains__(self, word: object) -> bool:
+        return word in self._ids
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def __getitem__(self, ident: int) -> str:
+        return self.words[ident]
+
+    def id_of(self, word: str, default: int = -1) -> int:
+        """
+        Returns the integer ID of a word.
+
+        Parameters:
+        word (str): The word to look up.
+        default (int): The value returned for unknown words. Default is -1.
+
+        Returns:
+        int: The ID of the word, or the default value.
+        """
+        return self._ids.get(word, default)
+
+    def ids_of(self, words: Iterable[str]) -> np.ndarray:
+        """
+        Returns the integer IDs of several words.
+
+        Parameters:
+        words (Iterable[str]): The words to look up.
+
+        Returns:
+        np.ndarray: The IDs of the words, -1 for unknown words.
+        """
+        return np.array([self._ids.get(word, -1) for word in words], dtype=np.int64)
+
+    def rank(self, word: str) -> int:
+        """
+        Returns the frequency rank of a word.
+
+        Parameters:
+        word (str): The word to look up.
+
+        Returns:
+        int: The rank of the word (0 is the most frequent), or -1 for unknown words.
+        """
+        ident = self._ids.get(word, -1)
+        return int(self.ranks[ident]) if ident >= 0 else -1
+
+    def known(self, words: Iterable[str]) -> Set[str]:
+        """
+        Returns the subset of words that appear in the vocabulary.
+
+        Parameters:
+        words (Iterable[str]): The words to be filtered.
+
+        Returns:
+        Set[str]: The known words.
+        """
+        ids = self._ids
+        return {word for word in words if word in ids}
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Returns the range of positions, in sorted order, of the words starting with a prefix.
+
+        Parameters:
+        prefix (str): The starting characters of the words.
+
+        Returns:
+        Tuple[int, int]: The start (inclusive) and end (exclusive) of the range in `sorted_ids`.
+        """
+        start = bisect_left(self._sorted_words, prefix)
+        end = bisect_left(self._sorted_words, prefix + "\U0010ffff", start)
+        return start, end
+
+    def prefix_ids(self, prefix: str) -> np.ndarray:
+        """
+        Returns the IDs of the words starting with a prefix, in O(|prefix| log V + matches).
+
+        Parameters:
+        prefix (str): The starting characters of the words.
+
+        Returns:
+        np.ndarray: The IDs of the matching words, in increasing ID order.
+        """
+        start, end = self.prefix_range(prefix)
+        return np.sort(self.sorted_ids[start:end])
+
+    def has_prefix(self, ids: np.ndarray, prefix: str) -> np.ndarray:
+        """
+        Tests which of the given words start with a prefix.
+
+        Parameters:
+        ids (np.ndarray): The IDs of the words to test.
+        prefix (str): The starting characters of the words.
+
+        Returns:
+        np.ndarray: A boolean mask over the IDs.
+        """
+        start, end = self.prefix_range(prefix)
+        positions = self.sorted_positions[ids]
+        return (positions >= start) & (positions < end)
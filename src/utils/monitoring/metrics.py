@@ -0,0 +1,354 @@
+import bisect
+import functools
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, labels, value) of a gauge sample reported by a collector
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, as exported to Prometheus.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        # One count per bucket, the last one for the values above every bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by linear interpolation inside its bucket.
+
+        Parameters:
+        q (float): The quantile, between 0 and 1.
+
+        Returns:
+        float: The estimated value, 0.0 if nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str) -> None:
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{_metric_name(key)}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """
+    Per-stage latency histograms, event counters and gauges of the prediction pipeline.
+
+    The hot paths time their stages with `timer()` and count events with
+    `count()`. While the metrics are disabled both return at once, so the
+    instrumentation costs one attribute check per call. Gauges, such as the
+    load time of the artifacts, are rare and always recorded, and collectors
+    report values owned by other objects, such as cache hit rates, when the
+    metrics are read.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+
+    def timer(self, stage: str):
+        """
+        Returns a context manager recording the time spent in a stage.
+
+        Parameters:
+        stage (str): The name of the stage.
+
+        Returns:
+        A context manager, doing nothing while the metrics are disabled.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def timed(self, stage: str) -> Callable[[Callable], Callable]:
+        """
+        Decorates a function so that its calls are timed as a stage.
+
+        Parameters:
+        stage (str): The name of the stage.
+
+        Returns:
+        Callable[[Callable], Callable]: The decorator.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Records the duration of a stage in its histogram.
+
+        Parameters:
+        stage (str): The name of the stage.
+        seconds (float): The time spent.
+
+        Returns:
+        None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, event: str, value: float = 1) -> None:
+        """
+        Adds to the counter of an event.
+
+        Parameters:
+        event (str): The name of the event.
+        value (float): The amount added. Default is 1.
+
+        Returns:
+        None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """
+        Sets a gauge, whether the metrics are enabled or not.
+
+        Parameters:
+        name (str): The name of the gauge.
+        value (float): Its value.
+        labels (str): The labels of the gauge.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Registers a function returning gauge samples when the metrics are read.
+
+        Parameters:
+        collector (Callable[[], Iterable[Sample]]): Returns (name, labels, value) samples.
+
+        Returns:
+        None
+        """
+        self._collectors.append(collector)
+
+    def gauges(self) -> List[Sample]:
+        """
+        Returns the gauges set and collected.
+
+        Returns:
+        List[Sample]: The (name, labels, value) samples.
+        """
+        with self._lock:
+            samples = [(name, dict(labels), value) for (name, labels), value in self._gauges.items()]
+        for collector in self._collectors:
+            samples.extend(collector())
+        return samples
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Summarizes the metrics.
+
+        Returns:
+        Dict[str, Dict]: The "stages" with the count, mean, median and 95th percentile
+            of their durations, the "counters" and the "gauges".
+        """
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": histogram.count,
+                    "total_seconds": histogram.sum,
+                    "mean_seconds": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p95_seconds": histogram.quantile(0.95),
+                }
+                for stage, histogram in sorted(self._histograms.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        gauges = {
+            name + _format_labels(labels): value for name, labels, value in self.gauges()
+        }
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def reset(self) -> None:
+        """
+        Clears the histograms and the counters.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_prometheus(self, prefix: str = "textflow") -> str:
+        """
+        Exports the metrics in the Prometheus text format.
+
+        Parameters:
+        prefix (str): The prefix of the metric names. Default is "textflow".
+
+        Returns:
+        str: The exposition text.
+        """
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            name = f"{prefix}_stage_seconds"
+            lines.append(f"# HELP {name} Time spent in each stage of the prediction pipeline.")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels({'stage': stage, 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels({'stage': stage})} {histogram.sum!r}")
+                lines.append(f"{name}_count{_format_labels({'stage': stage})} {histogram.count}")
+
+        for event, value in sorted(counters.items()):
+            name = f"{prefix}_{_metric_name(event)}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value!r}")
+
+        typed = set()
+        for gauge, labels, value in sorted(self.gauges(), key=lambda sample: sample[0]):
+            name = f"{prefix}_{_metric_name(gauge)}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def cache_samples(cache: str, stats: Dict[str, float]) -> List[Sample]:
+    """
+    Converts the statistics of a cache into gauge samples.
+
+    Parameters:
+    cache (str): The name of the cache, used as a label.
+    stats (Dict[str, float]): The statistics, with "size", "hits", "misses" and "hit_rate".
+
+    Returns:
+    List[Sample]: The samples.
+    """
+    return [
+        (f"cache_{key}", {"cache": cache}, stats[key])
+        for key in ("size", "hits", "misses", "hit_rate")
+        if key in stats
+    ]
+
+
+def _env_enabled(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() not in ("", "0", "false", "no")
+
+
+# Metrics of the process, enabled with TEXTFLOW_METRICS=1 or from the app sidebar
+metrics = Metrics(enabled=_env_enabled(os.environ.get("TEXTFLOW_METRICS")))
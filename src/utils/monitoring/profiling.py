@@ -0,0 +1,288 @@
+"""
+On-demand profiling of single correction and prediction calls.
+
+A capture runs one call under cProfile and, in a background thread, samples
+the call stack of the calling thread. When the call took at least the
+threshold, it writes to the output directory:
+
+    <time>-<pid>-<feature>-<input size>w-<milliseconds>ms.pstats
+        the cProfile statistics
+    <time>-<pid>-<feature>-<input size>w-<milliseconds>ms.collapsed
+        the sampled stacks, one "outer;...;inner count" line per stack, the
+        input of flamegraph.pl or speedscope
+    <time>-<pid>-<feature>-<input size>w-<milliseconds>ms.json
+        the feature, input size and tags of the call
+
+The mode is "off", "request" (only the calls asking for it, with the profile
+query parameter of the API or the app) or "all", set with TEXTFLOW_PROFILE,
+along with TEXTFLOW_PROFILE_THRESHOLD_MS and TEXTFLOW_PROFILE_DIR.
+
+Usage:
+    cd src && python -m utils.monitoring.profiling profiles/20250101-120000-4242-correct-12w-840ms.pstats
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+PROFILE_MODES = ("off", "request", "all")
+
+
+class _StackSampler(threading.Thread):
+    """
+    Counts the call stacks of a thread, sampled at a fixed interval.
+
+    The samples are taken as often as the interpreter lets the sampling
+    thread run, at most every `interval` seconds.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_file = __file__
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # Leave out the frames of the capture itself
+                if code.co_filename != own_file:
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class _Capture:
+    def __init__(
+        self,
+        profiler: "Profiler",
+        feature: str,
+        input_size: int,
+        threshold_seconds: float,
+        tags: Dict[str, Any],
+    ) -> None:
+        self.profiler = profiler
+        self.feature = feature
+        self.input_size = input_size
+        self.threshold_seconds = threshold_seconds
+        self.tags = tags
+        self.paths: List[str] = []
+
+    def __enter__(self) -> "_Capture":
+        self.profile = cProfile.Profile()
+        self.sampler = _StackSampler(threading.get_ident(), self.profiler.sample_interval)
+        self.sampler.start()
+        self.start = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profile.disable()
+        seconds = time.perf_counter() - self.start
+        self.sampler.stop()
+        self.profiler._release()
+        if seconds >= self.threshold_seconds:
+            self.paths = self.profiler._dump(
+                self.feature, self.input_size, seconds, self.profile, self.sampler.stacks, self.tags
+            )
+
+
+class _NullCapture:
+    paths: List[str] = []
+
+    def __enter__(self) -> "_NullCapture":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_CAPTURE = _NullCapture()
+
+
+class Profiler:
+    """
+    Profiles single calls on demand and dumps the profiles of the slow ones.
+
+    One call is profiled at a time: a call starting while another one is
+    being profiled runs without the profiler.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        threshold_seconds: float = 0.0,
+        output_dir: str = "profiles",
+        sample_interval: float = 0.001,
+    ) -> None:
+        self.configure(mode, threshold_seconds, output_dir)
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        mode: Optional[str] = None,
+        threshold_seconds: Optional[float] = None,
+        output_dir: Optional[str] = None,
+    ) -> None:
+        """
+        Changes the settings given, keeping the others.
+
+        Parameters:
+        mode (Optional[str]): "off", "request" or "all".
+        threshold_seconds (Optional[float]): The shortest call whose profile is dumped.
+        output_dir (Optional[str]): The directory of the profiles.
+
+        Returns:
+        None
+        """
+        if mode is not None:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"Unknown profiling mode: {mode}")
+            self.mode = mode
+        if threshold_seconds is not None:
+            self.threshold_seconds = threshold_seconds
+        if output_dir is not None:
+            self.output_dir = output_dir
+
+    def capture(
+        self,
+        feature: str,
+        input_size: int,
+        requested: bool = False,
+        threshold_seconds: Optional[float] = None,
+        **tags: Any,
+    ):
+        """
+        Returns a context manager profiling the call made inside it.
+
+        Parameters:
+        feature (str): The feature called, used to name the profile.
+        input_size (int): The size of the input, in words.
+        requested (bool): Whether the call asked to be profiled. Default is False.
+        threshold_seconds (Optional[float]): The shortest call whose profile is dumped.
+            Default is None (the threshold of the profiler).
+        tags (Any): Other details of the call saved with the profile, JSON serializable.
+
+        Returns:
+        A context manager whose `paths` are the files written, doing nothing unless
+        the mode is "all", or "request" and the call asked for it.
+        """
+        if self.mode == "off" or (self.mode == "request" and not requested):
+            return _NULL_CAPTURE
+        if not self._lock.acquire(blocking=False):
+            return _NULL_CAPTURE
+        if threshold_seconds is None:
+            threshold_seconds = self.threshold_seconds
+        return _Capture(self, feature, input_size, threshold_seconds, tags)
+
+    def _release(self) -> None:
+        self._lock.release()
+
+    def _dump(
+        self,
+        feature: str,
+        input_size: int,
+        seconds: float,
+        profile: cProfile.Profile,
+        stacks: Counter,
+        tags: Dict[str, Any],
+    ) -> List[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(
+            self.output_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{feature}-"
+            f"{input_size}w-{seconds * 1e3:.0f}ms",
+        )
+        paths = [f"{stem}.pstats", f"{stem}.collapsed", f"{stem}.json"]
+        profile.dump_stats(paths[0])
+        with open(paths[1], "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(paths[2], "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "feature": feature,
+                    "input_size": input_size,
+                    "seconds": seconds,
+                    "samples": sum(stacks.values()),
+                    "pid": os.getpid(),
+                    "tags": tags,
+                },
+                f,
+                indent=2,
+            )
+        return paths
+
+
+def profile_requested(value: Any) -> bool:
+    """
+    Reads the profile switch of a request, a query parameter or a JSON field.
+
+    Parameters:
+    value (Any): The value of the switch, None when absent.
+
+    Returns:
+    bool: Whether the request asks to be profiled.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false", "no")
+    return bool(value)
+
+
+def _from_environment() -> Profiler:
+    mode = os.environ.get("TEXTFLOW_PROFILE", "off").strip().lower() or "off"
+    # Any other true value profiles every call, as with "all"
+    if mode not in PROFILE_MODES:
+        mode = "all" if profile_requested(mode) else "off"
+    return Profiler(
+        mode,
+        float(os.environ.get("TEXTFLOW_PROFILE_THRESHOLD_MS", "0")) / 1e3,
+        os.environ.get("TEXTFLOW_PROFILE_DIR", "profiles"),
+    )
+
+
+# Profiler of the process, configured with TEXTFLOW_PROFILE, TEXTFLOW_PROFILE_THRESHOLD_MS
+# and TEXTFLOW_PROFILE_DIR, or with the server options
+profiler = _from_environment()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize a profile dumped by a capture.")
+    parser.add_argument("path", help="The .pstats file")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args()
+
+    metadata_path = os.path.splitext(args.path)[0] + ".json"
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        print(
+            f"{metadata['feature']} on {metadata['input_size']} words: "
+            f"{metadata['seconds'] * 1e3:.1f} ms, {metadata['samples']} stack samples, "
+            f"tags {metadata['tags']}"
+        )
+    pstats.Stats(args.path).sort_stats(args.sort).print_stats(args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+from utils.data.model_registry import build_registry, correction_models
+from utils.prediction.lattice_correction import CORRECTION_MODES, correct_words_lattice
+from utils.prediction.text_correction import correct_words
+from utils.text_processing.text_preprocessing import text_processing
+
+# Whitespace after a sentence-final punctuation mark, where sentences are split
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Correction models of the process: loaded by the parent before the workers are
+# forked, so the workers share its pages instead of loading their own copy
+_models: Optional[Tuple[Any, ...]] = None
+# Correction mode of the process, "word" or "lattice"
+_mode = "word"
+
+
+def load_models(
+    model_dir: str = "src/models",
+    candidate_generator: str = "symspell",
+    max_distance: int = 2,
+) -> Tuple[Any, ...]:
+    """
+    Loads the models used to correct text, as the correct_words arguments after the words.
+
+    Parameters:
+    model_dir (str): The directory containing the model artifacts. Default is "src/models".
+    candidate_generator (str): "symspell", "trie" or "edits", how the candidates of a
+        misspelled word are found. Default is "symspell".
+    max_distance (int): The maximum edit distance of the trie candidates. Default is 2.
+
+    Returns:
+    Tuple[Any, ...]: The vocabulary, edit functions, n-gram counts, candidate generator and scorer.
+    """
+    return correction_models(build_registry(model_dir), candidate_generator, max_distance)
+
+
+def _init_worker(model_dir: str, candidate_generator: str, max_distance: int, mode: str) -> None:
+    # Only used when the workers cannot be forked from the parent
+    global _models, _mode
+    _models = load_models(model_dir, candidate_generator, max_distance)
+    _mode = mode
+
+
+def correct_batch(units: List[str]) -> Tuple[List[str], int, int]:
+    """
+    Corrects a batch of lines or sentences with the models of the process.
+
+    Parameters:
+    units (List[str]): The lines or sentences.
+
+    Returns:
+    Tuple[List[str], int, int]: The corrected units, the number of words and the number of corrected words.
+    """
+    corrected_units = []
+    words_count = corrections_count = 0
+    corrector = correct_words_lattice if _mode == "lattice" else correct_words
+    for unit in units:
+        words = text_processing(unit)
+        corrected_words = corrector(words, *_models)
+        corrected_units.append(" ".join(corrected_words))
+        words_count += len(words)
+        corrections_count += sum(
+            word != corrected for word, corrected in zip(words, corrected_words)
+        )
+    return corrected_units, words_count, corrections_count
+
+
+def iter_units(stream: IO[str], unit: str = "line") -> Iterator[str]:
+    """
+    Reads the lines or the sentences of a text stream, holding at most one line in memory.
+
+    Parameters:
+    stream (IO[str]): The text stream.
+    unit (str): "line" or "sentence". Default is "line".
+
+    Yields:
+    str: The lines without their line break, or the sentences.
+    """
+    if unit == "line":
+        for line in stream:
+            yield line.rstrip("\n")
+        return
+
+    # Sentences may span lines, so the incomplete sentence is carried over
+    pending = ""
+    for line in stream:
+        sentences = _SENTENCE_END.split(pending + line)
+        pending = sentences.pop()
+        yield from (sentence for sentence in sentences if sentence.strip())
+    if pending.strip():
+        yield pending.strip()
+
+
+def iter_batches(units: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    Groups units in lists of `batch_size` units.
+
+    Parameters:
+    units (Iterable[str]): The units.
+    batch_size (int): The number of units in each batch.
+
+    Yields:
+    List[str]: The batches, the last one possibly shorter.
+    """
+    batch = []
+    for unit in units:
+        batch.append(unit)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def correct_stream(
+    source: IO[str],
+    destination: IO[str],
+    unit: str = "line",
+    workers: int = 1,
+    batch_size: int = 64,
+    max_pending: Optional[int] = None,
+    model_dir: str = "src/models",
+    candidate_generator: str = "symspell",
+    max_distance: int = 2,
+    mode: str = "word",
+) -> Dict[str, float]:
+    """
+    Corrects a text stream in parallel, writing the corrected units in input order.
+
+    The units are sent to the workers in batches, and at most `max_pending` batches
+    are read ahead of the first one not written yet, so the memory used does not
+    depend on the size of the input.
+
+    Parameters:
+    source (IO[str]): The text to correct.
+    destination (IO[str]): Where to write the corrected units, one per line.
+    unit (str): "line" or "sentence", what is corrected as one text. Default is "line".
+    workers (int): The number of worker processes, 1 to correct in this process. Default is 1.
+    batch_size (int): The number of units sent to a worker at once. Default is 64.
+    max_pending (Optional[int]): The maximum number of batches in flight. Default is twice the workers.
+    model_dir (str): The directory containing the model artifacts. Default is "src/models".
+    candidate_generator (str): "symspell", "trie" or "edits". Default is "symspell".
+    max_distance (int): The maximum edit distance of the trie candidates. Default is 2.
+    mode (str): "word" to correct each misspelled word on its own, or "lattice" to
+        correct each unit jointly. Default is "word".
+
+    Returns:
+    Dict[str, float]: The number of units, words and corrections, the time taken, and
+        the words and corrections per second.
+    """
+    global _models, _mode
+    start = time.perf_counter()
+    totals = {"units": 0, "words": 0, "corrections": 0}
+
+    def write(result: Tuple[List[str], int, int]) -> None:
+        corrected_units, words_count, corrections_count = result
+        for corrected in corrected_units:
+            destination.write(corrected + "\n")
+        totals["units"] += len(corrected_units)
+        totals["words"] += words_count
+        totals["corrections"] += corrections_count
+
+    batches = iter_batches(iter_units(source, unit), batch_size)
+    model_args = (model_dir, candidate_generator, max_distance)
+    _mode = mode
+    if workers <= 1:
+        _models = load_models(*model_args)
+        for batch in batches:
+            write(correct_batch(batch))
+    else:
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Load once, the forked workers share the parent's copy
+            _models = load_models(*model_args)
+            pool = multiprocessing.get_context("fork").Pool(workers)
+        else:
+            pool = multiprocessing.get_context("spawn").Pool(
+                workers, _init_worker, model_args + (mode,)
+            )
+        max_pending = max_pending or 2 * workers
+        pending: "collections.deque" = collections.deque()
+        with pool:
+            for batch in batches:
+                pending.append(pool.apply_async(correct_batch, (batch,)))
+                if len(pending) >= max_pending:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+
+    seconds = time.perf_counter() - start
+    return {
+        **totals,
+        "seconds": seconds,
+        "words_per_second": totals["words"] / seconds if seconds else 0.0,
+        "corrections_per_second": totals["corrections"] / seconds if seconds else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Correct the spelling of a text file or of the standard input."
+    )
+    parser.add_argument("input", nargs="?", default="-", help="Text file, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output file, - for stdout")
+    parser.add_argument("--unit", choices=("line", "sentence"), default="line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--model-dir", default="src/models")
+    parser.add_argument(
+        "--candidate-generator", choices=("symspell", "trie", "edits"), default="symspell"
+    )
+    parser.add_argument("--max-distance", type=int, default=2)
+    parser.add_argument(
+        "--mode",
+        choices=CORRECTION_MODES,
+        default="word",
+        help="Correct each misspelled word on its own, or each unit jointly",
+    )
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r")
+    destination = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        stats = correct_stream(
+            source,
+            destination,
+            args.unit,
+            args.workers,
+            args.batch_size,
+            args.max_pending,
+            args.model_dir,
+            args.candidate_generator,
+            args.max_distance,
+            args.mode,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+    print(
+        f"Corrected {stats['units']} {args.unit}s, {stats['words']} words and "
+        f"{stats['corrections']} corrections in {stats['seconds']:.2f} s: "
+        f"{stats['words_per_second']:.0f} words/s, "
+        f"{stats['corrections_per_second']:.0f} corrections/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
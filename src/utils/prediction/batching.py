@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from utils.monitoring.metrics import metrics
+
+
+class BatchingPredictor:
+    """
+    Batches the `predict` calls made on a model by concurrent sessions.
+
+    Requests are queued and a single worker thread collects them for up to
+    `max_latency` seconds, or until `max_batch_size` rows are pending, then
+    runs one forward pass over the rows, padded at the start to the same
+    length, and hands each caller its own rows back. Other attributes are
+    read from the wrapped model, so the predictor can be used in its place.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_latency: float = 0.005) -> None:
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "rows": 0,
+            "max_queue_depth": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the attributes the predictor does not define
+        return getattr(self.__dict__["model"], name)
+
+    def predict(self, inputs, verbose: int = 0) -> np.ndarray:
+        """
+        Predicts the outputs of a batch of inputs, sharing the forward pass with concurrent callers.
+
+        Parameters:
+        inputs: The (rows, length) array of token IDs.
+        verbose (int): Ignored, the batched pass is always silent. Default is 0.
+
+        Returns:
+        np.ndarray: The model outputs of the rows.
+        """
+        self._start()
+        future: Future = Future()
+        self._queue.put((np.asarray(inputs), future, time.perf_counter()))
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(
+                self._stats["max_queue_depth"], self._queue.qsize()
+            )
+        return future.result()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the batching counters.
+
+        Returns:
+        Dict[str, float]: The number of requests and batches, the average batch size,
+            the current and maximum queue depth and the average time spent queued.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["average_batch_size"] = (
+            stats["rows"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        stats["average_wait_seconds"] = (
+            stats.pop("wait_seconds") / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
+
+    def _start(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="batching-predictor", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            # Wait for a first request, then for more until the batch is full or late
+            requests = [self._queue.get()]
+            rows = len(requests[0][0])
+            deadline = time.perf_counter() + self.max_latency
+            while rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                rows += len(request[0])
+            self._predict_batch(requests)
+
+    def _predict_batch(self, requests: List[Tuple[np.ndarray, Future, float]]) -> None:
+        started = time.perf_counter()
+        try:
+            # Pad every row at the start to the longest input of the batch
+            length = max(inputs.shape[1] for inputs, _, _ in requests)
+            batch = np.concatenate(
+                [
+                    np.pad(inputs, ((0, 0), (length - inputs.shape[1], 0)))
+                    for inputs, _, _ in requests
+                ]
+            )
+            with metrics.timer("lstm_batch_predict"):
+                outputs = np.asarray(self.model.predict(batch, verbose=0))
+        except Exception as error:
+            for _, future, _ in requests:
+                future.set_exception(error)
+            return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+            self._stats["wait_seconds"] += sum(
+                started - queued_at for _, _, queued_at in requests
+            )
+
+        start = 0
+        for inputs, future, _ in requests:
+            future.set_result(outputs[start : start + len(inputs)])
+            start += len(inputs)
@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils.monitoring.metrics import metrics
+from utils.prediction.successor_index import SuccessorIndex
+
+
+@metrics.timed("ngram_beam_search")
+def beam_search_next_words(
+    previous_tokens: Sequence[str],
+    successor_index: SuccessorIndex,
+    n_words: int,
+    beam_width: int = 3,
+    num_completions: int = 1,
+    min_log_probability: Optional[float] = None,
+    start_of_word: Optional[str] = None,
+) -> List[Tuple[List[str], float]]:
+    """
+    Predicts the next 'n_words' with a beam search over the n-gram model.
+
+    Each hypothesis only keeps its last n tokens as context, and the expansions
+    of a context are computed once and reused by every hypothesis and step
+    that reaches it. A hypothesis stops growing early when its best next word
+    is less probable than `min_log_probability`.
+
+    Parameters:
+    previous_tokens (Sequence[str]): The previous tokens, left unchanged.
+    successor_index (SuccessorIndex): The precomputed continuations of each context.
+    n_words (int): The maximum number of words to predict.
+    beam_width (int): The number of hypotheses kept at each step. Default is 3.
+    num_completions (int): The number of completions to return. Default is 1.
+    min_log_probability (Optional[float]): The log probability under which a hypothesis
+        stops growing. Default is None (never stop early).
+    start_of_word (Optional[str]): The starting characters of the first word. Default is None.
+
+    Returns:
+    List[Tuple[List[str], float]]: The best completions and their total log probabilities,
+        ranked by average log probability per word.
+    """
+    width = max(beam_width, num_completions)
+    expansions: Dict[Tuple[Tuple[str, ...], Optional[str]], List[Tuple[str, float]]] = {}
+
+    def expand(context: Tuple[str, ...], prefix: Optional[str]) -> List[Tuple[str, float]]:
+        # Reuse the scored continuations of contexts seen before
+        key = (context, prefix)
+        if key not in expansions:
+            expansions[key] = successor_index.top_k(context, width, prefix)
+        return expansions[key]
+
+    context = successor_index.context(previous_tokens)
+    beams: List[Tuple[Tuple[str, ...], List[str], float]] = [(context, [], 0.0)]
+    finished: List[Tuple[List[str], float]] = []
+
+    for step in range(n_words):
+        candidates = []
+        for context, words, score in beams:
+            continuations = expand(context, start_of_word if step == 0 else None)
+
+            # Stop growing the hypothesis if even its best continuation is unlikely
+            if not continuations or (
+                min_log_probability is not None
+                and words
+                and continuations[0][1] < min_log_probability
+            ):
+                finished.append((words, score))
+                continue
+
+            for word, log_probability in continuations:
+                candidates.append(
+                    (
+                        successor_index.context(context + (word,)),
+                        words + [word],
+                        score + log_probability,
+                    )
+                )
+
+        if not candidates:
+            beams = []
+            break
+
+        # Keep the best hypotheses only
+        candidates.sort(key=lambda beam: beam[2], reverse=True)
+        beams = candidates[:width]
+
+    finished.extend((words, score) for _, words, score in beams)
+    finished = [(words, score) for words, score in finished if words]
+    finished.sort(key=lambda completion: completion[1] / len(completion[0]), reverse=True)
+    return finished[:num_completions]
@@ -0,0 +1,130 @@
+import functools
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+from utils.monitoring.metrics import cache_samples, metrics
+from utils.prediction.prediction_cache import PredictionCache
+
+# Sentinel distinguishing a cache miss from a cached None
+_MISSING = object()
+
+
+class CorrectionCache:
+    """
+    Two-level LRU cache of the spelling corrections made by `correct()`.
+
+    The first level maps a misspelled word to its known candidate words, which
+    do not depend on the context, so a typo repeated with different
+    neighbours only generates its candidates once. The second level maps
+    (previous word, word, next word) to the final correction. Both levels are
+    also keyed on the version tokens of the models used (see PredictionCache),
+    so entries computed with other models are never returned, and `invalidate`
+    drops them, with the references to the old models, when a model is reloaded.
+    """
+
+    def __init__(self, max_candidates: int = 16384, max_corrections: int = 65536) -> None:
+        self.candidates = PredictionCache(max_candidates, ttl=None)
+        self.corrections = PredictionCache(max_corrections, ttl=None)
+
+    def model_version(self, model: Any) -> Hashable:
+        """
+        Returns the version token of a model, or of the model bound to a function.
+
+        Parameters:
+        model (Any): The model, count table, index or candidate generator.
+
+        Returns:
+        Hashable: The version token.
+        """
+        if model is None:
+            return None
+        if isinstance(model, functools.partial):
+            # e.g. VocabularyTrie.candidate_generator, created again for each request
+            return (
+                "partial",
+                self.model_version(model.func),
+                model.args,
+                tuple(sorted(model.keywords.items())),
+            )
+        if hasattr(model, "__self__") and hasattr(model, "__func__"):
+            # Bound methods are created again on each attribute access
+            return ("method", self.model_version(model.__self__), model.__func__.__qualname__)
+        return self.candidates.model_version(model)
+
+    def candidates_for(
+        self, word: str, models: Tuple[Any, ...], generate: Callable[[], Set[str]]
+    ) -> Set[str]:
+        """
+        Returns the cached candidates of a word, generating them on a miss.
+
+        Parameters:
+        word (str): The misspelled word.
+        models (Tuple[Any, ...]): The models the candidates depend on.
+        generate (Callable[[], Set[str]]): Generates the candidates.
+
+        Returns:
+        Set[str]: The known candidate words, not to be modified.
+        """
+        key = (word,) + tuple(self.model_version(model) for model in models)
+        candidates = self.candidates.get(key, _MISSING)
+        if candidates is _MISSING:
+            candidates = generate()
+            self.candidates.put(key, candidates)
+        return candidates
+
+    def correction_for(
+        self,
+        context: Tuple[Optional[str], str, Optional[str]],
+        models: Tuple[Any, ...],
+        compute: Callable[[], Tuple[str, float]],
+    ) -> Tuple[str, float]:
+        """
+        Returns the cached correction of a word in context, computing it on a miss.
+
+        Parameters:
+        context (Tuple[Optional[str], str, Optional[str]]): The previous word, the word and the next word.
+        models (Tuple[Any, ...]): The models the correction depends on.
+        compute (Callable[[], Tuple[str, float]]): Computes the correction.
+
+        Returns:
+        Tuple[str, float]: The corrected word and its probability.
+        """
+        key = context + tuple(self.model_version(model) for model in models)
+        correction = self.corrections.get(key, _MISSING)
+        if correction is _MISSING:
+            correction = compute()
+            self.corrections.put(key, correction)
+        return correction
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Drops every entry, e.g. when a model is reloaded.
+
+        Parameters:
+        name (Optional[str]): The name of the reloaded artifact, for use as a
+            ModelRegistry.on_reload listener. Default is None.
+
+        Returns:
+        None
+        """
+        self.candidates.clear()
+        self.corrections.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the counters of both levels.
+
+        Returns:
+        Dict[str, Dict[str, float]]: The size, hits, misses, evictions and hit rate
+            of the "candidates" and "corrections" levels.
+        """
+        return {"candidates": self.candidates.stats(), "corrections": self.corrections.stats()}
+
+
+# Correction cache shared by the sessions, the API and the batch workers of the process
+correction_cache = CorrectionCache()
+metrics.add_collector(
+    lambda: [
+        sample
+        for level, stats in correction_cache.stats().items()
+        for sample in cache_samples(f"correction_{level}", stats)
+    ]
+)
@@ -0,0 +1,315 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from utils.data.vocabulary import Vocabulary
+from utils.prediction.scoring import CorrectionScorer
+from utils.prediction.text_correction import correct
+from utils.text_processing.tokenizer import Tokenizer, tokenizer as default_tokenizer
+
+# Number of unchanged tokens re-tokenized on each side of an edit
+DEFAULT_CONTEXT_TOKENS = 2
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """
+    Returns the length of the longest common prefix of two strings.
+
+    Parameters:
+    a (str): The first string.
+    b (str): The second string.
+
+    Returns:
+    int: The length of the common prefix.
+    """
+    # Binary search on slice comparisons, which run in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a: str, b: str, limit: int) -> int:
+    """
+    Returns the length of the longest common suffix of two strings, at most `limit`.
+
+    Parameters:
+    a (str): The first string.
+    b (str): The second string.
+    limit (int): The maximum length of the suffix.
+
+    Returns:
+    int: The length of the common suffix.
+    """
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle : len(a) - low] == b[len(b) - middle : len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _word_start(text: str, position: int) -> int:
+    # The start of the whitespace-separated word containing a position
+    while position and (
+        not text[position - 1].isspace()
+        or text[max(0, position - 4) : position - 1].lower() == "www"
+    ):
+        # A link starting with 'www' and one separator removes the next word too
+        position -= 1
+    return position
+
+
+def _word_end(text: str, position: int) -> int:
+    # The end of the whitespace-separated word containing a position
+    while position < len(text) and (
+        not text[position].isspace()
+        or text[max(0, position - 3) : position].lower() == "www"
+    ):
+        position += 1
+    return position
+
+
+class IncrementalCorrector:
+    """
+    Corrects a text that is edited between calls, such as the text area of a
+    session, reusing the work done on the previous version of the text.
+
+    The tokens of the text are kept with their character offsets, and the
+    correction of each token with them. The new text is compared with the
+    previous one to find the changed span of characters; only the words
+    around that span, with at least `context_tokens` unchanged tokens on
+    each side, are tokenized again, and only the words that changed or
+    whose previous or next word changed are corrected again. The unchanged
+    tokens at the edges of the re-tokenized span must come out the same as
+    before, otherwise the span is widened, so the result is the same as
+    `correct_text` on the whole text.
+    """
+
+    def __init__(
+        self,
+        vocab: Vocabulary,
+        edit1: Callable[[str], Set[str]],
+        edit2: Callable[[str], Set[str]],
+        unigram_counts: Dict[str, int],
+        bigram_counts: Optional[Dict[Tuple[str, str], int]],
+        trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+        candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+        scorer: Optional[CorrectionScorer] = None,
+        context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        tokenizer: Tokenizer = default_tokenizer,
+    ) -> None:
+        self.vocab = vocab
+        self.edit1 = edit1
+        self.edit2 = edit2
+        self.unigram_counts = unigram_counts
+        self.bigram_counts = bigram_counts
+        self.trigram_counts = trigram_counts
+        self.candidate_generator = candidate_generator
+        self.scorer = scorer
+        self.context_tokens = max(1, context_tokens)
+        self.tokenizer = tokenizer
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets the previous text, so the next one is corrected from scratch."""
+        self.text = ""
+        self.words: List[str] = []
+        self.corrections: List[str] = []
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+        self._stats = {
+            "updates": 0,
+            "full_updates": 0,
+            "tokenized_characters": 0,
+            "corrected_words": 0,
+        }
+
+    def correct_text(self, text: str) -> str:
+        """
+        Corrects the spelling of words in a text, given the previous version of the text.
+
+        Parameters:
+        text (str): The text to be corrected.
+
+        Returns:
+        str: The corrected text.
+        """
+        if text != self.text:
+            self._update(text)
+        return " ".join(self.corrections)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters of the incremental updates.
+
+        Returns:
+        Dict[str, float]: The number of updates and of updates that tokenized the whole
+            text, and the average number of characters tokenized and words corrected per update.
+        """
+        stats = dict(self._stats)
+        updates = max(stats["updates"], 1)
+        stats["average_tokenized_characters"] = stats.pop("tokenized_characters") / updates
+        stats["average_corrected_words"] = stats.pop("corrected_words") / updates
+        stats["tokens"] = len(self.words)
+        return stats
+
+    def _update(self, text: str) -> None:
+        old_text = self.text
+        prefix = common_prefix_length(old_text, text)
+        suffix = common_suffix_length(
+            old_text, text, min(len(old_text), len(text)) - prefix
+        )
+        shift = len(text) - len(old_text)
+
+        # Re-tokenize the changed span and its context, widening it until the
+        # unchanged tokens at its edges are tokenized as before
+        context = self.context_tokens
+        while True:
+            low, high, start, end = self._span(
+                text, prefix, len(old_text) - suffix, shift, context
+            )
+            tokens = self._tokenize(text, start, end)
+            if self._anchored(tokens, low, high, start, end, len(text), shift):
+                break
+            context *= 2
+
+        self._stats["updates"] += 1
+        self._stats["tokenized_characters"] += end - start
+        if low == 0 and high == len(self.words):
+            self._stats["full_updates"] += 1
+
+        # Splice the new tokens in place of the old ones
+        old_words = self.words[low:high]
+        new_words = [word for word, _, _ in tokens]
+        self.words[low:high] = new_words
+        self._starts = np.concatenate(
+            (
+                self._starts[:low],
+                np.array([token_start for _, token_start, _ in tokens], dtype=np.int64),
+                self._starts[high:] + shift,
+            )
+        )
+        self._ends = np.concatenate(
+            (
+                self._ends[:low],
+                np.array([token_end for _, _, token_end in tokens], dtype=np.int64),
+                self._ends[high:] + shift,
+            )
+        )
+        self.text = text
+
+        # Correct the words that changed and their neighbours, whose context changed
+        same_start = 0
+        while (
+            same_start < min(len(old_words), len(new_words))
+            and old_words[same_start] == new_words[same_start]
+        ):
+            same_start += 1
+        same_end = 0
+        while (
+            same_end < min(len(old_words), len(new_words)) - same_start
+            and old_words[-1 - same_end] == new_words[-1 - same_end]
+        ):
+            same_end += 1
+        changed_start = low + same_start
+        changed_end = low + len(new_words) - same_end
+        old_changed_end = low + len(old_words) - same_end
+        first = max(0, changed_start - 1)
+        last = min(len(self.words), changed_end + 1)
+        self.corrections[first : old_changed_end + (last - changed_end)] = [
+            self._correct_word(i) for i in range(first, last)
+        ]
+
+    def _span(
+        self, text: str, changed_start: int, changed_end: int, shift: int, context: int
+    ) -> Tuple[int, int, int, int]:
+        # The old tokens [low, high) to replace and the span [start, end) of the new text
+        # to tokenize: the changed characters of the old text [changed_start, changed_end)
+        # and `context` tokens on each side, extended to whole whitespace-separated words
+        first = int(np.searchsorted(self._ends, changed_start, "left"))
+        # The tokens of a word depend on the next word, so the word before the changed
+        # one is always tokenized again
+        word_start = _word_start(text, changed_start)
+        first = min(first, int(np.searchsorted(self._starts, word_start, "left")))
+        low = max(0, first - context)
+        high = min(
+            len(self.words),
+            int(np.searchsorted(self._starts, changed_end, "right")) + context,
+        )
+
+        start = 0
+        if low > 0:
+            start = _word_start(text, int(self._starts[low]))
+            low = int(np.searchsorted(self._starts, start, "left"))
+        end = len(text)
+        if high < len(self.words):
+            end = _word_end(text, int(self._ends[high - 1]) + shift)
+            high = int(np.searchsorted(self._ends, end - shift, "right"))
+        return low, high, start, end
+
+    def _tokenize(self, text: str, start: int, end: int) -> List[Tuple[str, int, int]]:
+        # Tokenize text[start:end], reading the next words until a token follows the span,
+        # since whether the last period of the span ends a sentence depends on the next run
+        lookahead = end
+        while True:
+            tokens = [
+                (word, start + token_start, start + token_end)
+                for word, token_start, token_end in self.tokenizer.iter_tokens(
+                    text[start:lookahead], offsets=True
+                )
+            ]
+            if lookahead == len(text) or (tokens and tokens[-1][1] >= end):
+                return [token for token in tokens if token[1] < end]
+            while lookahead < len(text) and text[lookahead].isspace():
+                lookahead += 1
+            lookahead = _word_end(text, lookahead)
+
+    def _anchored(
+        self,
+        tokens: List[Tuple[str, int, int]],
+        low: int,
+        high: int,
+        start: int,
+        end: int,
+        length: int,
+        shift: int,
+    ) -> bool:
+        # Whether the re-tokenized span starts and ends with the old tokens at its edges
+        if start > 0:
+            old = (self.words[low], int(self._starts[low]), int(self._ends[low]))
+            if not tokens or tokens[0] != old:
+                return False
+        if end < length:
+            old = (
+                self.words[high - 1],
+                int(self._starts[high - 1]) + shift,
+                int(self._ends[high - 1]) + shift,
+            )
+            if not tokens or tokens[-1] != old:
+                return False
+        return True
+
+    def _correct_word(self, i: int) -> str:
+        word = self.words[i]
+        if word in self.vocab:
+            return word
+        corrected_word, _ = correct(
+            word,
+            self.words[i - 1] if i > 0 else None,
+            self.words[i + 1] if i < len(self.words) - 1 else None,
+            self.vocab,
+            self.edit1,
+            self.edit2,
+            self.unigram_counts,
+            self.bigram_counts,
+            self.trigram_counts,
+            self.candidate_generator,
+            self.scorer,
+        )
+        self._stats["corrected_words"] += 1
+        return corrected_word
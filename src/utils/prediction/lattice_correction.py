@@ -0,0 +1,290 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from utils.data.vocabulary import Vocabulary
+from utils.monitoring.metrics import metrics
+from utils.prediction.correction_cache import CorrectionCache, correction_cache
+from utils.prediction.scoring import CorrectionScorer, gather_counts
+from utils.prediction.text_correction import generate_candidates, top_candidates
+from utils.text_processing.text_preprocessing import text_processing
+
+# Correction modes: each misspelled word on its own, or the whole text at once
+CORRECTION_MODES = ("word", "lattice")
+
+# Candidates kept for each misspelled word, and hypotheses kept at each position
+DEFAULT_MAX_CANDIDATES = 5
+DEFAULT_BEAM_WIDTH = 8
+
+
+def candidate_lattice(
+    words: Sequence[str],
+    vocab: Vocabulary,
+    edit1: Callable[[str], Set[str]],
+    edit2: Callable[[str], Set[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    cache: Optional[CorrectionCache] = None,
+) -> List[List[str]]:
+    """
+    Lists the possible words at each position of a text.
+
+    A known word is the only choice at its position. A misspelled word has the
+    `max_candidates` candidates ranked first by `top_candidates`, given its
+    neighbours when they are known words, or the word itself when none is found.
+
+    Parameters:
+    words (Sequence[str]): The words to be corrected, as returned by text_processing.
+    vocab (Vocabulary): The known words (vocabulary).
+    edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
+    edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words
+        close to a word. Default is None.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    max_candidates (int): The number of candidates kept for each misspelled word. Default is 5.
+    cache (Optional[CorrectionCache]): The cache of the candidates.
+        Default is None (the shared correction cache).
+
+    Returns:
+    List[List[str]]: The possible words at each position, most probable first.
+    """
+    cache = cache if cache is not None else correction_cache
+    if candidate_generator is not None:
+        candidate_models = (vocab, candidate_generator)
+    else:
+        candidate_models = (vocab, edit1, edit2)
+
+    lattice = []
+    for i, word in enumerate(words):
+        if word in vocab:
+            lattice.append([word])
+            continue
+        candidates = cache.candidates_for(
+            word,
+            candidate_models,
+            lambda: generate_candidates(word, vocab, edit1, edit2, candidate_generator),
+        )
+        # A misspelled neighbour would only blur the ranking
+        prev_word = words[i - 1] if i > 0 and words[i - 1] in vocab else None
+        next_word = words[i + 1] if i < len(words) - 1 and words[i + 1] in vocab else None
+        ranked = top_candidates(
+            candidates,
+            prev_word,
+            next_word,
+            unigram_counts,
+            bigram_counts,
+            trigram_counts,
+            scorer,
+            max_candidates,
+        )
+        lattice.append([candidate for candidate, _ in ranked] or [word])
+    return lattice
+
+
+def decode_lattice(
+    lattice: Sequence[Sequence[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    scorer: Optional[CorrectionScorer] = None,
+    beam_width: int = DEFAULT_BEAM_WIDTH,
+) -> List[str]:
+    """
+    Finds the most probable sequence of words through a lattice, with a beam search.
+
+    The sequences are scored from left to right with the smoothed trigram
+    probability of each word given the two previous ones (the bigram
+    probability for the second word, the unigram one for the first). The
+    hypotheses ending with the same two words are merged, keeping the most
+    probable (Viterbi), and only the `beam_width` most probable are extended,
+    so the time grows linearly with the length of the text.
+
+    Parameters:
+    lattice (Sequence[Sequence[str]]): The possible words at each position.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer, whose normalizers
+        are reused. Default is None.
+    beam_width (int): The number of hypotheses kept at each position. Default is 8.
+
+    Returns:
+    List[str]: The most probable word at each position.
+    """
+    if not lattice:
+        return []
+    if scorer is not None:
+        unigram_total = scorer.unigram_total
+        unigram_types = scorer.unigram_types
+        bigram_types = scorer.bigram_types
+    else:
+        unigram_total = sum(unigram_counts.values())
+        unigram_types = len(unigram_counts)
+        bigram_types = len(bigram_counts) if bigram_counts is not None else 0
+
+    # First position: the unigram probability of each word
+    words = list(lattice[0])
+    if scorer is not None:
+        counts = scorer.unigram_counts_of(words)
+    else:
+        counts = np.fromiter(
+            (unigram_counts.get(word, 0) for word in words), dtype=np.int64, count=len(words)
+        )
+    scores = np.log((counts + 1) / (unigram_total + unigram_types))
+    # Hypotheses: (log probability, last two words, index of the hypothesis it extends)
+    beam = [(float(score), (None, word), -1) for word, score in zip(words, scores)]
+    beam = sorted(beam, key=lambda hypothesis: -hypothesis[0])[:beam_width]
+    history = [beam]
+
+    for words in lattice[1:]:
+        words = list(words)
+        if len(beam) == 1 and len(words) == 1:
+            # A single path, whose score no longer matters
+            beam = [(beam[0][0], (beam[0][1][1], words[0]), 0)]
+            history.append(beam)
+            continue
+
+        best: Dict[Tuple[Optional[str], str], Tuple[float, Tuple[Optional[str], str], int]] = {}
+        for parent, (score, (before, last), _) in enumerate(beam):
+            if before is not None and trigram_counts and bigram_counts is not None:
+                numerators = gather_counts(trigram_counts, words, (before, last))
+                denominator = bigram_counts.get((before, last), 0) + bigram_types
+            elif bigram_counts is not None:
+                numerators = gather_counts(bigram_counts, words, (last,))
+                denominator = unigram_counts.get(last, 0) + unigram_types
+            else:
+                numerators = np.zeros(len(words), dtype=np.int64)
+                denominator = unigram_types
+            extended = score + np.log((numerators + 1) / denominator)
+            for word, word_score in zip(words, extended):
+                # Keep the most probable of the hypotheses ending with the same two words
+                state = (last, word)
+                if state not in best or word_score > best[state][0]:
+                    best[state] = (float(word_score), state, parent)
+        metrics.count("lattice_hypotheses", len(beam) * len(words))
+        beam = sorted(best.values(), key=lambda hypothesis: -hypothesis[0])[:beam_width]
+        history.append(beam)
+
+    # Follow the back pointers from the most probable hypothesis
+    corrected = []
+    index = 0
+    for beam in reversed(history):
+        _, (_, word), parent = beam[index]
+        corrected.append(word)
+        index = parent
+    return corrected[::-1]
+
+
+def correct_words_lattice(
+    words: List[str],
+    vocab: Vocabulary,
+    edit1: Callable[[str], Set[str]],
+    edit2: Callable[[str], Set[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    cache: Optional[CorrectionCache] = None,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    beam_width: int = DEFAULT_BEAM_WIDTH,
+) -> List[str]:
+    """
+    Corrects the spelling of tokenized words jointly, so that the corrections of
+    neighbouring misspelled words are chosen together.
+
+    Parameters:
+    words (List[str]): The words to be corrected, as returned by text_processing.
+    vocab (Vocabulary): The known words (vocabulary).
+    edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
+    edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus. Default is None.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus. Default is None.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to a word.
+        Default is None.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    cache (Optional[CorrectionCache]): The cache of the candidates.
+        Default is None (the shared correction cache).
+    max_candidates (int): The number of candidates kept for each misspelled word. Default is 5.
+    beam_width (int): The number of hypotheses kept at each position. Default is 8.
+
+    Returns:
+    List[str]: The corrected words, one for each word.
+    """
+    lattice = candidate_lattice(
+        words,
+        vocab,
+        edit1,
+        edit2,
+        unigram_counts,
+        bigram_counts,
+        trigram_counts,
+        candidate_generator,
+        scorer,
+        max_candidates,
+        cache,
+    )
+    with metrics.timer("correction_lattice"):
+        return decode_lattice(
+            lattice, unigram_counts, bigram_counts, trigram_counts, scorer, beam_width
+        )
+
+
+def correct_text_lattice(
+    text: str,
+    vocab: Vocabulary,
+    edit1: Callable[[str], Set[str]],
+    edit2: Callable[[str], Set[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    cache: Optional[CorrectionCache] = None,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    beam_width: int = DEFAULT_BEAM_WIDTH,
+) -> str:
+    """
+    Corrects the spelling of words in a text jointly, as `correct_words_lattice`.
+
+    Parameters:
+    text (str): The text to be corrected.
+    vocab (Vocabulary): The known words (vocabulary).
+    edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
+    edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus. Default is None.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus. Default is None.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to a word.
+        Default is None.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    cache (Optional[CorrectionCache]): The cache of the candidates.
+        Default is None (the shared correction cache).
+    max_candidates (int): The number of candidates kept for each misspelled word. Default is 5.
+    beam_width (int): The number of hypotheses kept at each position. Default is 8.
+
+    Returns:
+    str: The corrected text.
+    """
+    words = text_processing(text)
+    corrected_words = correct_words_lattice(
+        words,
+        vocab,
+        edit1,
+        edit2,
+        unigram_counts,
+        bigram_counts,
+        trigram_counts,
+        candidate_generator,
+        scorer,
+        cache,
+        max_candidates,
+        beam_width,
+    )
+    return " ".join(corrected_words)
@@ -0,0 +1,76 @@
+import numpy as np
+from typing import Optional
+from utils.prediction.lstm_decoding import LSTMDecoder
+from utils.prediction.numpy_lstm import pad_sequences
+from utils.prediction.prediction_cache import cached_prediction
+
+
+@cached_prediction(("lstm_model", "tokenizer"))
+def predict_next_word_lstm(
+    initial_sentence: str,
+    lstm_model,
+    tokenizer,
+    sequence_length: int = 1,
+) -> str:
+    """
+    Predicts the next word based on the initial sentence using LSTM model.
+
+    Parameters:
+    initial_sentence (str): The initial sentence.
+    lstm_model: The trained LSTM model.
+    tokenizer: The trained tokenizer.
+    sequence_length (int): The maximum length of the sequence. Default is 1.
+
+    Returns:
+    str: The predicted next word as a string.
+    """
+    # Tokenize the seed text
+    tokenized_text = tokenizer.texts_to_sequences([initial_sentence])[0]
+
+    # Pad the sequences
+    padded_sequence = pad_sequences(
+        [tokenized_text], maxlen=sequence_length - 1, padding="pre"
+    )
+
+    # Get the probabilities of predicting a word
+    prediction_probabilities = lstm_model.predict(padded_sequence, verbose=0)
+
+    # Choose the next word based on the maximum probability
+    predicted_index = np.argmax(prediction_probabilities, axis=-1).item()
+
+    # Get the actual word from the word index
+    predicted_word = tokenizer.index_word[predicted_index]
+
+    # Return the predicted word
+    return predicted_word
+
+
+@cached_prediction(("lstm_model", "tokenizer"))
+def predict_next_words_lstm(
+    initial_sentence: str,
+    lstm_model,
+    tokenizer,
+    max_len: int = 1,
+    context_window: Optional[int] = None,
+) -> str:
+    """
+    Predicts the next 'max_len' words based on the initial sentence using LSTM model.
+
+    The sentence is tokenized once and the words are decoded one token at a
+    time, keeping the recurrent states between steps when the model allows it.
+
+    Parameters:
+    initial_sentence (str): The initial sentence.
+    lstm_model: The trained LSTM model.
+    tokenizer: The trained tokenizer.
+    max_len (int): The maximum number of words to predict. Default is 1.
+    context_window (Optional[int]): The number of previous tokens the model sees.
+        Default is None (the input length of the model).
+
+    Returns:
+    str: The predicted next 'max_len' words as a string.
+    """
+    decoder = LSTMDecoder(lstm_model, tokenizer, context_window)
+
+    # Return the predicted words as a string
+    return " ".join(decoder.generate(initial_sentence, max_len))
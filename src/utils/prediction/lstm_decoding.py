@@ -0,0 +1,184 @@
+import sys
+import numpy as np
+from typing import Any, List, Optional, Tuple
+from utils.monitoring.metrics import metrics
+
+# Number of previous tokens fed to the model when its input length is not fixed
+DEFAULT_CONTEXT_WINDOW = 20
+
+
+def _step_layers(lstm_model) -> Optional[List[Tuple[str, Any]]]:
+    """
+    Lists the layers of a model that can be run one token at a time.
+
+    Parameters:
+    lstm_model: The trained LSTM model.
+
+    Returns:
+    Optional[List[Tuple[str, Any]]]: The (kind, layer) pairs of the model, or None if
+        the model has a layer that needs the whole sequence, e.g. a Bidirectional layer.
+    """
+    # A Keras model can only exist once Keras has been imported by its loader
+    keras = sys.modules.get("keras")
+    if keras is None:
+        return None
+
+    layers = []
+    for layer in lstm_model.layers:
+        if isinstance(layer, (keras.layers.InputLayer, keras.layers.Dropout)):
+            # Inactive at inference
+            continue
+        if isinstance(layer, keras.layers.Embedding):
+            layers.append(("embedding", layer))
+        elif isinstance(layer, keras.layers.RNN) and not layer.go_backwards:
+            layers.append(("recurrent", layer))
+        elif isinstance(layer, keras.layers.Dense) and layers:
+            layers.append(("dense", layer))
+        else:
+            return None
+
+    # The dense layers must only see the output of the last recurrent layer
+    kinds = [kind for kind, _ in layers]
+    if "recurrent" not in kinds or "dense" not in kinds:
+        return None
+    last_recurrent = len(kinds) - 1 - kinds[::-1].index("recurrent")
+    if "dense" in kinds[:last_recurrent]:
+        return None
+    return layers
+
+
+class LSTMDecoder:
+    """
+    Generates words with an LSTM language model, one token at a time.
+
+    The context is kept as token IDs, so the sentence is only tokenized once,
+    and the context window is independent of the number of generated words.
+    When every recurrent layer of the model reads the sequence forward, the
+    hidden and cell states are kept between steps and only the new token is
+    fed to the model, so generating n words costs n steps. Models with layers
+    that need the whole sequence, such as the Bidirectional layers of the
+    trained model, fall back to one prediction over the last `context_window`
+    token IDs per step.
+    """
+
+    def __init__(self, lstm_model, tokenizer, context_window: Optional[int] = None) -> None:
+        if context_window is None:
+            input_shape = getattr(lstm_model, "input_shape", None)
+            context_window = (
+                input_shape[1]
+                if input_shape and isinstance(input_shape[1], int)
+                else DEFAULT_CONTEXT_WINDOW
+            )
+        self.lstm_model = lstm_model
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.layers = _step_layers(lstm_model)
+
+    @property
+    def incremental(self) -> bool:
+        """Whether the decoder keeps the recurrent states between steps."""
+        return self.layers is not None
+
+    def encode(self, sentence: str) -> List[int]:
+        """
+        Converts a sentence into token IDs.
+
+        Parameters:
+        sentence (str): The sentence.
+
+        Returns:
+        List[int]: The token IDs of the sentence.
+        """
+        return self.tokenizer.texts_to_sequences([sentence])[0]
+
+    def window(self, token_ids: List[int]) -> np.ndarray:
+        """
+        Pads or truncates token IDs to the context window, padding at the start.
+
+        Parameters:
+        token_ids (List[int]): The token IDs.
+
+        Returns:
+        np.ndarray: The (1, context_window) array of the last token IDs.
+        """
+        window = np.zeros((1, self.context_window), dtype="int32")
+        token_ids = token_ids[-self.context_window :] if self.context_window else []
+        if token_ids:
+            window[0, -len(token_ids) :] = token_ids
+        return window
+
+    @metrics.timed("lstm_generate")
+    def generate(self, initial_sentence: str, n_words: int) -> List[str]:
+        """
+        Predicts the next 'n_words' words after a sentence.
+
+        Parameters:
+        initial_sentence (str): The initial sentence.
+        n_words (int): The number of words to predict.
+
+        Returns:
+        List[str]: The predicted words.
+        """
+        token_ids = self.encode(initial_sentence)
+        if self.incremental:
+            predicted_ids = self._generate_incremental(token_ids, n_words)
+        else:
+            predicted_ids = self._generate_windowed(token_ids, n_words)
+        return [self.tokenizer.index_word[token_id] for token_id in predicted_ids]
+
+    def _generate_windowed(self, token_ids: List[int], n_words: int) -> List[int]:
+        predicted_ids = []
+        for _ in range(n_words):
+            with metrics.timer("lstm_predict"):
+                probabilities = self.lstm_model.predict(self.window(token_ids), verbose=0)
+            token_id = self._best_token(probabilities)
+            predicted_ids.append(token_id)
+            token_ids.append(token_id)
+        return predicted_ids
+
+    def _generate_incremental(self, token_ids: List[int], n_words: int) -> List[int]:
+        recurrent_layers = [layer for kind, layer in self.layers if kind == "recurrent"]
+        states = [
+            [
+                np.zeros((1, size), dtype="float32")
+                for size in np.atleast_1d(layer.cell.state_size)
+            ]
+            for layer in recurrent_layers
+        ]
+
+        # Prime the states with the padded context, the way the model was trained
+        window = self.window(token_ids)[0]
+        for token_id in window[:-1]:
+            self._step(int(token_id), states)
+        probabilities = self._step(int(window[-1]), states)
+
+        predicted_ids = []
+        for step in range(n_words):
+            token_id = self._best_token(probabilities)
+            predicted_ids.append(token_id)
+            if step < n_words - 1:
+                probabilities = self._step(token_id, states)
+        return predicted_ids
+
+    def _step(self, token_id: int, states: List[List[Any]]) -> np.ndarray:
+        # Feed one token through the layers, updating the recurrent states in place
+        outputs = np.array([[token_id]], dtype="int32")
+        recurrent = 0
+        for kind, layer in self.layers:
+            if kind == "embedding":
+                outputs = layer(outputs)[:, 0, :]
+            elif kind == "recurrent":
+                outputs, new_states = layer.cell(outputs, states[recurrent], training=False)
+                states[recurrent] = (
+                    list(new_states) if isinstance(new_states, (list, tuple)) else [new_states]
+                )
+                recurrent += 1
+            else:
+                outputs = layer(outputs)
+        return sys.modules["keras"].ops.convert_to_numpy(outputs)
+
+    def _best_token(self, probabilities: np.ndarray) -> int:
+        # The padding ID 0 is not a word
+        probabilities = np.array(probabilities, dtype="float64").reshape(-1)
+        probabilities[0] = -np.inf
+        return int(np.argmax(probabilities))
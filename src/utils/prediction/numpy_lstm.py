@@ -0,0 +1,427 @@
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+# Weight formats supported by the exporter
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+
+def pad_sequences(
+    sequences: Sequence[Sequence[int]],
+    maxlen: Optional[int] = None,
+    padding: str = "pre",
+    truncating: str = "pre",
+    value: int = 0,
+) -> np.ndarray:
+    """
+    Pads token ID sequences to the same length, like keras.preprocessing.sequence.pad_sequences.
+
+    Parameters:
+    sequences (Sequence[Sequence[int]]): The token ID sequences.
+    maxlen (Optional[int]): The length of the padded sequences. Default is None (the longest).
+    padding (str): Whether to pad at the start ("pre") or the end ("post"). Default is "pre".
+    truncating (str): Whether to drop the first ("pre") or last ("post") tokens of longer
+        sequences. Default is "pre".
+    value (int): The padding value. Default is 0.
+
+    Returns:
+    np.ndarray: The (sequences, maxlen) array of padded token IDs.
+    """
+    if maxlen is None:
+        maxlen = max((len(sequence) for sequence in sequences), default=0)
+    padded = np.full((len(sequences), maxlen), value, dtype="int32")
+    for row, sequence in enumerate(sequences):
+        if not maxlen or not len(sequence):
+            continue
+        sequence = sequence[-maxlen:] if truncating == "pre" else sequence[:maxlen]
+        if padding == "pre":
+            padded[row, -len(sequence) :] = sequence
+        else:
+            padded[row, : len(sequence)] = sequence
+    return padded
+
+
+class JsonTokenizer:
+    """
+    Keras Tokenizer replacement reading the word index from a JSON file.
+
+    Reproduces `texts_to_sequences` and `index_word` of the trained tokenizer,
+    so it can be used without importing Keras to unpickle the original.
+    """
+
+    def __init__(
+        self,
+        word_index: Dict[str, int],
+        num_words: Optional[int] = None,
+        oov_token: Optional[str] = None,
+        filters: str = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n',
+        lower: bool = True,
+        split: str = " ",
+        char_level: bool = False,
+    ) -> None:
+        self.word_index = word_index
+        self.index_word = {index: word for word, index in word_index.items()}
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self.char_level = char_level
+        self._translation = str.maketrans({character: split for character in filters})
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer) -> "JsonTokenizer":
+        """
+        Copies the configuration of a trained Keras tokenizer.
+
+        Parameters:
+        tokenizer: The trained Keras tokenizer.
+
+        Returns:
+        JsonTokenizer: The equivalent tokenizer.
+        """
+        return cls(
+            dict(tokenizer.word_index),
+            tokenizer.num_words,
+            tokenizer.oov_token,
+            tokenizer.filters,
+            tokenizer.lower,
+            tokenizer.split,
+            tokenizer.char_level,
+        )
+
+    def texts_to_sequences(self, texts: Sequence[str]) -> List[List[int]]:
+        """
+        Converts texts into token ID sequences.
+
+        Parameters:
+        texts (Sequence[str]): The texts.
+
+        Returns:
+        List[List[int]]: The token IDs of each text.
+        """
+        oov_index = self.word_index.get(self.oov_token) if self.oov_token else None
+        sequences = []
+        for text in texts:
+            if self.lower:
+                text = text.lower()
+            if self.char_level:
+                words = list(text)
+            else:
+                words = [word for word in text.translate(self._translation).split(self.split) if word]
+
+            sequence = []
+            for word in words:
+                index = self.word_index.get(word)
+                if index is not None and (not self.num_words or index < self.num_words):
+                    sequence.append(index)
+                elif oov_index is not None:
+                    sequence.append(oov_index)
+            sequences.append(sequence)
+        return sequences
+
+    def save(self, file_path: str) -> None:
+        config = {
+            "word_index": self.word_index,
+            "num_words": self.num_words,
+            "oov_token": self.oov_token,
+            "filters": self.filters,
+            "lower": self.lower,
+            "split": self.split,
+            "char_level": self.char_level,
+        }
+        with open(file_path, "w") as f:
+            json.dump(config, f)
+
+    @staticmethod
+    def load(file_path: str) -> "JsonTokenizer":
+        with open(file_path, "r") as f:
+            return JsonTokenizer(**json.load(f))
+
+
+def _activation(name: str):
+    if name == "tanh":
+        return np.tanh
+    if name == "sigmoid":
+        return lambda x: 1.0 / (1.0 + np.exp(-x))
+    if name == "hard_sigmoid":
+        return lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+    if name == "relu":
+        return lambda x: np.maximum(x, 0.0)
+    if name == "softmax":
+
+        def softmax(x):
+            exponentials = np.exp(x - x.max(axis=-1, keepdims=True))
+            return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+        return softmax
+    if name == "linear":
+        return lambda x: x
+    raise ValueError(f"Unsupported activation: {name}")
+
+
+def _quantize(weights: np.ndarray, quantization: str) -> Dict[str, np.ndarray]:
+    # Int8 weights are scaled symmetrically per row (per token for embeddings)
+    if quantization == "int8":
+        scale = np.abs(weights).max(axis=-1, keepdims=True) / 127.0
+        scale[scale == 0] = 1.0
+        quantized = np.round(weights / scale).astype("int8")
+        return {"": quantized, "_scale": scale.astype("float32")}
+    return {"": weights.astype(quantization)}
+
+
+def _dequantize(arrays, name: str) -> np.ndarray:
+    weights = arrays[name]
+    if f"{name}_scale" in arrays:
+        return weights.astype("float32") * arrays[f"{name}_scale"]
+    return weights.astype("float32")
+
+
+def export_lstm_weights(lstm_model, file_path: str, quantization: str = "float32") -> None:
+    """
+    Exports the weights of an Embedding / LSTM / Bidirectional / Dense model into an .npz file.
+
+    Parameters:
+    lstm_model: The trained Keras model.
+    file_path (str): The path to the .npz file.
+    quantization (str): The weight format, "float32", "float16" or "int8". Default is "float32".
+
+    Returns:
+    None
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    def recurrent_config(layer) -> Dict[str, Any]:
+        config = layer.get_config()
+        if layer.__class__.__name__ != "LSTM":
+            raise ValueError(f"Unsupported recurrent layer: {layer.__class__.__name__}")
+        return {
+            "units": config["units"],
+            "activation": config["activation"],
+            "recurrent_activation": config["recurrent_activation"],
+            "return_sequences": config["return_sequences"],
+            "go_backwards": config["go_backwards"],
+        }
+
+    layers = []
+    arrays: Dict[str, np.ndarray] = {}
+
+    def add(name: str, weights: np.ndarray, compress: bool = True) -> None:
+        # Biases are small and stay in float32
+        quantized = _quantize(weights, quantization if compress else "float32")
+        for suffix, array in quantized.items():
+            arrays[name + suffix] = array
+
+    def add_lstm(prefix: str, layer) -> None:
+        weights = layer.get_weights()
+        add(f"{prefix}kernel", weights[0])
+        add(f"{prefix}recurrent_kernel", weights[1])
+        bias = weights[2] if len(weights) > 2 else np.zeros(weights[0].shape[1])
+        add(f"{prefix}bias", bias, compress=False)
+
+    for position, layer in enumerate(lstm_model.layers):
+        kind = layer.__class__.__name__
+        prefix = f"{position}/"
+        if kind in ("InputLayer", "Dropout"):
+            continue
+        if kind == "Embedding":
+            if layer.get_config().get("mask_zero"):
+                raise ValueError("Embeddings with mask_zero are not supported")
+            layers.append({"type": kind, "prefix": prefix})
+            add(f"{prefix}embeddings", layer.get_weights()[0])
+        elif kind == "LSTM":
+            layers.append({"type": kind, "prefix": prefix, **recurrent_config(layer)})
+            add_lstm(prefix, layer)
+        elif kind == "Bidirectional":
+            layers.append(
+                {
+                    "type": kind,
+                    "prefix": prefix,
+                    "merge_mode": layer.merge_mode,
+                    "forward": recurrent_config(layer.forward_layer),
+                    "backward": recurrent_config(layer.backward_layer),
+                }
+            )
+            add_lstm(f"{prefix}forward/", layer.forward_layer)
+            add_lstm(f"{prefix}backward/", layer.backward_layer)
+        elif kind == "Dense":
+            config = layer.get_config()
+            layers.append({"type": kind, "prefix": prefix, "activation": config["activation"]})
+            weights = layer.get_weights()
+            add(f"{prefix}kernel", weights[0])
+            bias = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1])
+            add(f"{prefix}bias", bias, compress=False)
+        else:
+            raise ValueError(f"Unsupported layer: {kind}")
+
+    input_shape = getattr(lstm_model, "input_shape", None)
+    config = {
+        "layers": layers,
+        "quantization": quantization,
+        "input_length": input_shape[1] if input_shape else None,
+    }
+    arrays["config"] = np.frombuffer(json.dumps(config).encode("utf-8"), dtype="uint8")
+    with open(file_path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+class NumpyLSTMModel:
+    """
+    NumPy forward pass of an exported Embedding / LSTM / Bidirectional / Dense model.
+
+    The recurrent and dense weights are expanded to float32 on load. The
+    embedding table stays in its exported format, int8 or float16, since only
+    the rows of the input tokens are read, so quantization shrinks both the
+    file and the resident memory of the largest matrix.
+    """
+
+    def __init__(self, config: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        self.config = config
+        self.layers = config["layers"]
+        self.input_shape = (None, config.get("input_length"))
+        self.quantization = config["quantization"]
+        self.weights: Dict[str, np.ndarray] = {}
+        for name in arrays:
+            if name == "config" or name.endswith("_scale"):
+                continue
+            if name.endswith("embeddings"):
+                self.weights[name] = arrays[name]
+                if f"{name}_scale" in arrays:
+                    self.weights[f"{name}_scale"] = arrays[f"{name}_scale"]
+            else:
+                self.weights[name] = _dequantize(arrays, name)
+
+    @staticmethod
+    def load(file_path: str) -> "NumpyLSTMModel":
+        """
+        Loads an exported model.
+
+        Parameters:
+        file_path (str): The path to the .npz file written by export_lstm_weights.
+
+        Returns:
+        NumpyLSTMModel: The model.
+        """
+        with np.load(file_path) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        config = json.loads(arrays["config"].tobytes().decode("utf-8"))
+        return NumpyLSTMModel(config, arrays)
+
+    def predict(self, inputs, verbose: int = 0) -> np.ndarray:
+        """
+        Computes the model outputs, like keras.Model.predict.
+
+        Parameters:
+        inputs: The (rows, length) array of token IDs.
+        verbose (int): Ignored. Default is 0.
+
+        Returns:
+        np.ndarray: The model outputs of the rows.
+        """
+        outputs = np.asarray(inputs)
+        for layer in self.layers:
+            prefix = layer["prefix"]
+            if layer["type"] == "Embedding":
+                outputs = self._embed(prefix, outputs)
+            elif layer["type"] == "LSTM":
+                outputs = self._lstm(prefix, layer, outputs)
+            elif layer["type"] == "Bidirectional":
+                forward = self._lstm(f"{prefix}forward/", layer["forward"], outputs)
+                backward = self._lstm(f"{prefix}backward/", layer["backward"], outputs)
+                if layer["backward"]["return_sequences"]:
+                    backward = backward[:, ::-1]
+                outputs = self._merge(layer["merge_mode"], forward, backward)
+            else:
+                outputs = outputs @ self.weights[f"{prefix}kernel"] + self.weights[f"{prefix}bias"]
+                outputs = _activation(layer["activation"])(outputs)
+        return outputs
+
+    def _embed(self, prefix: str, token_ids: np.ndarray) -> np.ndarray:
+        vectors = self.weights[f"{prefix}embeddings"][token_ids].astype("float32")
+        scale = self.weights.get(f"{prefix}embeddings_scale")
+        if scale is not None:
+            vectors *= scale[token_ids]
+        return vectors
+
+    def _lstm(self, prefix: str, layer: Dict[str, Any], inputs: np.ndarray) -> np.ndarray:
+        units = layer["units"]
+        activation = _activation(layer["activation"])
+        recurrent_activation = _activation(layer["recurrent_activation"])
+        recurrent_kernel = self.weights[f"{prefix}recurrent_kernel"]
+
+        # The input projections of every step in one product
+        projections = inputs @ self.weights[f"{prefix}kernel"] + self.weights[f"{prefix}bias"]
+        hidden = np.zeros((inputs.shape[0], units), dtype="float32")
+        cell = np.zeros_like(hidden)
+        steps = range(inputs.shape[1])
+        if layer["go_backwards"]:
+            steps = reversed(steps)
+
+        outputs = []
+        for step in steps:
+            # Gates in the Keras order: input, forget, cell, output
+            z = projections[:, step] + hidden @ recurrent_kernel
+            input_gate = recurrent_activation(z[:, :units])
+            forget_gate = recurrent_activation(z[:, units : 2 * units])
+            candidate = activation(z[:, 2 * units : 3 * units])
+            output_gate = recurrent_activation(z[:, 3 * units :])
+            cell = forget_gate * cell + input_gate * candidate
+            hidden = output_gate * activation(cell)
+            outputs.append(hidden)
+
+        if layer["return_sequences"]:
+            return np.stack(outputs, axis=1)
+        return hidden
+
+    @staticmethod
+    def _merge(merge_mode: str, forward: np.ndarray, backward: np.ndarray) -> np.ndarray:
+        if merge_mode == "concat":
+            return np.concatenate([forward, backward], axis=-1)
+        if merge_mode == "sum":
+            return forward + backward
+        if merge_mode == "mul":
+            return forward * backward
+        if merge_mode == "ave":
+            return (forward + backward) / 2
+        raise ValueError(f"Unsupported merge mode: {merge_mode}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export the LSTM model and tokenizer for TensorFlow-free inference."
+    )
+    parser.add_argument("--model", default="src/models/model.h5")
+    parser.add_argument("--tokenizer", default="src/models/tokenizer.pkl")
+    parser.add_argument("--output", default="src/models/lstm_weights.npz")
+    parser.add_argument("--tokenizer-output", default="src/models/tokenizer.json")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="float32")
+    args = parser.parse_args()
+
+    # Keras is only needed to read the trained artifacts
+    from utils.data.load_data import load_h5_model, load_pickle_file
+
+    lstm_model = load_h5_model(args.model)
+    tokenizer = load_pickle_file(args.tokenizer)
+    export_lstm_weights(lstm_model, args.output, args.quantization)
+    JsonTokenizer.from_tokenizer(tokenizer).save(args.tokenizer_output)
+
+    # Check that the exported model picks the same words
+    samples = [
+        sequence
+        for sequence in tokenizer.texts_to_sequences(list(tokenizer.word_index)[:64])
+        if sequence
+    ]
+    exported_model = NumpyLSTMModel.load(args.output)
+    inputs = pad_sequences(samples, maxlen=exported_model.input_shape[1] or 20)
+    expected = np.argmax(lstm_model.predict(inputs, verbose=0), axis=-1)
+    actual = np.argmax(exported_model.predict(inputs), axis=-1)
+    print(
+        f"Exported {args.output} ({args.quantization}), "
+        f"{np.mean(expected == actual):.1%} of {len(inputs)} sample predictions agree"
+    )
+
+
+if __name__ == "__main__":
+    main()
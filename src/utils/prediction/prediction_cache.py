@@ -0,0 +1,233 @@
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+from utils.monitoring.metrics import cache_samples, metrics
+
+# Sentinel distinguishing a cache miss from a cached None
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with a maximum size, an optional
+    time-to-live and hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns a cached value and marks it as recently used.
+
+        Parameters:
+        key (Hashable): The cache key.
+        default (Any): The value returned on a miss. Default is None.
+
+        Returns:
+        Any: The cached value, or the default value.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting the least recently used entries beyond the maximum size.
+
+        Parameters:
+        key (Hashable): The cache key.
+        value (Any): The value to store.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._entries[key] = (self.timer(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the counters.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the cache counters.
+
+        Returns:
+        Dict[str, float]: The size, hits, misses, evictions and hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _lookup(self, key: Hashable) -> Any:
+        # Must be called with the lock held
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        stored_at, value = entry
+        if self.ttl is not None and self.timer() - stored_at > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+
+class _Identity:
+    """
+    Hashes and compares a model by identity, holding a reference to it so that
+    its identity cannot be reused by another object while a key contains it.
+    """
+
+    __slots__ = ("model",)
+
+    def __init__(self, model: Any) -> None:
+        self.model = model
+
+    def __hash__(self) -> int:
+        return id(self.model)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Identity) and other.model is self.model
+
+    def __repr__(self) -> str:
+        return f"_Identity({type(self.model).__name__} at {id(self.model):#x})"
+
+
+class PredictionCache(LRUCache):
+    """
+    LRU cache of predictions keyed on (function, model version, context, options).
+
+    Models are keyed by a cheap version token instead of hashing their content:
+    an object's `model_version` attribute when it has one, otherwise its
+    identity. A key holds a reference to the models it identifies, so their
+    identity cannot be reused by another object while the entry exists, and
+    they are released when the entry is evicted or expires.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: Optional[float] = 3600.0) -> None:
+        super().__init__(max_size, ttl)
+
+    def model_version(self, model: Any) -> Hashable:
+        """
+        Returns the version token of a model handle.
+
+        Parameters:
+        model (Any): The model, tokenizer, count table or index.
+
+        Returns:
+        Hashable: The version token of the model.
+        """
+        version = getattr(model, "model_version", None)
+        if version is not None:
+            return version
+        return _Identity(model)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Drops every entry, with the references to the models, e.g. when a model is reloaded.
+
+        Parameters:
+        name (Optional[str]): The name of the reloaded artifact, for use as a
+            ModelRegistry.on_reload listener. Default is None.
+
+        Returns:
+        None
+        """
+        self.clear()
+
+
+def _freeze(value: Any) -> Hashable:
+    # Turn the mutable arguments (token lists) into hashable keys
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached_prediction(
+    model_args: Sequence[str], cache: Optional[PredictionCache] = None
+) -> Callable[[Callable], Callable]:
+    """
+    Caches the results of a prediction function in a PredictionCache.
+
+    Parameters:
+    model_args (Sequence[str]): The names of the arguments holding models, keyed by version.
+    cache (Optional[PredictionCache]): The cache to use. Default is the shared prediction cache.
+
+    Returns:
+    Callable[[Callable], Callable]: The decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            target = cache if cache is not None else prediction_cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (function.__qualname__,) + tuple(
+                (
+                    target.model_version(value)
+                    if name in model_args
+                    else _freeze(value)
+                )
+                for name, value in bound.arguments.items()
+            )
+            result = target.get(key, _MISSING)
+            if result is _MISSING:
+                result = function(*args, **kwargs)
+                target.put(key, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# Prediction cache shared by the completion functions of the process
+prediction_cache = PredictionCache()
+metrics.add_collector(lambda: cache_samples("prediction", prediction_cache.stats()))
@@ -0,0 +1,165 @@
+import numpy as np
+from typing import Any, Mapping, Optional, Sequence, Tuple
+from utils.data.ngram_store import NgramTable
+from utils.data.vocabulary import Vocabulary
+
+
+def _total(counts: Mapping[Any, int]) -> int:
+    # Sum the counts of a table, vectorized for memory-mapped tables
+    values = counts.values()
+    if isinstance(values, np.ndarray):
+        return int(values.sum(dtype=np.int64))
+    return sum(values)
+
+
+def gather_counts(
+    counts: Mapping[Any, int],
+    words: Sequence[str],
+    before: Tuple[str, ...] = (),
+    after: Tuple[str, ...] = (),
+) -> np.ndarray:
+    """
+    Gathers the counts of the n-grams `before + (word,) + after` for many words at once.
+
+    Parameters:
+    counts (Mapping[Any, int]): The n-gram counts, a dict or a memory-mapped table.
+    words (Sequence[str]): The words filling the varying position of the n-gram.
+    before (Tuple[str, ...]): The fixed words preceding the varying position. Default is ().
+    after (Tuple[str, ...]): The fixed words following the varying position. Default is ().
+
+    Returns:
+    np.ndarray: The counts of the n-grams, 0 for n-grams that were never observed.
+    """
+    if isinstance(counts, NgramTable):
+        # N-grams of another order are never part of the table
+        if counts.order != len(before) + 1 + len(after):
+            return np.zeros(len(words), dtype=np.int64)
+
+        # Lookup by token ID in a single vectorized pass
+        store = counts.store
+        ids = np.empty((len(words), len(before) + 1 + len(after)), dtype=np.int64)
+        ids[:, : len(before)] = store.token_ids(before)
+        ids[:, len(before)] = store.token_ids(words)
+        ids[:, len(before) + 1 :] = store.token_ids(after)
+        return counts.get_many(ids)
+    return np.fromiter(
+        (counts.get(before + (word,) + after, 0) for word in words),
+        dtype=np.int64,
+        count=len(words),
+    )
+
+
+class CorrectionScorer:
+    """
+    Scores correction candidates with the same smoothed n-gram probabilities as
+    `calculate_probability` in text_correction, for a whole candidate array at once.
+
+    The corpus totals are computed once, the unigram counts are gathered by
+    vocabulary ID, and the logarithm is taken in a single NumPy pass.
+    """
+
+    def __init__(
+        self,
+        vocab: Vocabulary,
+        unigram_counts: Mapping[str, int],
+        bigram_counts: Optional[Mapping[Tuple[str, str], int]] = None,
+        trigram_counts: Optional[Mapping[Tuple[str, str, str], int]] = None,
+    ) -> None:
+        self.vocab = vocab
+        self.unigram_counts = unigram_counts
+        self.bigram_counts = bigram_counts
+        self.trigram_counts = trigram_counts
+
+        # Normalizers that calculate_probability recomputes for every candidate
+        self.unigram_total = _total(unigram_counts)
+        self.unigram_types = len(unigram_counts)
+        self.bigram_types = len(bigram_counts) if bigram_counts is not None else 0
+
+        # Unigram counts by vocabulary ID
+        if isinstance(unigram_counts, NgramTable):
+            counts = unigram_counts.get_many(unigram_counts.store.token_ids(vocab.words))
+        else:
+            counts = np.fromiter(
+                (unigram_counts.get(word, 0) for word in vocab.words),
+                dtype=np.int64,
+                count=len(vocab),
+            )
+        self.unigram_array = np.asarray(counts)
+
+    def unigram_counts_of(self, words: Sequence[str]) -> np.ndarray:
+        """
+        Looks up the unigram counts of many words by vocabulary ID.
+
+        Parameters:
+        words (Sequence[str]): The words.
+
+        Returns:
+        np.ndarray: The counts of the words, 0 for the words outside the vocabulary.
+        """
+        ids = self.vocab.ids_of(words)
+        known = ids >= 0
+        counts = np.zeros(len(ids), dtype=self.unigram_array.dtype)
+        counts[known] = self.unigram_array[ids[known]]
+        return counts
+
+    def score(
+        self,
+        candidates: Sequence[str],
+        prev_word: Optional[str] = None,
+        next_word: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        Calculates the log probability of every candidate given its context.
+
+        Parameters:
+        candidates (Sequence[str]): The candidate words.
+        prev_word (Optional[str]): The word preceding the candidates. Default is None.
+        next_word (Optional[str]): The word following the candidates. Default is None.
+
+        Returns:
+        np.ndarray: The log probabilities of the candidates.
+        """
+        bigram_counts = self.bigram_counts
+        trigram_counts = self.trigram_counts
+
+        # Only the highest order n-gram available decides the probability
+        if prev_word and next_word and trigram_counts and bigram_counts is not None:
+            numerators = gather_counts(trigram_counts, candidates, (prev_word,), (next_word,))
+            denominator = bigram_counts.get((prev_word, next_word), 0) + self.bigram_types
+        elif next_word and bigram_counts is not None:
+            numerators = gather_counts(bigram_counts, candidates, (), (next_word,))
+            denominator = self.unigram_counts.get(next_word, 0) + self.unigram_types
+        elif prev_word and bigram_counts is not None:
+            numerators = gather_counts(bigram_counts, candidates, (prev_word,))
+            denominator = self.unigram_counts.get(prev_word, 0) + self.unigram_types
+        else:
+            numerators = self.unigram_counts_of(candidates)
+            denominator = self.unigram_total + self.unigram_types
+
+        return np.log((numerators + 1) / denominator)
+
+
+def score_continuations(
+    words: Sequence[str],
+    last_ngram: Tuple[str, ...],
+    ngram_counts: Mapping[Tuple[str, ...], int],
+    nplus1gram_counts: Mapping[Tuple[str, ...], int],
+    vocab_size: int,
+) -> np.ndarray:
+    """
+    Calculates the Laplace-smoothed log probability of many next words at once, with the
+    same result as `calculate_probability` in text_completion for each word.
+
+    Parameters:
+    words (Sequence[str]): The candidate next words.
+    last_ngram (Tuple[str, ...]): The last n-gram before the words.
+    ngram_counts (Mapping[Tuple[str, ...], int]): The counts of each n-gram in the corpus.
+    nplus1gram_counts (Mapping[Tuple[str, ...], int]): The counts of each (n+1)-gram in the corpus.
+    vocab_size (int): The number of unique words in the vocabulary.
+
+    Returns:
+    np.ndarray: The log probabilities of the words.
+    """
+    numerators = gather_counts(nplus1gram_counts, words, last_ngram)
+    denominator = ngram_counts.get(last_ngram, 0) + vocab_size
+    return np.log((numerators + 1) / denominator)
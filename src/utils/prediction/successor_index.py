@@ -0,0 +1,171 @@
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from utils.data.vocabulary import Vocabulary
+from utils.prediction.scoring import gather_counts
+
+
+class SuccessorIndex:
+    """
+    Maps every observed n-gram context to its continuations, sorted by count.
+
+    With Laplace smoothing the score of a continuation only depends on its
+    (n+1)-gram count, so the best continuations of a context are its observed
+    successors followed by the unseen words, which all share the same score.
+    Ties are broken by vocabulary frequency rank, for observed and unseen
+    words alike, so the top-k is found without scoring the whole vocabulary.
+
+    On a pruned store table (see NgramTable), the counts of the unseen
+    continuations are estimated from the lower order, so they no longer share
+    one score: they are ranked by their estimates, gathered for the whole
+    vocabulary in one vectorized pass. The estimates stay below the stored
+    counts, so the observed continuations still come first.
+    """
+
+    def __init__(
+        self,
+        ngram_counts: Mapping[Tuple[str, ...], int],
+        nplus1gram_counts: Mapping[Tuple[str, ...], int],
+        vocab: Vocabulary,
+    ) -> None:
+        self.ngram_counts = ngram_counts
+        self.nplus1gram_counts = nplus1gram_counts
+        self.vocab = vocab
+        # Whether the counts of the unseen continuations are backed-off estimates
+        self.pruned = (
+            getattr(nplus1gram_counts, "backoff", None) is not None
+            and getattr(nplus1gram_counts, "min_count", 1) > 1
+        )
+
+        # Determine the order of the n-grams, from a single key unless a store table
+        # (possibly emptied by pruning) knows it
+        self.order = getattr(ngram_counts, "order", None) or len(next(iter(ngram_counts), ()))
+
+        # Group the continuations by context, keeping only vocabulary words
+        successors: Dict[Tuple[str, ...], List[Tuple[int, int]]] = defaultdict(list)
+        for nplus1gram, count in nplus1gram_counts.items():
+            ident = vocab.id_of(nplus1gram[-1])
+            if ident >= 0:
+                successors[tuple(nplus1gram[:-1])].append((ident, count))
+
+        # Store all continuations in flat arrays, one sorted span per context
+        self.spans: Dict[Tuple[str, ...], Tuple[int, int]] = {}
+        ids: List[int] = []
+        counts: List[int] = []
+        for context, continuations in successors.items():
+            continuations.sort(key=lambda item: (-item[1], vocab.ranks[item[0]]))
+            self.spans[context] = (len(ids), len(ids) + len(continuations))
+            ids.extend(ident for ident, _ in continuations)
+            counts.extend(count for _, count in continuations)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.int64)
+
+    def context(self, previous_tokens: Sequence[str]) -> Tuple[str, ...]:
+        """
+        Returns the n-gram context formed by the last tokens.
+
+        Parameters:
+        previous_tokens (Sequence[str]): The previous tokens.
+
+        Returns:
+        Tuple[str, ...]: The last n tokens.
+        """
+        return tuple(previous_tokens[-self.order :]) if self.order else ()
+
+    def successors(self, context: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the observed continuations of a context.
+
+        Parameters:
+        context (Tuple[str, ...]): The n-gram context.
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: The vocabulary IDs and counts of the continuations,
+            sorted by decreasing count.
+        """
+        start, end = self.spans.get(context, (0, 0))
+        return self.ids[start:end], self.counts[start:end]
+
+    def top_k(
+        self,
+        previous_tokens: Sequence[str],
+        k: int = 1,
+        start_of_word: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns the k most probable next words with their Laplace-smoothed log probabilities.
+
+        Parameters:
+        previous_tokens (Sequence[str]): The previous tokens.
+        k (int): The number of words to return. Default is 1.
+        start_of_word (Optional[str]): The starting characters of the word. Default is None.
+
+        Returns:
+        List[Tuple[str, float]]: The best next words and their log probabilities, best first.
+        """
+        context = self.context(previous_tokens)
+        ids, counts = self.successors(context)
+
+        # Intersect the continuations with the words starting with the given characters
+        if start_of_word is not None:
+            keep = self.vocab.has_prefix(ids, start_of_word)
+            ids, counts = ids[keep], counts[keep]
+            prefix_ids = self.vocab.prefix_ids(start_of_word)
+            unseen_ids = iter(
+                prefix_ids[np.argsort(self.vocab.ranks[prefix_ids], kind="stable")]
+            )
+            vocab_size = len(prefix_ids)
+        else:
+            unseen_ids = iter(self.vocab.ranked_ids)
+            vocab_size = len(self.vocab)
+        if vocab_size == 0:
+            return []
+
+        # Laplace smoothing denominator shared by every continuation
+        denominator = self.ngram_counts.get(context, 0) + vocab_size
+
+        # Observed continuations come first, already sorted
+        top = [
+            (self.vocab[ident], float(np.log((count + 1) / denominator)))
+            for ident, count in zip(ids[:k], counts[:k])
+        ]
+
+        # Fill the remaining places with unseen words by estimated count
+        if len(top) < k and self.pruned:
+            top.extend(self._top_unseen(context, ids, start_of_word, k - len(top), denominator))
+
+        # Fill the remaining places with unseen words by frequency rank
+        elif len(top) < k:
+            observed = set(ids.tolist())
+            unseen_probability = float(np.log(1 / denominator))
+            for ident in unseen_ids:
+                if len(top) == k:
+                    break
+                if ident not in observed:
+                    top.append((self.vocab[ident], unseen_probability))
+
+        return top
+
+    def _top_unseen(
+        self,
+        context: Tuple[str, ...],
+        observed_ids: np.ndarray,
+        start_of_word: Optional[str],
+        k: int,
+        denominator: int,
+    ) -> List[Tuple[str, float]]:
+        # The k unseen continuations with the highest backed-off count estimates,
+        # ties broken by frequency rank
+        if start_of_word is not None:
+            candidate_ids = self.vocab.prefix_ids(start_of_word)
+        else:
+            candidate_ids = np.arange(len(self.vocab), dtype=np.int64)
+        candidate_ids = candidate_ids[~np.isin(candidate_ids, observed_ids)]
+        estimates = gather_counts(
+            self.nplus1gram_counts, [self.vocab[ident] for ident in candidate_ids], context
+        )
+        best = np.lexsort((self.vocab.ranks[candidate_ids], -estimates))[:k]
+        return [
+            (self.vocab[ident], float(np.log((estimate + 1) / denominator)))
+            for ident, estimate in zip(candidate_ids[best], estimates[best])
+        ]
@@ -1,8 +1,10 @@
 import numpy as np
-import streamlit as st
 from typing import Dict, Tuple, List, Optional
-import tensorflow as tf
-import keras
+from utils.data.vocabulary import Vocabulary
+from utils.monitoring.metrics import metrics
+from utils.prediction.prediction_cache import cached_prediction
+from utils.prediction.scoring import score_continuations
+from utils.prediction.successor_index import SuccessorIndex
 
 
 def calculate_probability(
@@ -37,60 +39,86 @@ def calculate_probability(
     return probability
 
 
-@st.cache_data
+@cached_prediction(
+    ("ngram_counts", "nplus1gram_counts", "vocab", "successor_index")
+)
+@metrics.timed("ngram_completion")
 def predict_next_word(
     previous_tokens: List[str],
     ngram_counts: Dict[Tuple[str, ...], int],
     nplus1gram_counts: Dict[Tuple[str, ...], int],
-    vocab: List[str],
+    vocab: Vocabulary,
     start_of_word: Optional[str] = None,
+    successor_index: Optional[SuccessorIndex] = None,
 ) -> Tuple[str, float, Dict[str, float]]:
     """
     Predicts the next word based on the previous tokens using n-gram counts.
+    Raises ValueError when no word of the vocabulary starts with `start_of_word`.
 
     Parameters:
     previous_tokens (List[str]): The list of previous tokens.
     ngram_counts (Dict[Tuple[str, ...], int]): The counts of each n-gram in the corpus.
     nplus1gram_counts (Dict[Tuple[str, ...], int]): The counts of each (n+1)-gram in the corpus.
-    vocab (List[str]): The list of words in the vocabulary.
+    vocab (Vocabulary): The words in the vocabulary.
     start_of_word (Optional[str]): The starting characters of the word. Default is None.
+    successor_index (Optional[SuccessorIndex]): The precomputed continuations of each context. If given,
+        only the observed continuations and the best unseen word are scored. Default is None.
 
     Returns:
-    Tuple[str, float, Dict[str, float]]: The predicted next word, its probability, and the probabilities of all words.
+    Tuple[str, float, Dict[str, float]]: The predicted next word, its probability, and the probabilities
+        of the words scored: every word (starting with `start_of_word`), or with the successor index,
+        the observed continuations and the best unseen word.
     """
-    # Determine the order of the n-grams
-    n = len(list(ngram_counts.keys())[0])
+    # Rank the observed continuations only when the successor index is available
+    if successor_index is not None:
+        context = successor_index.context(previous_tokens)
+        observed = len(successor_index.successors(context)[0])
+        probabilities = dict(
+            successor_index.top_k(previous_tokens, observed + 1, start_of_word)
+        )
+        if not probabilities:
+            raise ValueError(f"No word starts with {start_of_word!r}")
+        next_word = next(iter(probabilities))
+        return next_word, probabilities[next_word], probabilities
+
+    # Determine the order of the n-grams, known to the store tables even when pruned empty
+    n = getattr(ngram_counts, "order", None) or len(next(iter(ngram_counts)))
 
     # Get the last n tokens
     last_ngram = tuple(previous_tokens[-n:])
 
     # Filter the vocabulary to only include words that start with the given characters
     if start_of_word is not None:
-        vocab = [word for word in vocab if word.startswith(start_of_word)]
+        candidates = [vocab[ident] for ident in vocab.prefix_ids(start_of_word)]
+    else:
+        candidates = vocab.words
 
-    # Calculate the probabilities for each word in the vocabulary
-    probabilities = {
-        word: calculate_probability(
-            word, last_ngram, ngram_counts, nplus1gram_counts, len(vocab)
-        )
-        for word in vocab
-    }
+    # Calculate the probabilities for all the candidate words in one pass
+    scores = score_continuations(
+        candidates, last_ngram, ngram_counts, nplus1gram_counts, len(candidates)
+    )
+    probabilities = dict(zip(candidates, scores.tolist()))
 
     # Find the word with the highest probability
+    if not probabilities:
+        raise ValueError(f"No word starts with {start_of_word!r}")
     next_word = max(probabilities, key=lambda x: probabilities.get(x, 0.0))
     max_probability = probabilities[next_word]
 
     return next_word, max_probability, probabilities
 
 
-@st.cache_data
+@cached_prediction(
+    ("ngram_counts", "nplus1gram_counts", "vocab", "successor_index")
+)
 def predict_next_n_words(
     previous_tokens: List[str],
     ngram_counts: Dict[Tuple[str, ...], int],
     nplus1gram_counts: Dict[Tuple[str, ...], int],
-    vocab: List[str],
+    vocab: Vocabulary,
     n_words: int,
     start_of_word: Optional[str] = None,
+    successor_index: Optional[SuccessorIndex] = None,
 ) -> str:
     """
     Predicts the next 'n_words' based on the previous tokens using n-gram counts.
@@ -99,9 +127,10 @@ def predict_next_n_words(
     previous_tokens (List[str]): The list of previous tokens.
     ngram_counts (Dict[Tuple[str, ...], int]): The counts of each n-gram in the corpus.
     nplus1gram_counts (Dict[Tuple[str, ...], int]): The counts of each (n+1)-gram in the corpus.
-    vocab (List[str]): The list of words in the vocabulary.
+    vocab (Vocabulary): The words in the vocabulary.
     n_words (int): The number of words to predict.
     start_of_word (Optional[str]): The starting characters of the word. Default is None.
+    successor_index (Optional[SuccessorIndex]): The precomputed continuations of each context. Default is None.
 
     Returns:
     str: The predicted next 'n_words' as a string.
@@ -109,92 +138,21 @@ def predict_next_n_words(
     # Placeholder for the predicted words
     words = []
 
+    # Work on a copy so the caller's tokens are left unchanged
+    previous_tokens = list(previous_tokens)
+
     # Predict the next 'n_words'
     for _ in range(n_words):
         next_word, _, _ = predict_next_word(
-            previous_tokens, ngram_counts, nplus1gram_counts, vocab, start_of_word
+            previous_tokens,
+            ngram_counts,
+            nplus1gram_counts,
+            vocab,
+            start_of_word,
+            successor_index,
         )
         words.append(next_word)
         previous_tokens.append(next_word)
 
     # Return the predicted words as a string
     return " ".join(words)
-
-
-@st.cache_data
-def predict_next_word_lstm(
-    initial_sentence: str,
-    lstm_model,
-    tokenizer,
-    sequence_length: int = 1,
-) -> str:
-    """
-    Predicts the next word based on the initial sentence using LSTM model.
-
-    Parameters:
-    initial_sentence (str): The initial sentence.
-    lstm_model: The trained LSTM model.
-    tokenizer: The trained tokenizer.
-    sequence_length (int): The maximum length of the sequence. Default is 1.
-
-    Returns:
-    str: The predicted next word as a string.
-    """
-    # Tokenize the seed text
-    tokenized_text = tokenizer.texts_to_sequences([initial_sentence])[0]
-
-    # Pad the sequences
-    padded_sequence = keras.preprocessing.sequence.pad_sequences(
-        [tokenized_text], maxlen=sequence_length - 1, padding="pre"
-    )
-
-    # Get the probabilities of predicting a word
-    prediction_probabilities = lstm_model.predict(padded_sequence, verbose=0)
-
-    # Choose the next word based on the maximum probability
-    predicted_index = np.argmax(prediction_probabilities, axis=-1).item()
-
-    # Get the actual word from the word index
-    predicted_word = tokenizer.index_word[predicted_index]
-
-    # Return the predicted word
-    return predicted_word
-
-
-@st.cache_data
-def predict_next_words_lstm(
-    initial_sentence: str,
-    lstm_model,
-    tokenizer,
-    max_len: int = 1,
-) -> str:
-    """
-    Predicts the next 'max_len' words based on the initial sentence using LSTM model.
-
-    Parameters:
-    initial_sentence (str): The initial sentence.
-    lstm_model: The trained LSTM model.
-    tokenizer: The trained tokenizer.
-    max_len (int): The maximum number of words to predict. Default is 1.
-
-    Returns:
-    str: The predicted next 'max_len' words as a string.
-    """
-    # Placeholder for the predicted words
-    words = []
-
-    # Predict the next 'max_len' words
-    for _ in range(max_len):
-        # Predict the next word
-        next_word = predict_next_word_lstm(
-            initial_sentence, lstm_model, tokenizer, max_len
-        )
-
-        # Append the predicted word to the list of words
-        words.append(next_word)
-
-        # Update the initial sentence for the next prediction
-        initial_sentence += " " + next_word
-
-    # Return the predicted words as a string
-    return " ".join(words)
@@ -1,6 +1,10 @@
 import numpy as np
+from utils.data.vocabulary import Vocabulary
+from utils.monitoring.metrics import metrics
+from utils.prediction.correction_cache import CorrectionCache, correction_cache
+from utils.prediction.scoring import CorrectionScorer
 from utils.text_processing.text_preprocessing import text_processing
-from typing import Dict, Optional, Tuple, Callable, Set, List
+from typing import Dict, List, Optional, Tuple, Callable, Set, Iterable
 
 
 def calculate_probability(
@@ -65,30 +69,33 @@ def calculate_probability(
     return combined_prob
 
 
-def filter_known_words(words: List[str], vocab: List[str]) -> Set[str]:
+def filter_known_words(words: Iterable[str], vocab: Vocabulary) -> Set[str]:
     """
     Returns the subset of words that appear in the vocabulary.
 
     Parameters:
-    words (List[str]): The list of words to be filtered.
-    vocab (List[str]): The list of known words (vocabulary).
+    words (Iterable[str]): The words to be filtered.
+    vocab (Vocabulary): The known words (vocabulary).
 
     Returns:
     Set[str]: The subset of words that appear in the vocabulary.
     """
-    return set(words).intersection(vocab)
+    return vocab.known(words)
 
 
 def correct(
     word: str,
     prev_word: Optional[str],
     next_word: Optional[str],
-    vocab: List[str],
+    vocab: Vocabulary,
     edit1: Callable[[str], Set[str]],
     edit2: Callable[[str], Set[str]],
     unigram_counts: Dict[str, int],
     bigram_counts: Optional[Dict[Tuple[str, str], int]],
     trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    cache: Optional[CorrectionCache] = None,
 ) -> Tuple[str, float]:
     """
     Finds the best correct spelling for a word.
@@ -97,71 +104,243 @@ def correct(
     word (str): The word to be corrected.
     prev_word (Optional[str]): The word preceding the target word. Default is None.
     next_word (Optional[str]): The word following the target word. Default is None.
-    vocab (List[str]): The list of known words (vocabulary).
+    vocab (Vocabulary): The known words (vocabulary).
     edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
     edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
     unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
     bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus. Default is None.
     trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus. Default is None.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to the word,
+        e.g. a SymSpellIndex. If None, candidates are enumerated with edit1 and edit2. Default is None.
+    scorer (Optional[CorrectionScorer]): Scores all the candidates in one vectorized pass with cached
+        normalizers. If None, each candidate is scored with calculate_probability. Default is None.
+    cache (Optional[CorrectionCache]): The cache of the candidates and corrections.
+        Default is None (the shared correction cache).
 
     Returns:
     Tuple[str, float]: The best corrected word and its probability.
     """
-    # Generate candidate words
-    candidates = (
-        filter_known_words([word], vocab)
-        | filter_known_words(list(edit1(word)), vocab)
-        | filter_known_words(list(edit2(word)), vocab)
-    )
-
-    # If no candidates are found, return None
-    if not candidates:
-        return word, 0.0
+    cache = cache if cache is not None else correction_cache
+    if candidate_generator is not None:
+        candidate_models = (vocab, candidate_generator)
+    else:
+        candidate_models = (vocab, edit1, edit2)
+    if scorer is not None:
+        scoring_models = candidate_models + (scorer,)
+    else:
+        scoring_models = candidate_models + (unigram_counts, bigram_counts, trigram_counts)
 
-    # Calculate the probability for each candidate word
-    probs = {
-        candidate: calculate_probability(
-            candidate,
-            unigram_counts,
+    def correct_uncached() -> Tuple[str, float]:
+        candidates = cache.candidates_for(
+            word,
+            candidate_models,
+            lambda: generate_candidates(word, vocab, edit1, edit2, candidate_generator),
+        )
+        best, probability = best_candidate(
+            candidates,
             prev_word,
             next_word,
+            unigram_counts,
             bigram_counts,
             trigram_counts,
+            scorer,
         )
-        for candidate in candidates
-    }
+        # If no candidates are found, the word is left as it is
+        return (best if best is not None else word), probability
 
-    # Return the candidate word with the highest probability
-    return max(probs, key=lambda x: probs.get(x, 0.0)), max(probs.values())
+    return cache.correction_for((prev_word, word, next_word), scoring_models, correct_uncached)
 
 
-def correct_text(
-    text: str,
-    vocab: List[str],
+def generate_candidates(
+    word: str,
+    vocab: Vocabulary,
     edit1: Callable[[str], Set[str]],
     edit2: Callable[[str], Set[str]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+) -> Set[str]:
+    """
+    Finds the known words that could be the correct spelling of a word, whatever its context.
+
+    Parameters:
+    word (str): The word to be corrected.
+    vocab (Vocabulary): The known words (vocabulary).
+    edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
+    edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to the word.
+        If None, candidates are enumerated with edit1 and edit2. Default is None.
+
+    Returns:
+    Set[str]: The candidate words.
+    """
+    # Generate candidate words
+    with metrics.timer("correction_candidates"):
+        if candidate_generator is not None:
+            # The generator may have been built from another vocabulary
+            candidates = filter_known_words([word], vocab) | filter_known_words(
+                candidate_generator(word), vocab
+            )
+        else:
+            candidates = (
+                filter_known_words([word], vocab)
+                | filter_known_words(edit1(word), vocab)
+                | filter_known_words(edit2(word), vocab)
+            )
+    metrics.count("correction_candidates_generated", len(candidates))
+    return candidates
+
+
+def score_candidates(
+    candidates: Iterable[str],
+    prev_word: Optional[str],
+    next_word: Optional[str],
     unigram_counts: Dict[str, int],
     bigram_counts: Optional[Dict[Tuple[str, str], int]],
     trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
-) -> str:
+    scorer: Optional[CorrectionScorer] = None,
+) -> Tuple[List[str], np.ndarray]:
     """
-    Corrects the spelling of words in a text.
+    Calculates the probability of each candidate in a context.
 
     Parameters:
-    text (str): The text to be corrected.
-    vocab (List[str]): The List of known words (vocabulary).
+    candidates (Iterable[str]): The candidate words.
+    prev_word (Optional[str]): The word preceding the target word.
+    next_word (Optional[str]): The word following the target word.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+
+    Returns:
+    Tuple[List[str], np.ndarray]: The candidates and their log probabilities, in the same order.
+    """
+    candidates = list(candidates)
+    metrics.count("correction_candidates_scored", len(candidates))
+
+    with metrics.timer("correction_scoring"):
+        # Score all the candidates at once
+        if scorer is not None:
+            return candidates, scorer.score(candidates, prev_word, next_word)
+
+        # Calculate the probability for each candidate word
+        scores = np.array(
+            [
+                calculate_probability(
+                    candidate,
+                    unigram_counts,
+                    prev_word,
+                    next_word,
+                    bigram_counts,
+                    trigram_counts,
+                )
+                for candidate in candidates
+            ],
+            dtype=np.float64,
+        )
+        return candidates, scores
+
+
+def best_candidate(
+    candidates: Set[str],
+    prev_word: Optional[str],
+    next_word: Optional[str],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    scorer: Optional[CorrectionScorer] = None,
+) -> Tuple[Optional[str], float]:
+    """
+    Picks the most probable candidate in a context.
+
+    Parameters:
+    candidates (Set[str]): The candidate words, left unchanged.
+    prev_word (Optional[str]): The word preceding the target word.
+    next_word (Optional[str]): The word following the target word.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+
+    Returns:
+    Tuple[Optional[str], float]: The best candidate and its probability, (None, 0.0) if there is none.
+    """
+    if not candidates:
+        return None, 0.0
+    words, scores = score_candidates(
+        candidates, prev_word, next_word, unigram_counts, bigram_counts, trigram_counts, scorer
+    )
+    # The first of the candidates with the highest probability
+    best = int(np.argmax(scores))
+    return words[best], float(scores[best])
+
+
+def top_candidates(
+    candidates: Set[str],
+    prev_word: Optional[str],
+    next_word: Optional[str],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    scorer: Optional[CorrectionScorer] = None,
+    k: int = 5,
+) -> List[Tuple[str, float]]:
+    """
+    Ranks the candidates in a context, as `best_candidate` picks the first one.
+
+    Parameters:
+    candidates (Set[str]): The candidate words, left unchanged.
+    prev_word (Optional[str]): The word preceding the target word.
+    next_word (Optional[str]): The word following the target word.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    k (int): The number of candidates kept. Default is 5.
+
+    Returns:
+    List[Tuple[str, float]]: The k most probable candidates with their probabilities, best first.
+    """
+    if not candidates:
+        return []
+    words, scores = score_candidates(
+        candidates, prev_word, next_word, unigram_counts, bigram_counts, trigram_counts, scorer
+    )
+    # A stable sort keeps the first of equal candidates first, as np.argmax does
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(words[index], float(scores[index])) for index in order]
+
+
+def correct_words(
+    words: List[str],
+    vocab: Vocabulary,
+    edit1: Callable[[str], Set[str]],
+    edit2: Callable[[str], Set[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    cache: Optional[CorrectionCache] = None,
+) -> List[str]:
+    """
+    Corrects the spelling of tokenized words.
+
+    Parameters:
+    words (List[str]): The words to be corrected, as returned by text_processing.
+    vocab (Vocabulary): The known words (vocabulary).
     edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
     edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
     unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
     bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus. Default is None.
     trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus. Default is None.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to a word.
+        Default is None.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    cache (Optional[CorrectionCache]): The cache of the candidates and corrections.
+        Default is None (the shared correction cache).
 
     Returns:
-    str: The corrected text.
+    List[str]: The corrected words, one for each word.
     """
-    # Tokenize and process the text
-    words = text_processing(text)
-
     # Initialize an empty list to hold the corrected words
     corrected_words = []
 
@@ -184,6 +363,9 @@ def correct_text(
                 unigram_counts,
                 bigram_counts,
                 trigram_counts,
+                candidate_generator,
+                scorer,
+                cache,
             )
 
             # Add the corrected word to the list
@@ -193,7 +375,57 @@ def correct_text(
             # Add the correctly spelled word to the list
             corrected_words.append(word)
 
-    # Join the corrected words back into a string
+    return corrected_words
+
+
+def correct_text(
+    text: str,
+    vocab: Vocabulary,
+    edit1: Callable[[str], Set[str]],
+    edit2: Callable[[str], Set[str]],
+    unigram_counts: Dict[str, int],
+    bigram_counts: Optional[Dict[Tuple[str, str], int]],
+    trigram_counts: Optional[Dict[Tuple[str, str, str], int]],
+    candidate_generator: Optional[Callable[[str], Set[str]]] = None,
+    scorer: Optional[CorrectionScorer] = None,
+    cache: Optional[CorrectionCache] = None,
+) -> str:
+    """
+    Corrects the spelling of words in a text.
+
+    Parameters:
+    text (str): The text to be corrected.
+    vocab (Vocabulary): The known words (vocabulary).
+    edit1 (Callable[[str], Set[str]]): The function to generate words that are one edit away.
+    edit2 (Callable[[str], Set[str]]): The function to generate words that are two edits away.
+    unigram_counts (Dict[str, int]): The counts of each unigram in the corpus.
+    bigram_counts (Optional[Dict[Tuple[str, str], int]]): The counts of each bigram in the corpus. Default is None.
+    trigram_counts (Optional[Dict[Tuple[str, str, str], int]]): The counts of each trigram in the corpus. Default is None.
+    candidate_generator (Optional[Callable[[str], Set[str]]]): A function returning the known words close to a word.
+        Default is None.
+    scorer (Optional[CorrectionScorer]): The vectorized candidate scorer. Default is None.
+    cache (Optional[CorrectionCache]): The cache of the candidates and corrections.
+        Default is None (the shared correction cache).
+
+    Returns:
+    str: The corrected text.
+    """
+    # Tokenize and process the text
+    words = text_processing(text)
+
+    # Correct the words and join them back into a string
+    corrected_words = correct_words(
+        words,
+        vocab,
+        edit1,
+        edit2,
+        unigram_counts,
+        bigram_counts,
+        trigram_counts,
+        candidate_generator,
+        scorer,
+        cache,
+    )
     corrected_text = " ".join(corrected_words)
 
     return corrected_text
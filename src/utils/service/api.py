@@ -0,0 +1,283 @@
+import os
+from typing import Any, Callable, Dict, List, Optional
+from utils.data.model_registry import ModelRegistry, correction_models
+from utils.monitoring.profiling import profile_requested, profiler
+from utils.prediction.beam_search import beam_search_next_words
+from utils.prediction.correction_cache import correction_cache
+from utils.prediction.lattice_correction import CORRECTION_MODES, correct_words_lattice
+from utils.prediction.lstm_completion import predict_next_words_lstm
+from utils.prediction.text_completion import predict_next_word
+from utils.prediction.text_correction import correct_words
+from utils.text_processing.text_preprocessing import text_processing
+
+# Limits of the request parameters
+MAX_WORDS = 50
+MAX_COMPLETIONS = 10
+MAX_BATCH_SIZE = 100
+
+# Limits of the work of a request, or of all the requests of a batch: a request
+# that timed out keeps running in its worker thread, so the work is bounded
+# before it starts. Enumerating the edits of a word takes time and memory
+# growing with the square of its length (0.25 s for 12 letters). Searching the
+# vocabulary trie takes time growing with the distance, whatever the length of
+# the word (on 50000 words, 0.15 s at distance 2 and 1.4 s at distance 5), so the
+# trie words are counted in words at distance 2 and below.
+MAX_TEXT_CHARACTERS = 20000
+MAX_WORD_LENGTH = 40
+MAX_EDITS_WORD_LENGTH = 12
+MAX_EDITS_WORDS = 10
+MAX_TRIE_WORDS = 20
+TRIE_WORD_WEIGHTS = {1: 1, 2: 1, 3: 4, 4: 6, 5: 10}
+
+
+def _field(payload: Dict[str, Any], name: str, kind: type, default: Any = None) -> Any:
+    # A field of a JSON request, checked against its expected type
+    value = payload.get(name, default)
+    if value is None:
+        raise ValueError(f"Missing field: {name}")
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValueError(f"Field {name} must be of type {kind.__name__}")
+    return value
+
+
+def _bounded(value: int, name: str, upper: int) -> int:
+    if not 1 <= value <= upper:
+        raise ValueError(f"Field {name} must be between 1 and {upper}")
+    return value
+
+
+def _budget() -> Dict[str, int]:
+    # The work a request, or a batch, may still do
+    return {
+        "characters": MAX_TEXT_CHARACTERS,
+        "edits_words": MAX_EDITS_WORDS,
+        "trie_words": MAX_TRIE_WORDS,
+    }
+
+
+def _text(payload: Dict[str, Any], budget: Dict[str, int]) -> str:
+    # The text of a request, counted against the characters left in the budget
+    text = _field(payload, "text", str)
+    if len(text) > budget["characters"]:
+        raise ValueError(
+            f"The texts are limited to {MAX_TEXT_CHARACTERS} characters per request or batch"
+        )
+    budget["characters"] -= len(text)
+    return text
+
+
+def _capture(payload: Dict[str, Any], feature: str, text: str, **tags: Any):
+    # Profiles the request when the profiler runs on every call, or on request
+    # and the request sets "profile", dumping it above "profile_threshold_ms"
+    threshold_ms = payload.get("profile_threshold_ms")
+    if threshold_ms is not None and (
+        not isinstance(threshold_ms, (int, float)) or isinstance(threshold_ms, bool)
+    ):
+        raise ValueError("Field profile_threshold_ms must be a number")
+    words = text.split()
+    return profiler.capture(
+        feature,
+        len(words),
+        requested=profile_requested(payload.get("profile")),
+        threshold_seconds=None if threshold_ms is None else threshold_ms / 1e3,
+        longest_word=max(map(len, words), default=0),
+        **tags,
+    )
+
+
+class TextFlowService:
+    """
+    The correction and completion features of the app behind JSON requests.
+
+    Each method takes the decoded JSON body of a request and returns the JSON
+    response, or raises ValueError when the request is invalid. The models
+    are read from the registry, so they are loaded once per process. A
+    request may ask to be profiled with "profile" and "profile_threshold_ms"
+    (see utils.monitoring.profiling).
+    """
+
+    def __init__(self, registry: ModelRegistry) -> None:
+        self.registry = registry
+
+    def correct(
+        self, payload: Dict[str, Any], budget: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Corrects the spelling of a text.
+
+        Parameters:
+        payload (Dict[str, Any]): "text", and optionally "candidate_generator"
+            ("symspell", "trie" or "edits"), "max_distance" for the trie and "mode",
+            "word" to correct each misspelled word on its own (the default) or
+            "lattice" to correct the whole text jointly.
+        budget (Optional[Dict[str, int]]): The work left to the batch of the request.
+            Default is None (the limits of a single request).
+
+        Returns:
+        Dict[str, Any]: The corrected text under "corrected".
+        """
+        budget = budget if budget is not None else _budget()
+        text = _text(payload, budget)
+        candidate_generator = _field(payload, "candidate_generator", str, "symspell")
+        max_distance = _bounded(_field(payload, "max_distance", int, 2), "max_distance", 5)
+        mode = _field(payload, "mode", str, "word")
+        if mode not in CORRECTION_MODES:
+            raise ValueError(f"Unknown correction mode: {mode}")
+        models = correction_models(self.registry, candidate_generator, max_distance)
+
+        # Reject the misspelled words whose candidates would take too long to find
+        words = text_processing(text)
+        misspelled = [word for word in words if word not in models[0]]
+        if any(len(word) > MAX_WORD_LENGTH for word in misspelled):
+            raise ValueError(f"The misspelled words are limited to {MAX_WORD_LENGTH} letters")
+        if candidate_generator == "edits":
+            if any(len(word) > MAX_EDITS_WORD_LENGTH for word in misspelled):
+                raise ValueError(
+                    f"The edits generator is limited to words of {MAX_EDITS_WORD_LENGTH} letters"
+                )
+            if len(misspelled) > budget["edits_words"]:
+                raise ValueError(
+                    f"The edits generator is limited to {MAX_EDITS_WORDS} misspelled words "
+                    "per request or batch"
+                )
+            budget["edits_words"] -= len(misspelled)
+        elif candidate_generator == "trie":
+            weight = TRIE_WORD_WEIGHTS[max_distance]
+            if len(misspelled) * weight > budget["trie_words"]:
+                raise ValueError(
+                    f"The trie generator is limited to {MAX_TRIE_WORDS // weight} misspelled "
+                    f"words at distance {max_distance} per request or batch"
+                )
+            budget["trie_words"] -= len(misspelled) * weight
+
+        corrector = correct_words_lattice if mode == "lattice" else correct_words
+        with _capture(
+            payload,
+            "correct",
+            text,
+            candidate_generator=candidate_generator,
+            max_distance=max_distance,
+            mode=mode,
+        ):
+            corrected = " ".join(corrector(words, *models))
+        return {"corrected": corrected}
+
+    def complete(
+        self, payload: Dict[str, Any], budget: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Predicts the next words of a text.
+
+        Parameters:
+        payload (Dict[str, Any]): "text", and optionally "n_words" (default 1), "model"
+            ("ngram" or "lstm") and, for the n-gram model, "num_completions" (default 1).
+        budget (Optional[Dict[str, int]]): The work left to the batch of the request.
+            Default is None (the limits of a single request).
+
+        Returns:
+        Dict[str, Any]: The best completion under "completion", and for the n-gram model
+            the ranked completions with their log probabilities under "completions".
+        """
+        text = _text(payload, budget if budget is not None else _budget())
+        n_words = _bounded(_field(payload, "n_words", int, 1), "n_words", MAX_WORDS)
+        model = _field(payload, "model", str, "ngram")
+
+        if model == "lstm":
+            lstm_model = self.registry.get("lstm_predictor")
+            tokenizer = self.registry.get("tokenizer")
+            with _capture(payload, "complete_lstm", text, n_words=n_words):
+                completion = predict_next_words_lstm(text, lstm_model, tokenizer, max_len=n_words)
+            return {"completion": completion}
+        if model != "ngram":
+            raise ValueError(f"Unknown model: {model}")
+
+        num_completions = _bounded(
+            _field(payload, "num_completions", int, 1), "num_completions", MAX_COMPLETIONS
+        )
+        ngram_counts = self.registry.get("ngram_counts")
+        nplus1gram_counts = self.registry.get("nplus1gram_counts")
+        vocab = self.registry.get("vocab")
+        successor_index = self.registry.get("successor_index")
+        with _capture(
+            payload, "complete_ngram", text, n_words=n_words, num_completions=num_completions
+        ):
+            prev_tokens = text_processing(text)
+            if n_words == 1 and num_completions == 1:
+                word, probability, _ = predict_next_word(
+                    prev_tokens,
+                    ngram_counts,
+                    nplus1gram_counts,
+                    vocab,
+                    successor_index=successor_index,
+                )
+                completions = [([word], float(probability))]
+            else:
+                completions = beam_search_next_words(
+                    prev_tokens,
+                    successor_index,
+                    n_words,
+                    beam_width=max(3, num_completions),
+                    num_completions=num_completions,
+                )
+        return {
+            "completion": " ".join(completions[0][0]) if completions else "",
+            "completions": [
+                {"words": words, "log_probability": float(score)}
+                for words, score in completions
+            ],
+        }
+
+    def batch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs several correction and completion requests.
+
+        Parameters:
+        payload (Dict[str, Any]): "requests", a list of requests with a "type"
+            ("correct" or "complete") and the fields of that request.
+
+        Returns:
+        Dict[str, Any]: The responses in the order of the requests under "results";
+            an invalid request gets an "error" instead of failing the batch, as do the
+            requests past the limits of the work of a batch.
+        """
+        requests = _field(payload, "requests", list)
+        if len(requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} requests per batch")
+        handlers: Dict[str, Callable[..., Dict[str, Any]]] = {
+            "correct": self.correct,
+            "complete": self.complete,
+        }
+        # The profiling switch of the batch applies to each of its requests
+        switches = {
+            key: payload[key] for key in ("profile", "profile_threshold_ms") if key in payload
+        }
+        # The requests share the limits of a single request
+        budget = _budget()
+        results: List[Dict[str, Any]] = []
+        for request in requests:
+            try:
+                if not isinstance(request, dict):
+                    raise ValueError("Each request must be an object")
+                request = {**switches, **request}
+                handler = handlers.get(_field(request, "type", str))
+                if handler is None:
+                    raise ValueError(f"Unknown request type: {request['type']}")
+                results.append(handler(request, budget))
+            except ValueError as error:
+                results.append({"error": str(error)})
+        return {"results": results}
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Reports the process and the models it has loaded.
+
+        Returns:
+        Dict[str, Any]: The status, the process ID, the loaded artifacts and the
+            counters of the correction cache.
+        """
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "loaded": sorted(self.registry.stats()),
+            "correction_cache": correction_cache.stats(),
+        }
@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Set
+from typing import Optional, Set
 
 
 def edits1(word: str) -> Set[str]:
@@ -45,3 +45,55 @@ def edits3(word: str) -> Set[str]:
     Set[str]: A set of words that are three edits away from the input word.
     """
     return set(e3 for e1 in edits1(word) for e2 in edits1(e1) for e3 in edits1(e2))
+
+
+def damerau_levenshtein_distance(
+    source: str, target: str, max_distance: Optional[int] = None
+) -> int:
+    """
+    Computes the Damerau-Levenshtein distance between two words, i.e. the minimal number of
+    deletions, insertions, substitutions and adjacent transpositions turning one into the other.
+    This is the distance under which `edits1` and `edits2` enumerate their candidates.
+
+    Parameters:
+    source (str): The first word.
+    target (str): The second word.
+    max_distance (Optional[int]): Bound above which the exact distance is not needed. Default is None.
+
+    Returns:
+    int: The distance, or max_distance + 1 if it exceeds max_distance.
+    """
+    if max_distance is not None and abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    # Distance matrix with an extra sentinel row and column
+    infinity = len(source) + len(target)
+    rows = [[infinity] * (len(target) + 2)]
+    rows.append([infinity] + list(range(len(target) + 1)))
+    rows.extend([infinity, i] + [0] * len(target) for i in range(1, len(source) + 1))
+
+    # Last row in which each character of the source was seen
+    last_row = {}
+    for i in range(1, len(source) + 1):
+        # Last column in which the current source character matched
+        last_column = 0
+        for j in range(1, len(target) + 1):
+            previous_i = last_row.get(target[j - 1], 0)
+            previous_j = last_column
+            cost = 1
+            if source[i - 1] == target[j - 1]:
+                cost = 0
+                last_column = j
+            rows[i + 1][j + 1] = min(
+                rows[i][j] + cost,  # substitution
+                rows[i + 1][j] + 1,  # insertion
+                rows[i][j + 1] + 1,  # deletion
+                # transposition, with the characters in between deleted or inserted
+                rows[previous_i][previous_j] + (i - previous_i - 1) + 1 + (j - previous_j - 1),
+            )
+        last_row[source[i - 1]] = i
+
+    distance = rows[-1][-1]
+    if max_distance is not None and distance > max_distance:
+        return max_distance + 1
+    return distance
@@ -0,0 +1,168 @@
+import argparse
+import hashlib
+import pickle
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from utils.text_processing.edit_distance import damerau_levenshtein_distance
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """
+    Generates all strings obtained by deleting up to `max_distance` characters from the word.
+
+    Parameters:
+    word (str): The word to be edited.
+    max_distance (int): The maximum number of deleted characters.
+
+    Returns:
+    Set[str]: The delete neighborhood of the word, including the word itself.
+    """
+    neighborhood = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            variant[:i] + variant[i + 1 :]
+            for variant in frontier
+            for i in range(len(variant))
+        }
+        neighborhood |= frontier
+    return neighborhood
+
+
+def vocabulary_fingerprint(words: Iterable[str]) -> str:
+    """
+    Identifies a set of words, whatever their order and repetitions.
+
+    Parameters:
+    words (Iterable[str]): The words.
+
+    Returns:
+    str: The number of distinct words and a hash of the sorted words.
+    """
+    distinct = sorted(set(words))
+    digest = hashlib.sha1("\n".join(distinct).encode("utf-8")).hexdigest()
+    return f"{len(distinct)}-{digest}"
+
+
+class SymSpellIndex:
+    """
+    Symmetric-delete candidate index over a vocabulary.
+
+    Every known word is indexed under its delete neighborhood, so the known
+    words within edit distance k of a misspelling are found by generating the
+    (much smaller) delete neighborhood of the misspelling and looking it up,
+    instead of enumerating every insertion and substitution.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = 2) -> None:
+        self.max_distance = max_distance
+        self.words: Set[str] = set()
+        index: Dict[str, List[str]] = defaultdict(list)
+        for word in words:
+            if word in self.words:
+                continue
+            self.words.add(word)
+            for variant in deletes(word, max_distance):
+                index[variant].append(word)
+        self.index = dict(index)
+        # Identifies the vocabulary, so an index built from another one is not reused
+        self.fingerprint = vocabulary_fingerprint(self.words)
+
+    def __call__(self, word: str) -> Set[str]:
+        return self.lookup(word)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> Set[str]:
+        """
+        Returns all known words within the given edit distance of the word.
+
+        Parameters:
+        word (str): The (possibly misspelled) word.
+        max_distance (Optional[int]): The maximum edit distance, at most the distance
+            the index was built with. Default is the build distance.
+
+        Returns:
+        Set[str]: The known words within the edit distance.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f"Index was built for distance {self.max_distance}, got {max_distance}"
+            )
+
+        # Collect the words sharing a delete variant with the input
+        candidates: Set[str] = set()
+        for variant in deletes(word, max_distance):
+            candidates.update(self.index.get(variant, ()))
+
+        # Keep the candidates that are really within the distance
+        return {
+            candidate
+            for candidate in candidates
+            if damerau_levenshtein_distance(word, candidate, max_distance)
+            <= max_distance
+        }
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the index to a pickle file.
+
+        The plain state of the index is pickled rather than the object, so the
+        file does not depend on the module the class was imported from (the
+        CLI below runs it as __main__).
+
+        Parameters:
+        file_path (str): The path to the pickle file.
+
+        Returns:
+        None
+        """
+        state = {
+            "max_distance": self.max_distance,
+            "words": self.words,
+            "index": self.index,
+            "fingerprint": self.fingerprint,
+        }
+        with open(file_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_path: str) -> "SymSpellIndex":
+        """
+        Loads an index from a pickle file.
+
+        Parameters:
+        file_path (str): The path to the pickle file.
+
+        Returns:
+        SymSpellIndex: The loaded index.
+        """
+        with open(file_path, "rb") as f:
+            state = pickle.load(f)
+        if not isinstance(state, dict):
+            raise ValueError(f"Not a symmetric-delete index: {file_path}")
+        index = SymSpellIndex.__new__(SymSpellIndex)
+        index.max_distance = state["max_distance"]
+        index.words = state["words"]
+        index.index = state["index"]
+        index.fingerprint = state.get("fingerprint")
+        return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the symmetric-delete candidate index for spelling correction."
+    )
+    parser.add_argument("--vocab", default="src/models/vocabulary.txt")
+    parser.add_argument("--output", default="src/models/symspell_index.pkl")
+    parser.add_argument("--max-distance", type=int, default=2)
+    args = parser.parse_args()
+
+    with open(args.vocab, "r") as f:
+        index = SymSpellIndex((line.strip() for line in f), args.max_distance)
+    index.save(args.output)
+    print(f"Indexed {len(index.words)} words into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
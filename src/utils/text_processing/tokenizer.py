@@ -0,0 +1,268 @@
+import re
+from bisect import bisect_right
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Links and symbols removed before tokenizing (the '#' only after an emoji variation selector)
+_REMOVED = re.compile("http\\S+|www.\\S+|@|\ufe0f#|!")
+
+# Runs of the characters kept by the cleaning step, every other character is a separator
+_CHUNK = re.compile(r"[a-z0-9.,]+")
+
+# Chunks made of letters and digits only are tokens as they are
+_PLAIN = re.compile(r"[a-z0-9]+\Z")
+
+# Treebank rules that apply to the cleaned alphabet: commas, period runs and contractions
+_COMMA = re.compile(r"(,)([^\d])")
+_FINAL_COMMA = re.compile(r"(,)$")
+_PERIODS = re.compile(r"\.{2,}")
+_CONTRACTIONS = [
+    re.compile(r"\b(can)(not)\b"),
+    re.compile(r"\b(gim)(me)\b"),
+    re.compile(r"\b(gon)(na)\b"),
+    re.compile(r"\b(got)(ta)\b"),
+    re.compile(r"\b(lem)(me)\b"),
+    re.compile(r"\b(wan)(na)(?=\s)"),
+]
+_CONTRACTION_HINT = re.compile(r"cannot|gimme|gonna|gotta|lemme|wanna")
+
+# Punkt word tokens, types of the tokens ending with a period and sentence boundaries
+_PUNKT_WORD = re.compile(
+    r"""(
+        (?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)
+        |
+        (?=[^\(\"\`{\[:;&\#\*@\)}\]\-,])\S+?
+        (?=
+            \s|$|(?:[)\";}\]\*:@\'\({\[!?])|(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)|
+            ,(?=$|\s|(?:[)\";}\]\*:@\'\({\[!?])|(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.))
+        )
+        |
+        \S
+    )""",
+    re.VERBOSE,
+)
+_PUNKT_INITIAL = re.compile(r"[^\W\d]\.$")
+_PUNKT_NUMBER = re.compile(r"^-?[\.,]?\d[\d,\.-]*\.?$")
+_PUNKT_ELLIPSIS = re.compile(r"\.\.+$")
+_LATER_CANDIDATE = re.compile(r"\S*?[.?!](?=[)\";}\]\*:@'({\[!?]|\s+\S)")
+_NEXT_WORD = re.compile(r"\s+(\S+)")
+_PUNKT_BOUNDARY = re.compile(r"[.?!](?=[\s)\";}\]\*:@'({\[!?])")
+
+# Punctuation after which Punkt looks for a sentence break without whitespace
+_NON_WORD = frozenset(")\";}]*:@'({[!?")
+
+# Abbreviations of the English Punkt model whose period does not end a sentence,
+# keeping only those that are not also ordinary words or names ("no", "sun",
+# "wed", "al"...), whose period usually does end one
+DEFAULT_ABBREVIATIONS: FrozenSet[str] = frozenset(
+    """
+    a.m p.m mr mrs ms dr prof st jr sr mt ft gov lt capt sgt cmdr
+    inc ltd corp assn dept univ vol pp eds approx vs etc
+    e.g i.e u.s u.k u.n a.d b.c feb apr jun jul aug sep sept oct nov dec
+    tue tues thu thur thurs fri ave blvd rd calif fla
+    """.split()
+)
+
+Token = Union[str, Tuple[str, int, int]]
+
+
+class Tokenizer:
+    """
+    Single-pass tokenizer reproducing `text_processing`: lower case, links and
+    symbols removed, every character but letters, digits, periods and commas
+    treated as a separator, and the NLTK Treebank rules for commas, period
+    runs, sentence-final periods and contractions.
+
+    The text is scanned once for runs of kept characters. Runs of letters
+    and digits are tokens as they are; only the runs containing a period, a
+    comma or a contraction go through the Treebank rules. Instead of running
+    Punkt over the whole text, only the periods ending a run are checked,
+    with the Punkt rules applied to the words around them: the period is
+    split off as a sentence end unless it ends a known abbreviation, or an
+    initial or a number followed by a word.
+    """
+
+    def __init__(self, abbreviations: Iterable[str] = DEFAULT_ABBREVIATIONS) -> None:
+        self.abbreviations = frozenset(abbreviations)
+
+    def tokenize(self, text: str, offsets: bool = False) -> List[Token]:
+        """
+        Cleans and tokenizes a text.
+
+        Parameters:
+        text (str): The text to be processed.
+        offsets (bool): Whether to return the character offsets of the tokens. Default is False.
+
+        Returns:
+        List[Token]: The tokens, or (token, start, end) tuples where text[start:end]
+            is the span of the original text the token comes from.
+        """
+        return list(self.iter_tokens(text, offsets))
+
+    def iter_tokens(self, text: str, offsets: bool = False) -> Iterator[Token]:
+        """
+        Cleans and tokenizes a text lazily, reading one run of characters ahead.
+
+        Parameters:
+        text (str): The text to be processed.
+        offsets (bool): Whether to yield the character offsets of the tokens. Default is False.
+
+        Yields:
+        Token: The tokens, or (token, start, end) tuples.
+        """
+        lowered = text.lower()
+        to_original = _OffsetMap(text, lowered) if offsets else None
+
+        # Remove links and symbols, remembering where the removed spans were
+        removed = []
+        if any(marker in lowered for marker in ("!", "@", "\ufe0f", "http", "www")):
+            removed = [match.span() for match in _REMOVED.finditer(lowered)]
+        if removed:
+            pieces = []
+            position = kept = 0
+            for start, end in removed:
+                pieces.append(lowered[position:start])
+                kept += start - position
+                if to_original is not None:
+                    to_original.remove(kept, end - start)
+                position = end
+            pieces.append(lowered[position:])
+            lowered = "".join(pieces)
+
+        chunks = _CHUNK.finditer(lowered)
+        current = next(chunks, None)
+        while current is not None:
+            following = next(chunks, None)
+            chunk = current.group()
+            if _PLAIN.match(chunk) and not _CONTRACTION_HINT.search(chunk):
+                tokens = [chunk]
+            else:
+                sentence_end = chunk[-1] == "." and self._ends_sentence(lowered, current, following)
+                tokens = self._split(chunk, sentence_end)
+
+            if to_original is None:
+                yield from tokens
+            else:
+                position = 0
+                for token in tokens:
+                    start = chunk.index(token, position)
+                    position = start + len(token)
+                    yield (
+                        token,
+                        to_original(current.start() + start),
+                        to_original(current.start() + position - 1) + 1,
+                    )
+            current = following
+
+    def _ends_sentence(self, text: str, current: re.Match, following: Optional[re.Match]) -> bool:
+        # Whether the final period of a run of characters ends a sentence, as
+        # decided by Punkt on the text before cleaning or on the cleaned text
+        chunk = current.group()
+        if chunk.endswith("..") or len(chunk) == 1:
+            return False
+        if following is None:
+            return True
+
+        # A '?' between the two runs ends the sentence right after the period
+        end = current.end()
+        if _PUNKT_BOUNDARY.search(text, end, following.start()):
+            return True
+
+        # Punkt only considers the last candidate period of a word
+        after = text[end]
+        if after.isspace() or (after in _NON_WORD and not _LATER_CANDIDATE.match(text, end)):
+            start = current.start()
+            while start and not text[start - 1].isspace():
+                start -= 1
+            if after.isspace():
+                context = _PUNKT_WORD.findall(_NEXT_WORD.match(text, end).group(1))
+            else:
+                context = [after]
+            if self._punkt_break(_PUNKT_WORD.findall(text, start, end) + context):
+                return True
+        return self._punkt_break(
+            _PUNKT_WORD.findall(chunk) + _PUNKT_WORD.findall(following.group())
+        )
+
+    def _punkt_break(self, tokens: List[str]) -> bool:
+        # Punkt finds a break in a context if a token other than the last one ends a sentence
+        return any(
+            self._punkt_sentbreak(token, tokens[position + 1])
+            for position, token in enumerate(tokens[:-1])
+        )
+
+    def _punkt_sentbreak(self, token: str, next_token: str) -> bool:
+        # The first and second pass annotations of Punkt, without the learned
+        # orthographic contexts: lower case words are taken as not starting sentences
+        if token in (".", "?", "!"):
+            return True
+        if not token.endswith(".") or _PUNKT_ELLIPSIS.match(token) or token.endswith(".."):
+            return False
+        word = token[:-1]
+        if word in self.abbreviations or word.split("-")[-1] in self.abbreviations:
+            return False
+        if _PUNKT_INITIAL.match(token) or _PUNKT_NUMBER.match(token):
+            return not (next_token in (";", ":", ",", ".", "!", "?") or next_token[0].islower())
+        return True
+
+    @staticmethod
+    def _split(chunk: str, sentence_end: bool) -> List[str]:
+        # Apply the Treebank rules to a run of characters
+        tail = []
+        if sentence_end:
+            chunk = chunk[:-1]
+            tail = ["."]
+        if "," not in chunk and ".." not in chunk and not _CONTRACTION_HINT.search(chunk):
+            return [chunk] + tail
+        chunk = _COMMA.sub(r" \1 \2", chunk)
+        chunk = _FINAL_COMMA.sub(r" \1 ", chunk)
+        chunk = _PERIODS.sub(r" \g<0> ", chunk)
+        if _CONTRACTION_HINT.search(chunk):
+            chunk = " " + chunk + " "
+            for contraction in _CONTRACTIONS:
+                chunk = contraction.sub(r" \1 \2 ", chunk)
+        return chunk.split() + tail
+
+
+class _OffsetMap:
+    """
+    Maps positions in the lowered, link-free text back to the original text.
+    """
+
+    def __init__(self, text: str, lowered: str) -> None:
+        self._lowered_to_text = None
+        if len(lowered) != len(text):
+            # Some characters (e.g. 'İ') have a longer lower case form
+            self._lowered_to_text = [
+                index for index, character in enumerate(text) for _ in character.lower()
+            ]
+        self._starts: List[int] = [0]
+        self._shifts: List[int] = [0]
+
+    def remove(self, position: int, length: int) -> None:
+        # Characters from `position` onwards were shifted left by `length`
+        self._starts.append(position)
+        self._shifts.append(self._shifts[-1] + length)
+
+    def __call__(self, position: int) -> int:
+        position += self._shifts[bisect_right(self._starts, position) - 1]
+        if self._lowered_to_text is not None:
+            return self._lowered_to_text[position]
+        return position
+
+
+# Tokenizer used by text_processing
+tokenizer = Tokenizer()
+
+
+def tokenize(text: str, offsets: bool = False) -> List[Token]:
+    """
+    Cleans and tokenizes a text with the default tokenizer.
+
+    Parameters:
+    text (str): The text to be processed.
+    offsets (bool): Whether to return the character offsets of the tokens. Default is False.
+
+    Returns:
+    List[Token]: The tokens, or (token, start, end) tuples.
+    """
+    return tokenizer.tokenize(text, offsets)
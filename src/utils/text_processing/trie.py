@@ -0,0 +1,134 @@
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Set
+
+# Key marking the end of a word in a trie node, never a character
+_END = None
+
+
+class VocabularyTrie:
+    """
+    Character trie over a vocabulary, searched with a bounded Damerau-Levenshtein
+    distance.
+
+    The search walks the trie computing one row of the distance matrix per
+    character, and prunes a whole subtree as soon as every entry of the row
+    exceeds the distance budget. Words sharing a prefix share the work, and
+    large budgets (3-5) stay cheap compared to enumerating `edits3`. Only the
+    entries at most `max_distance` columns away from the diagonal are
+    computed, since the others always exceed the budget, so a row costs the
+    same for long words as for short ones.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self.root: Dict = {}
+        for word in words:
+            self.insert(word)
+
+    def insert(self, word: str) -> None:
+        """
+        Adds a word to the trie.
+
+        Parameters:
+        word (str): The word to add.
+
+        Returns:
+        None
+        """
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = word
+
+    def search(self, word: str, max_distance: int) -> Dict[str, int]:
+        """
+        Finds all words of the trie within the given Damerau-Levenshtein distance.
+
+        Parameters:
+        word (str): The (possibly misspelled) word.
+        max_distance (int): The maximum edit distance.
+
+        Returns:
+        Dict[str, int]: The words found and their distance to the input word.
+        """
+        infinity = len(word) + max_distance + 1
+        results: Dict[str, int] = {}
+
+        # Sentinel row and the row of the empty prefix
+        rows: List[List[int]] = [
+            [infinity] * (len(word) + 2),
+            [infinity] + list(range(len(word) + 1)),
+        ]
+        if _END in self.root and len(word) <= max_distance:
+            results[self.root[_END]] = len(word)
+
+        def visit(node: Dict, last_row: Dict[str, int]) -> None:
+            # Position of the character added at this depth
+            i = len(rows) - 1
+            previous = rows[-1]
+            for char, child in node.items():
+                if char is _END:
+                    continue
+                row = [infinity, i] + [infinity] * len(word)
+                # Columns within the budget of the diagonal, and the last match before
+                # them that a transposition could still start from
+                first = max(1, i - max_distance)
+                last = min(len(word), i + max_distance)
+                last_column = 0
+                for j in range(max(1, first - max_distance), first):
+                    if char == word[j - 1]:
+                        last_column = j
+                for j in range(first, last + 1):
+                    previous_i = last_row.get(word[j - 1], 0)
+                    previous_j = last_column
+                    cost = 1
+                    if char == word[j - 1]:
+                        cost = 0
+                        last_column = j
+                    row[j + 1] = min(
+                        previous[j] + cost,  # substitution
+                        row[j] + 1,  # insertion
+                        previous[j + 1] + 1,  # deletion
+                        # transposition
+                        rows[previous_i][previous_j]
+                        + (i - previous_i - 1)
+                        + 1
+                        + (j - previous_j - 1),
+                    )
+
+                # Prune the subtree once the whole row is over budget
+                if min(row[1:]) > max_distance:
+                    continue
+                if _END in child and row[-1] <= max_distance:
+                    results[child[_END]] = row[-1]
+
+                rows.append(row)
+                visit(child, {**last_row, char: i})
+                rows.pop()
+
+        visit(self.root, {})
+        return results
+
+    def known_within(self, word: str, max_distance: int = 2) -> Set[str]:
+        """
+        Returns the words of the trie within the given edit distance.
+
+        Parameters:
+        word (str): The (possibly misspelled) word.
+        max_distance (int): The maximum edit distance. Default is 2.
+
+        Returns:
+        Set[str]: The words within the edit distance.
+        """
+        return set(self.search(word, max_distance))
+
+    def candidate_generator(self, max_distance: int) -> Callable[[str], Set[str]]:
+        """
+        Returns a candidate generator for `correct()` bound to a maximum distance.
+
+        Parameters:
+        max_distance (int): The maximum edit distance of the candidates.
+
+        Returns:
+        Callable[[str], Set[str]]: A function returning the known words close to a word.
+        """
+        return partial(self.known_within, max_distance=max_distance)